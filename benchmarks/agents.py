@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Several agent processes (zfs-monitor.py --agent) fed by the fake `zpool`
+# from benchmarks/bin, and one RemoteCollector connected to all of them on a
+# GLib main loop: the path the tray takes with --connect. Each agent listens
+# on a Unix socket in a temporary directory under its own host name. Reports
+# the time until every host's pools are merged and the bytes received for
+# the first sync, for a round where half of the hosts degrade, and for a
+# round where nothing changed.
+#
+#   python3 benchmarks/agents.py                  # 10 hosts, 100 vdevs each
+#   python3 benchmarks/agents.py --hosts 100 --vdevs 500 --pools 2
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCHMARKS = os.path.dirname(os.path.realpath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+
+from gi.repository import GLib
+
+from zfsmonitor.remote import RemoteCollector
+from zfsmonitor.instrument import stats
+
+MONITOR = os.path.join(ROOT, "zfs-monitor.py")
+
+# One agent per host; returns the processes, their addresses and the files
+# that switch each host's scenario
+def start_agents(directory, hosts, pools, vdevs):
+    processes, addresses, scenarios = [], [], []
+    for n in range(hosts):
+        path = os.path.join(directory, f"host{n}.sock")
+        scenario = os.path.join(directory, f"host{n}.scenario")
+        env = dict(os.environ)
+        env["PATH"] = os.path.join(BENCHMARKS, "bin") + os.pathsep + env.get("PATH", "")
+        env["ZPOOL_MONITOR_ENABLE"] = "1"
+        env["ZPOOL_FAKE_POOLS"] = ' '.join(pools)
+        env["ZPOOL_FAKE_VDEVS"] = str(vdevs)
+        env["ZPOOL_FAKE_SCENARIO_FILE"] = scenario
+        processes.append(subprocess.Popen(
+            [sys.executable, MONITOR, "--agent", f"unix:{path}", "--agent-name", f"host{n}"],
+            env=env, stderr=subprocess.DEVNULL
+        ))
+        addresses.append(f"unix:{path}")
+        scenarios.append(scenario)
+
+    # Connecting before a socket exists would only back off
+    deadline = time.monotonic() + 30
+    while not all(os.path.exists(address[5:]) for address in addresses):
+        if time.monotonic() > deadline:
+            raise RuntimeError("agents did not start")
+        time.sleep(0.05)
+    return processes, addresses, scenarios
+
+# Run the main loop until `done(snapshot)` holds for a merged snapshot or
+# `timeout` seconds pass; returns the seconds it took, None on timeout
+def run_until(collector, done, timeout=60):
+    loop = GLib.MainLoop()
+    finished = []
+
+    def check(snapshot):
+        if done(snapshot):
+            finished.append(time.perf_counter())
+            loop.quit()
+
+    def expire():
+        loop.quit()
+        return False
+
+    started = time.perf_counter()
+    collector.subscribe(check)
+    timeout_id = GLib.timeout_add_seconds(timeout, expire)
+    loop.run()
+    collector.unsubscribe(check)
+    if finished:
+        GLib.source_remove(timeout_id)
+        return finished[0] - started
+    return None
+
+def received():
+    return stats.counters.get("remote:bytes received", 0)
+
+def report(name, seconds, size, hosts):
+    took = "timed out" if seconds is None else f"{seconds * 1e3:>9.1f} ms"
+    print(f"{name:<16} {took:>12} {size:>12,} bytes {size / hosts:>12,.0f} bytes/host", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="zfs-monitor agent protocol benchmark")
+    parser.add_argument("--hosts", type=int, default=10, help="number of agent processes")
+    parser.add_argument("--pools", type=int, default=1, help="pools per host")
+    parser.add_argument("--vdevs", type=int, default=100, help="vdevs per pool")
+    args = parser.parse_args()
+
+    pools = ["tank"] + [f"pool{n}" for n in range(1, args.pools)]
+    expected = args.hosts * len(pools)
+    directory = tempfile.mkdtemp(prefix="zfs-monitor-agents-")
+    processes = []
+    try:
+        processes, addresses, scenarios = start_agents(directory, args.hosts, pools, args.vdevs)
+        collector = RemoteCollector(addresses)
+
+        before = received()
+        seconds = run_until(collector, lambda snapshot: len(snapshot.pools) == expected and not snapshot.output)
+        report("first sync", seconds, received() - before, args.hosts)
+
+        changed = scenarios[:max(1, args.hosts // 2)]
+        for path in changed:
+            with open(path, 'w') as f:
+                f.write("degraded")
+        degraded = len(changed) * len(pools)
+        before = received()
+        collector.request(force=True)
+        seconds = run_until(collector, lambda snapshot: sum(
+            pool.state == 'DEGRADED' for pool in snapshot.pools.values()) == degraded)
+        report("half degraded", seconds, received() - before, args.hosts)
+
+        # Every agent answers; nothing but the acknowledgements comes back
+        before = received()
+        collector.request(force=True)
+        seconds = run_until(collector, lambda snapshot: True)
+        report("unchanged", seconds, received() - before, args.hosts)
+
+        merges = stats.histograms.get("merge:remote snapshots")
+        if merges:
+            print(f"{merges.count} merged snapshots, {merges.total / merges.count * 1e3:.2f} ms each "
+                  f"({merges.max * 1e3:.2f} ms max) for {expected} pools")
+        collector.close()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# Parser and refresh benchmarks over synthetic pools of 1 to 2000 vdevs.
+# Reports the median time per call, throughput (vdevs/s and input MB/s) and
+# the allocations of one call under tracemalloc: the peak, and what the
+# returned result still holds.
+#
+#   python3 benchmarks/run.py                      # every size and scenario
+#   python3 benchmarks/run.py --sizes 100,2000 --json results.json
+#   python3 benchmarks/run.py --baseline results.json   # compare with a run
+#
+# The "cycle" benchmark forks the fake `zpool` from benchmarks/bin, then
+# parses, evaluates the alert rules and renders the metrics body, the same
+# path a status refresh takes in the headless daemon. "alerts" evaluates a
+# snapshot on a fresh engine, "alerts_unchanged" the same snapshot again on
+# an engine that has already seen it, the steady state of a healthy pool.
+# "parse_iostat_lq" parses the -l/-q columns as well, "latency_window" adds
+# one interval of -w histograms to a full window and reads the quantiles.
+# "chart_update" feeds one report into a full hour-long chart per vdev,
+# the per-sample work of the Performance tab sparklines before painting.
+# "agent_delta" is an agent's work per snapshot when the pools alternate
+# between healthy and the scenario (diff, encode, compress), "agent_apply"
+# a monitor rebuilding every pool of one host from a full message.
+# benchmarks/agents.py covers the network side with real agent processes.
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import statistics
+import subprocess
+import tracemalloc
+from types import SimpleNamespace
+
+BENCHMARKS = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+sys.path.insert(0, BENCHMARKS)
+
+from synthetic import SCENARIOS, status_report, iostat_report, histogram_report
+from zfsmonitor.parsing import parse_zpool_status, parse_iostat, section_key
+from zfsmonitor.alerts import AlertEngine
+from zfsmonitor.latency import LatencyWindow, histogram_report_parser
+from zfsmonitor.exporter import render_status, render_report
+from zfsmonitor.history import report_series
+from zfsmonitor.charts import PixelColumns
+from zfsmonitor.protocol import SnapshotState, RemoteState, Compressor, encode
+
+SIZES = (1, 10, 100, 500, 2000)
+MIN_TIME = 0.2   # seconds of calls per measurement
+MIN_CALLS = 5
+
+# Median seconds per call of `function`
+def measure(function, min_time=MIN_TIME):
+    times = []
+    started = time.perf_counter()
+    while len(times) < MIN_CALLS or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+# (peak, retained) bytes allocated by one call of `function`
+def allocations(function):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        return peak - before, current - before
+    finally:
+        tracemalloc.stop()
+
+def fake_environment(pools, vdevs, scenario):
+    env = dict(os.environ)
+    env["PATH"] = os.path.join(BENCHMARKS, "bin") + os.pathsep + env.get("PATH", "")
+    env["ZPOOL_FAKE_POOLS"] = ' '.join(pools)
+    env["ZPOOL_FAKE_VDEVS"] = str(vdevs)
+    env["ZPOOL_FAKE_SCENARIO"] = scenario
+    return env
+
+# The report of one `zpool iostat -w` interval over the vdev trees in
+# `layout`; the repeated first pool completes it
+def parse_histograms(pools, layout, output):
+    parser = histogram_report_parser(lambda: layout)
+    next(parser)
+    for line in output.split('\n'):
+        parser.send(line)
+    return parser.send(f"{pools[0]} total_wait") or {}
+
+# Benchmarks of one pool shape as {name: (function, input bytes)}
+def cases(pools, vdevs, scenario):
+    status = status_report(pools, vdevs, scenario)
+    iostat = iostat_report(pools, vdevs, scenario)
+    extended = iostat_report(pools, vdevs, scenario, extended=True)
+    histograms = histogram_report(pools, vdevs, scenario)
+    snapshot = SimpleNamespace(pools=parse_zpool_status(status))
+    window = LatencyWindow()
+    for _ in range(window.size):
+        window.add(parse_histograms(pools, snapshot.pools, histograms))
+    snapshot.sections = {name: {'config': section_key(pool, 'config')} for name, pool in snapshot.pools.items()}
+    engine = AlertEngine()
+    engine.on_snapshot(snapshot)
+    env = fake_environment(pools, vdevs, scenario)
+
+    sample = dict(report_series(parse_iostat(iostat)))
+    charts = {path: PixelColumns(2, 600, 3600) for path, _ in sample}
+    clock = iter(range(10 ** 9))
+
+    agent = SnapshotState()
+    compressor = Compressor()
+    alternating = itertools.cycle((parse_zpool_status(status_report(pools, vdevs, 'healthy')), snapshot.pools))
+    full = SnapshotState()
+    full.update(snapshot.pools)
+    full = full.full()
+
+    def chart_update():
+        timestamp = next(clock)
+        for path, chart in charts.items():
+            chart.add(timestamp, (sample.get((path, 'read_ops')), sample.get((path, 'write_ops'))))
+            chart.top()
+
+    def render():
+        render_status(SimpleNamespace(pools=parse_zpool_status(status)))
+        return render_report(parse_iostat(iostat))
+
+    def cycle():
+        output = subprocess.run(["zpool", "status", "-p", *pools], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        snapshot = SimpleNamespace(pools=parse_zpool_status(output))
+        events = AlertEngine().evaluate(snapshot.pools)
+        return render_status(snapshot), events
+
+    return {
+        'parse_zpool_status': (lambda: parse_zpool_status(status), len(status)),
+        'parse_iostat': (lambda: parse_iostat(iostat), len(iostat)),
+        'parse_iostat_lq': (lambda: parse_iostat(extended), len(extended)),
+        'latency_window': (lambda: window.add(parse_histograms(pools, snapshot.pools, histograms)), len(histograms)),
+        'chart_update': (chart_update, len(iostat)),
+        'alerts': (lambda: AlertEngine().evaluate(snapshot.pools), len(status)),
+        'alerts_unchanged': (lambda: engine.on_snapshot(snapshot), len(status)),
+        'render_metrics': (render, len(status) + len(iostat)),
+        'cycle': (cycle, len(status)),
+        'agent_delta': (lambda: compressor.frame(encode(agent.update(next(alternating)) or {})), len(status)),
+        'agent_apply': (lambda: RemoteState("host:").apply(full), len(status)),
+    }
+
+def run(sizes, scenarios, pools, only=None):
+    results = []
+    for scenario in scenarios:
+        for vdevs in sizes:
+            for name, (function, size) in cases(pools, vdevs, scenario).items():
+                if only and name not in only:
+                    continue
+                seconds = measure(function)
+                peak, retained = allocations(function)
+                total_vdevs = vdevs * len(pools)
+                results.append({
+                    'benchmark': name, 'scenario': scenario, 'vdevs': total_vdevs,
+                    'seconds': seconds, 'vdevs_per_second': total_vdevs / seconds,
+                    'mb_per_second': size / seconds / 1e6,
+                    'peak_kib': peak / 1024, 'retained_kib': retained / 1024,
+                })
+                report(results[-1])
+    return results
+
+def key(result):
+    return (result['benchmark'], result['scenario'], result['vdevs'])
+
+def report(result, baseline=None):
+    line = (f"{result['benchmark']:<20} {result['scenario']:<12} {result['vdevs']:>6} "
+            f"{result['seconds'] * 1e3:>10.3f} ms {result['vdevs_per_second']:>12,.0f} vdev/s "
+            f"{result['mb_per_second']:>8.1f} MB/s {result['peak_kib']:>10.1f} KiB peak "
+            f"{result['retained_kib']:>8.1f} KiB result")
+    if baseline:
+        line += f"  {result['seconds'] / baseline['seconds']:>6.2f}x"
+    print(line, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="zfs-monitor parser and refresh benchmarks")
+    parser.add_argument("--sizes", default=','.join(map(str, SIZES)),
+                        help="comma-separated vdev counts per pool")
+    parser.add_argument("--scenarios", default=','.join(SCENARIOS),
+                        help="comma-separated scenarios: " + ', '.join(SCENARIOS))
+    parser.add_argument("--pools", type=int, default=1, help="number of pools")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare with the JSON of an earlier run (time ratio, >1 is slower)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    scenarios = args.scenarios.split(',')
+    pools = ["tank"] + [f"pool{n}" for n in range(1, args.pools)]
+    only = set(args.only.split(',')) if args.only else None
+
+    results = run(sizes, scenarios, pools, only)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {key(result): result for result in json.load(f)['results']}
+        print("\nCompared with", args.baseline)
+        for result in results:
+            report(result, baseline.get(key(result)))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'time': time.time(), 'results': results}, f, indent=1)
+
+if __name__ == "__main__":
+    main()
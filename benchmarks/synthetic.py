@@ -0,0 +1,198 @@
+# Synthetic `zpool status -p`, `zpool iostat -p -v [-l -q]` and
+# `zpool iostat -p -v -w` outputs for pools of any size. Layout: raidz2 groups of RAIDZ_WIDTH disks, a mirrored log and a
+# cache device. Scenarios:
+#   healthy      every vdev ONLINE, no errors
+#   degraded     one disk UNAVAIL and one FAULTED, parents DEGRADED
+#   resilvering  a disk being replaced, scan in progress
+#   errors       READ/WRITE/CKSUM counts on many disks and data errors
+import random
+import zlib
+
+SCENARIOS = ('healthy', 'degraded', 'resilvering', 'errors')
+RAIDZ_WIDTH = 8
+COLUMN = 40
+
+def disk_name(pool, n):
+    return f"wwn-0x5000c500{zlib.crc32(pool.encode()) & 0xffff:04x}{n:04x}"
+
+# (depth, name, state, read, write, cksum, annotation) rows of the config
+# table, pool first; `vdevs` counts every row below the pool
+def layout(pool, vdevs, scenario, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    extras = 4 if vdevs >= 8 else 0           # log mirror (3 rows) + cache
+    data_disks = max(1, vdevs - extras)
+    disk = 0
+    group_rows = []
+    if data_disks < RAIDZ_WIDTH + 1:
+        # Tiny pools: plain disks, no raidz
+        group_rows.append([None, [[1, disk_name(pool, n), 'ONLINE', 0, 0, 0, ''] for n in range(data_disks)]])
+        disk = data_disks
+    else:
+        # Each group is a raidz2 row plus its disks; the last takes the remainder
+        groups = data_disks // (RAIDZ_WIDTH + 1)
+        for group in range(groups):
+            width = RAIDZ_WIDTH if group < groups - 1 else data_disks - (groups - 1) * (RAIDZ_WIDTH + 1) - 1
+            children = []
+            for _ in range(width):
+                children.append([2, disk_name(pool, disk), 'ONLINE', 0, 0, 0, ''])
+                disk += 1
+            group_rows.append([[1, f"raidz2-{group}", 'ONLINE', 0, 0, 0, ''], children])
+
+    leaves = [child for _, children in group_rows for child in children]
+    if scenario == 'degraded' and leaves:
+        for state in ('UNAVAIL', 'FAULTED')[:len(leaves)]:
+            victim = rng.choice(leaves)
+            victim[2] = state
+            victim[6] = 'was /dev/sdx1' if state == 'UNAVAIL' else 'too many errors'
+            for header, children in group_rows:
+                if header and victim in children:
+                    header[2] = 'DEGRADED'
+    elif scenario == 'resilvering' and leaves:
+        for header, children in group_rows:
+            if header:
+                header[2] = 'DEGRADED'
+            old = children.pop(0)
+            depth = old[0]
+            children[0:0] = [
+                [depth, 'replacing-0', 'DEGRADED', 0, 0, 0, ''],
+                [depth + 1, old[1], 'UNAVAIL', 0, 0, 0, 'was /dev/sdx1'],
+                [depth + 1, disk_name(pool, disk), 'ONLINE', 0, 0, 0, '(resilvering)'],
+            ]
+            disk += 1
+            break
+    elif scenario == 'errors':
+        for leaf in rng.sample(leaves, max(1, len(leaves) // 5)):
+            leaf[3:6] = [rng.randint(0, 3), rng.randint(0, 2), rng.randint(1, 500)]
+
+    state = 'ONLINE' if scenario in ('healthy', 'errors') else 'DEGRADED'
+    rows.append([0, pool, state, 0, 0, 0, ''])
+    for header, children in group_rows:
+        if header:
+            rows.append(header)
+        rows.extend(children)
+    if extras:
+        rows.append([0, 'logs', '', None, None, None, ''])
+        rows.append([1, 'mirror-9000', 'ONLINE', 0, 0, 0, ''])
+        rows.append([2, disk_name(pool, 9000), 'ONLINE', 0, 0, 0, ''])
+        rows.append([2, disk_name(pool, 9001), 'ONLINE', 0, 0, 0, ''])
+        rows.append([0, 'cache', '', None, None, None, ''])
+        rows.append([1, disk_name(pool, 9002), 'ONLINE', 0, 0, 0, ''])
+    return rows
+
+def status_output(pool='tank', vdevs=100, scenario='healthy', seed=0):
+    rows = layout(pool, vdevs, scenario, seed)
+    lines = [f"  pool: {pool}", f" state: {rows[0][2]}"]
+    if scenario == 'degraded':
+        lines += [
+            "status: One or more devices could not be used because the label is missing or",
+            "\tinvalid.  Sufficient replicas exist for the pool to continue",
+            "\tfunctioning in a degraded state.",
+            "action: Replace the device using 'zpool replace'.",
+            "   see: https://openzfs.github.io/openzfs-docs/msg/ZFS-8000-4J",
+        ]
+    elif scenario == 'resilvering':
+        lines += [
+            "status: One or more devices is currently being resilvered.  The pool will",
+            "\tcontinue to function, possibly in a degraded state.",
+            "action: Wait for the resilver to complete.",
+            "  scan: resilver in progress since Sat Oct 17 03:12:45 2026",
+            "\t4398046511104 scanned at 1073741824/s, 2199023255552 issued at 536870912/s, 8796093022208 total",
+            "\t274877906944 resilvered, 25.00% done, 01:08:16 to go",
+        ]
+    elif scenario == 'errors':
+        lines += [
+            "status: One or more devices has experienced an error resulting in data",
+            "\tcorruption.  Applications may be affected.",
+            "action: Restore the file in question if possible.",
+        ]
+    if scenario != 'resilvering':
+        lines.append("  scan: scrub repaired 0B in 05:12:11 with 0 errors on Sun Oct 11 05:36:12 2026")
+    lines += ["config:", "", f"\t{'NAME':<{COLUMN}}  STATE     READ WRITE CKSUM"]
+    for depth, name, state, read, write, cksum, note in rows:
+        label = ' ' * (2 * depth) + name
+        if read is None:
+            lines.append(f"\t{label}")
+            continue
+        line = f"\t{label:<{COLUMN}}  {state:<8} {read:>5} {write:>5} {cksum:>5}"
+        lines.append(f"{line}  {note}" if note else line)
+    lines.append("")
+    if scenario == 'errors':
+        lines.append("errors: 12 data errors, use '-v' for a list")
+    else:
+        lines.append("errors: No known data errors")
+    return '\n'.join(lines) + '\n'
+
+# Columns added by -l (wait times in ns) and -q (queue depths): group line,
+# label line
+LATENCY_GROUPS = ('total_wait', 'disk_wait', 'syncq_wait', 'asyncq_wait', 'scrub', 'trim', 'rebuild')
+LATENCY_LABELS = ('read', 'write') * 4 + ('wait',) * 3
+QUEUE_GROUPS = ('syncq_read', 'syncq_write', 'asyncq_read', 'asyncq_write', 'scrubq_read', 'trimq_write', 'rebuildq_write')
+QUEUE_LABELS = ('pend', 'activ') * 7
+# Latency histogram columns and bucket upper bounds (1 ns to 137 s)
+HISTOGRAM_COLUMNS = 11
+HISTOGRAM_BOUNDS = [(1 << (bucket + 1)) - 1 for bucket in range(37)]
+
+def iostat_output(pool='tank', vdevs=100, scenario='healthy', seed=0, extended=False):
+    rng = random.Random(seed)
+    rows = layout(pool, vdevs, scenario, seed)
+    extra = len(LATENCY_LABELS) + len(QUEUE_LABELS) if extended else 0
+    dashes = (f"{'-' * COLUMN}  {'-----':>13}  {'-----':>13}  {'-----':>6}  {'-----':>6}  {'-----':>10}  {'-----':>10}"
+              + f"  {'-----':>10}" * extra)
+    lines = []
+    for depth, name, state, read, _, _, _ in rows:
+        label = ' ' * (2 * depth) + name
+        if read is None:
+            lines.append(f"{label:<{COLUMN}}  {'-':>13}  {'-':>13}  {'-':>6}  {'-':>6}  {'-':>10}  {'-':>10}"
+                         + f"  {'-':>10}" * extra)
+            continue
+        leaf = not name.startswith(('raidz', 'mirror', 'replacing')) and depth > 0
+        alloc, free = ('-', '-') if leaf and depth > 1 else (rng.randrange(1 << 40), rng.randrange(1 << 40))
+        ops = [rng.randrange(5000) if state != 'UNAVAIL' else 0 for _ in range(2)]
+        bandwidth = [op * rng.choice((4096, 131072)) for op in ops]
+        line = f"{label:<{COLUMN}}  {alloc:>13}  {free:>13}  {ops[0]:>6}  {ops[1]:>6}  {bandwidth[0]:>10}  {bandwidth[1]:>10}"
+        if extended:
+            waits = [rng.randrange(50000, 20000000) for _ in LATENCY_LABELS]
+            queues = [rng.randrange(32) for _ in QUEUE_LABELS]
+            line += ''.join(f"  {value:>10}" for value in waits + queues)
+        lines.append(line)
+    lines.append(dashes)
+    return '\n'.join(lines) + '\n'
+
+# One iostat interval over several pools, with the column headers
+def iostat_report(pools, vdevs=100, scenario='healthy', seed=0, extended=False):
+    groups = f"{'':<{COLUMN}}  {'capacity':>28}  {'operations':>14}  {'bandwidth':>22}"
+    labels = f"{'pool':<{COLUMN}}  {'alloc':>13}  {'free':>13}  {'read':>6}  {'write':>6}  {'read':>10}  {'write':>10}"
+    dashes = f"{'-' * COLUMN}  {'-----':>13}  {'-----':>13}  {'-----':>6}  {'-----':>6}  {'-----':>10}  {'-----':>10}"
+    if extended:
+        groups += ''.join(f"  {group:>22}" for group in LATENCY_GROUPS + QUEUE_GROUPS)
+        labels += ''.join(f"  {label:>10}" for label in LATENCY_LABELS + QUEUE_LABELS)
+        dashes += f"  {'-----':>10}" * (len(LATENCY_LABELS) + len(QUEUE_LABELS))
+    return '\n'.join((groups, labels, dashes)) + '\n' + ''.join(
+        iostat_output(pool, vdevs, scenario, seed, extended) for pool in pools
+    )
+
+# One `zpool iostat -p -v -w` interval: a block per pool and vdev
+def histogram_report(pools, vdevs=100, scenario='healthy', seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for pool in pools:
+        for _, name, _, read, _, _, _ in layout(pool, vdevs, scenario, seed):
+            if read is None:
+                continue
+            lines.append(f"{name:<{COLUMN}}  {'total_wait':>13}  {'disk_wait':>13}  {'syncq_wait':>13}  {'asyncq_wait':>13}")
+            lines.append(f"{'latency':<{COLUMN}}" + ''.join(
+                f"  {label:>6}" for label in ('read', 'write') * 4 + ('scrub', 'trim', 'rebuild')
+            ))
+            lines.append(f"{'-' * COLUMN}" + f"  {'-----':>6}" * HISTOGRAM_COLUMNS)
+            # Most I/Os between 65 us and 4 ms, a tail up to a second
+            for bucket, bound in enumerate(HISTOGRAM_BOUNDS):
+                counts = [rng.randrange(2000) if 16 <= bucket <= 21 else rng.randrange(20) if bucket <= 30 else 0
+                          for _ in range(HISTOGRAM_COLUMNS)]
+                lines.append(f"{bound:<{COLUMN}}" + ''.join(f"  {count:>6}" for count in counts))
+            lines.append('-' * (COLUMN + 8 * HISTOGRAM_COLUMNS))
+            lines.append('')
+    return '\n'.join(lines) + '\n'
+
+def status_report(pools, vdevs=100, scenario='healthy', seed=0):
+    return '\n'.join(status_output(pool, vdevs, scenario, seed) for pool in pools)
@@ -0,0 +1,10 @@
+# The package and the synthetic `zpool` outputs of benchmarks/ are imported
+# straight from the checkout
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
@@ -0,0 +1,98 @@
+from synthetic import disk_name, status_report
+from zfsmonitor.alerts import RULES, AlertEngine, Rule
+from zfsmonitor.config import ALERT_COOLDOWN
+from zfsmonitor.parsing import PoolRecord, parse_zpool_status, section_key
+
+# What on_snapshot hands to evaluate(): the pools and their tree fingerprints
+def snapshot(scenario='healthy', vdevs=20):
+    pools = parse_zpool_status(status_report(['tank'], vdevs, scenario))
+    return pools, {name: section_key(pool, 'config') for name, pool in pools.items()}
+
+def evaluate(engine, pools, trees, now):
+    return [(kind, alert.rule.name, alert.vdev) for kind, alert in engine.evaluate(pools, 'status', trees, now)]
+
+def capacity(used):
+    pool = PoolRecord('tank')
+    pool.alloc, pool.free = used, 100 - used
+    return {'tank': pool}
+
+def test_capacity_hysteresis():
+    engine = AlertEngine()
+    kinds = []
+    for now, used in enumerate((70, 81, 85, 78, 76, 82, 74, 79)):
+        kinds.append([(kind, alert.detail) for kind, alert in engine.evaluate(capacity(used), 'iostat', now=now)])
+    # Opens at 80%, stays open down to 75% and only opens again at 80%
+    assert kinds == [[], [('open', '81%')], [('update', '85%')], [], [], [('update', '82%')],
+                     [('resolve', '82%')], []]
+
+def test_raise_and_clear_streaks():
+    rule = Rule('degraded', 'pool', "ALERTA", "{pool}", "", lambda pool, previous, now: pool.state == 'DEGRADED',
+                raise_after=3, clear_after=2)
+    engine = AlertEngine([rule])
+    pool = PoolRecord('tank')
+    kinds = []
+    for now, state in enumerate(('DEGRADED', 'DEGRADED', 'ONLINE', 'DEGRADED', 'DEGRADED', 'DEGRADED',
+                                 'ONLINE', 'DEGRADED', 'ONLINE', 'ONLINE')):
+        pool.state = state
+        kinds.append([kind for kind, _ in engine.evaluate({'tank': pool}, now=now)])
+    # A passing evaluation restarts the streak towards opening, a firing one
+    # the streak towards resolving
+    assert kinds == [[], [], [], [], [], ['open'], [], [], [], ['resolve']]
+    assert not engine.streaks
+
+def test_cooldown():
+    rule = Rule('degraded', 'pool', "ALERTA", "{pool}", "", lambda pool, previous, now: pool.state == 'DEGRADED')
+    engine = AlertEngine([rule])
+    pool = PoolRecord('tank')
+    notified = []
+    for now, state in ((0, 'DEGRADED'), (10, 'ONLINE'), (20, 'DEGRADED'), (30, 'ONLINE'),
+                       (ALERT_COOLDOWN + 1, 'DEGRADED')):
+        pool.state = state
+        notified += [alert.notify for kind, alert in engine.evaluate({'tank': pool}, now=now) if kind == 'open']
+    # Re-opening within the cooldown opens silently and does not restart it
+    assert notified == [True, False, True]
+
+def test_unchanged_tree_skips_vdev_rules():
+    calls = []
+    def check(vdev, previous, now):
+        calls.append(vdev.path)
+        return vdev.state == 'FAULTED'
+    engine = AlertEngine([Rule('faulted', 'vdev', "CRÍTICO", "{vdev}", "", check)])
+
+    pools, trees = snapshot('healthy')
+    assert evaluate(engine, pools, trees, 0) == []
+    assert len(calls) == len(pools['tank'].vdevs)
+    calls.clear()
+    assert evaluate(engine, *snapshot('healthy'), 1) == []
+    assert calls == []
+
+    pools, trees = snapshot('degraded')
+    faulted = [path for path, vdev in pools['tank'].vdevs.items() if vdev.state == 'FAULTED']
+    events = evaluate(engine, pools, trees, 2)
+    assert events == [('open', 'faulted', pools['tank'].vdevs[faulted[0]].name)]
+    calls.clear()
+    # Same tree again: only the vdev with an open alert is looked at
+    assert evaluate(engine, *snapshot('degraded'), 3) == []
+    assert calls == faulted
+
+    assert [kind for kind, _, _ in evaluate(engine, *snapshot('healthy'), 4)] == ['resolve']
+    assert not engine.alerts
+
+def test_new_errors_clear_after_three_snapshots():
+    engine = AlertEngine([rule for rule in RULES if rule.scope == 'vdev'])
+    path = f"tank/raidz2-0/{disk_name('tank', 3)}"
+
+    def with_errors(cksum):
+        pools, _ = snapshot()
+        pools['tank'].vdevs[path].cksum_errors = cksum
+        return pools, {'tank': section_key(pools['tank'], 'config')}
+
+    assert evaluate(engine, *with_errors(0), 0) == []
+    opened = evaluate(engine, *with_errors(4), 1)
+    assert sorted(name for _, name, _ in opened) == ['vdev-errors', 'vdev-new-errors']
+    assert engine.alerts[('vdev-new-errors', 'tank', path)].detail == 4
+    # No more errors: the tree is unchanged, yet the pending alert is checked
+    events = [evaluate(engine, *with_errors(4), now) for now in (2, 3, 4)]
+    assert events[:2] == [[], []]
+    assert events[2] == [('resolve', 'vdev-new-errors', disk_name('tank', 3))]
+    assert ('vdev-errors', 'tank', path) in engine.alerts
@@ -0,0 +1,110 @@
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import time
+from array import array
+
+import pytest
+
+from synthetic import status_report
+from zfsmonitor.config import STORE_RETENTION
+from zfsmonitor.export import FIELDS, Export, ExportCancelled, covering_step
+from zfsmonitor.parsing import parse_zpool_status
+
+KEYS = [['tank', 'read_ops'], ['tank/mirror-0', 'read_ops'], ['tank/mirror-0/sda', 'read_ops']]
+
+# A history database laid out like HistoryStore's: raw rows at 1000-1002
+# (float64 per series) and a 1 min rollup at 960 (float32 min/avg/max)
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "history.db")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE layouts (id INTEGER PRIMARY KEY, keys TEXT NOT NULL);
+        CREATE TABLE samples (
+            step INTEGER NOT NULL, ts INTEGER NOT NULL, layout INTEGER NOT NULL, data BLOB NOT NULL,
+            PRIMARY KEY (step, ts)
+        ) WITHOUT ROWID;
+    """)
+    db.execute("INSERT INTO layouts (id, keys) VALUES (1, ?)", (json.dumps(KEYS),))
+    for ts in (1000, 1001, 1002):
+        values = array('d', [ts + 0.5, ts + 0.25, float(ts)])
+        db.execute("INSERT INTO samples VALUES (1, ?, 1, ?)", (ts, values.tobytes()))
+    values = array('f', [1.0, 2.5, 4.0] * 3)
+    db.execute("INSERT INTO samples VALUES (60, 960, 1, ?)", (values.tobytes(),))
+    db.commit()
+    db.close()
+    return path
+
+def read_jsonl(path):
+    with open(path) as output:
+        return [json.loads(line) for line in output]
+
+def test_jsonl_raw_rows(tmp_path, database):
+    path = str(tmp_path / "out.jsonl")
+    export = Export(path, start=1001, step=1, database=database)
+    assert export.run() == 6
+    rows = read_jsonl(path)
+    assert rows[0] == {'kind': 'history', 'ts': 1001, 'step': 1, 'path': 'tank', 'metric': 'read_ops',
+                       'min': 1001.5, 'avg': 1001.5, 'max': 1001.5}
+    assert [(row['ts'], row['path']) for row in rows[:3]] == [
+        (1001, 'tank'), (1001, 'tank/mirror-0'), (1001, 'tank/mirror-0/sda')]
+    assert rows[-1]['avg'] == 1002.0
+    assert not os.path.exists(f"{path}.part")
+
+def test_csv_rollup_rows(tmp_path, database):
+    path = str(tmp_path / "out.csv")
+    assert Export(path, format='csv', step=60, database=database).run() == 3
+    with open(path, newline='') as output:
+        rows = list(csv.reader(output))
+    assert rows[0] == list(FIELDS)
+    row = dict(zip(FIELDS, rows[1]))
+    assert (row['kind'], row['ts'], row['step'], row['path']) == ('history', '960', '60', 'tank')
+    assert (row['min'], row['avg'], row['max']) == ('1', '2.5', '4')
+    assert row['state'] == row['errors'] == ''
+    assert all(len(line) == len(FIELDS) for line in rows)
+
+def test_patterns_and_status_rows(tmp_path, database):
+    pools = parse_zpool_status(status_report(['tank'], 12, 'errors'))
+    path = str(tmp_path / "out.jsonl.gz")
+    export = Export(path, compression='gzip', step=1, patterns=['tank/mirror-0*', 'tank/logs/*'],
+                    pools=pools, timestamp=1500, database=database)
+    export.run()
+    with gzip.open(path, 'rt') as output:
+        rows = [json.loads(line) for line in output]
+    status = [row for row in rows if row['kind'] == 'status']
+    history = [row for row in rows if row['kind'] == 'history']
+    assert status and all(row['path'].startswith('tank/logs/') for row in status)
+    assert all(row['ts'] == 1500 and 'errors' not in row for row in status)
+    assert [(row['ts'], row['path']) for row in history] == [
+        (ts, path) for ts in (1000, 1001, 1002) for path in ('tank/mirror-0', 'tank/mirror-0/sda')]
+    assert export.rows == len(rows)
+
+def test_status_only(tmp_path):
+    pools = parse_zpool_status(status_report(['tank'], 12, 'errors'))
+    path = str(tmp_path / "out.jsonl")
+    Export(path, pools=pools, history=False, database=str(tmp_path / "missing.db")).run()
+    rows = read_jsonl(path)
+    assert rows[0]['path'] == 'tank' and rows[0]['errors'] == "12 data errors, use '-v' for a list"
+    assert len(rows) == 1 + len(pools['tank'].vdevs)
+
+def test_cancel_removes_partial_file(tmp_path, database):
+    path = str(tmp_path / "out.jsonl")
+    export = Export(path, step=1, database=database)
+    export.cancel()
+    with pytest.raises(ExportCancelled):
+        export.run()
+    assert os.listdir(tmp_path) == ["history.db"]
+
+def test_covering_step():
+    now = 10 ** 9
+    assert covering_step(now - 3600, now) == 1
+    assert covering_step(now - STORE_RETENTION[1], now) == 1
+    assert covering_step(now - STORE_RETENTION[1] - 1, now) == 60
+    assert covering_step(now - STORE_RETENTION[60] - 1, now) == 900
+    # Older than anything kept: the coarsest step
+    assert covering_step(now - STORE_RETENTION[900] * 2, now) == 900
+    assert Export("x", start=time.time() - 7200, database="").step == 1
+    assert Export("x", database="").step == 900
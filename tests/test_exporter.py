@@ -0,0 +1,38 @@
+import http.client
+import socket
+
+import pytest
+
+from zfsmonitor.exporter import MetricsExporter
+
+def scrape(host, port, path="/metrics"):
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+def ipv6_loopback():
+    try:
+        with socket.socket(socket.AF_INET6) as probe:
+            probe.bind(("::1", 0))
+    except OSError:
+        return False
+    return True
+
+@pytest.mark.parametrize('address, host', [
+    ("127.0.0.1:0", "127.0.0.1"),
+    (":0", "127.0.0.1"),
+    pytest.param("[::1]:0", "::1", marks=pytest.mark.skipif(not ipv6_loopback(), reason="no IPv6 loopback")),
+])
+def test_listen_address(address, host):
+    exporter = MetricsExporter(address)
+    try:
+        port = exporter.server.server_address[1]
+        assert exporter.server.server_address[0] == host
+        assert scrape(host, port) == (200, b"# EOF\n")
+        assert scrape(host, port, "/other")[0] == 404
+    finally:
+        exporter.close()
@@ -0,0 +1,115 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import FIXTURES
+from zfsmonitor import kstat
+from zfsmonitor.config import KSTAT_RESCAN
+from zfsmonitor.kstat import KstatReader
+
+# A copy of tests/fixtures/kstat that the tests can rewrite
+@pytest.fixture
+def root(tmp_path):
+    path = tmp_path / "kstat"
+    shutil.copytree(os.path.join(FIXTURES, "kstat"), path)
+    return path
+
+def write_io(path, nread, nwritten, reads, writes):
+    lines = (path / "io").read_text().split('\n')
+    lines[2] = f"{nread} {nwritten} {reads} {writes} 0 0 0 0 0 0 0 0"
+    (path / "io").write_text('\n'.join(lines))
+
+def write_objset(path, name, counters, snaptime=1111):
+    lines = [f"49 1 0x01 7 2160 5710305284 {snaptime}", "name type data", f"dataset_name 7 {counters.pop('dataset_name')}"]
+    lines += [f"{field} 4 {value}" for field, value in counters.items()]
+    (path / name).write_text('\n'.join(lines) + '\n')
+
+def test_pools_are_found_under_root(root):
+    report = KstatReader(root=str(root)).sample(now=0)
+    assert sorted(report) == ['data', 'tank']
+    assert report['tank'].state == 'ONLINE'
+
+def test_first_sample_has_no_rates(root):
+    report = KstatReader(root=str(root)).sample(now=0)
+    assert report['tank'].read_ops is None
+    assert report['data'].write_bw is None
+
+def test_rates_come_from_deltas_between_samples(root):
+    reader = KstatReader(['tank'], root=str(root))
+    reader.sample(now=0)
+    write_io(root / "tank", nread=1048576 + 4096, nwritten=2097152 + 8192, reads=110, writes=240)
+    pool = reader.sample(now=2)['tank']
+    assert (pool.read_ops, pool.write_ops) == (5, 20)
+    assert (pool.read_bw, pool.write_bw) == (2048, 4096)
+
+def test_counter_reset_gives_no_rate(root):
+    reader = KstatReader(['tank'], root=str(root))
+    reader.sample(now=0)
+    write_io(root / "tank", nread=0, nwritten=0, reads=0, writes=0)
+    assert reader.sample(now=2)['tank'].read_ops is None
+
+# Without the io kstat (OpenZFS 2.x) the pool sums its datasets
+def test_pool_without_io_sums_its_datasets(root):
+    reader = KstatReader(['data'], root=str(root))
+    reader.sample(now=0)
+    write_objset(root / "data", "objset-0x36", {'dataset_name': 'data', 'writes': 5, 'nwritten': 20480,
+                                                'reads': 9, 'nread': 40960})
+    write_objset(root / "data", "objset-0x102", {'dataset_name': 'data/vm', 'writes': 17, 'nwritten': 28672,
+                                                 'reads': 7, 'nread': 57344})
+    pool = reader.sample(now=2)['data']
+    assert (pool.read_ops, pool.write_ops) == (2, 5)
+    assert (pool.read_bw, pool.write_bw) == (0, 0)
+
+def test_datasets_are_named_from_their_objsets(root):
+    datasets = KstatReader(['tank'], root=str(root)).sample_datasets(now=0)['tank']
+    assert sorted(dataset.name for dataset in datasets.values()) == ['tank', 'tank/home']
+    assert datasets['objset-0x85'].objset == '0x85'
+    assert datasets['objset-0x85'].nwritten == 81920
+
+# New objsets show up and removed ones are forgotten, on the next rescan only
+def test_rescan_follows_datasets(root):
+    reader = KstatReader(['tank'], root=str(root))
+    reader.sample_datasets(now=0)
+    write_objset(root / "tank", "objset-0x99", {'dataset_name': 'tank/new', 'reads': 1})
+    os.unlink(root / "tank" / "objset-0x85")
+
+    datasets = reader.sample_datasets(now=1)['tank']
+    assert 'objset-0x99' not in datasets
+
+    datasets = reader.sample_datasets(now=KSTAT_RESCAN)['tank']
+    assert sorted(datasets) == ['objset-0x36', 'objset-0x99']
+    assert datasets['objset-0x99'].name == 'tank/new'
+    assert 'objset-0x85' not in reader.readers['tank'].files
+
+# An objset whose table did not change (only the header's snaptime moves) is
+# idle: zero rates, and it is not parsed again
+def test_unchanged_objset_is_not_parsed(root, monkeypatch):
+    reader = KstatReader(['tank'], root=str(root))
+    reader.sample_datasets(now=0)
+    reader.sample_datasets(now=1)
+
+    parsed = []
+    parse_named = kstat.parse_named
+    monkeypatch.setattr(kstat, 'parse_named', lambda data: parsed.append(data) or parse_named(data))
+    for name in ("objset-0x36", "objset-0x85"):
+        path = root / "tank" / name
+        header, _, body = path.read_text().partition('\n')
+        path.write_text(header.replace("1111", "2222") + '\n' + body)
+    datasets = reader.sample_datasets(now=2)['tank']
+    assert parsed == []
+    assert datasets['objset-0x36'].read_ops == 0.0
+    assert datasets['objset-0x85'].write_bw == 0.0
+
+    write_objset(root / "tank", "objset-0x36", {'dataset_name': 'tank', 'writes': 14, 'nwritten': 40960,
+                                                'reads': 10, 'nread': 81920, 'nunlinks': 0, 'nunlinked': 0})
+    datasets = reader.sample_datasets(now=4)['tank']
+    assert len(parsed) == 1
+    assert datasets['objset-0x36'].write_ops == 2
+
+def test_vanished_pool_is_dropped(root):
+    reader = KstatReader(root=str(root))
+    reader.sample(now=0)
+    shutil.rmtree(root / "data")
+    assert sorted(reader.sample(now=1)) == ['tank']
+    assert sorted(reader.readers) == ['tank']
@@ -0,0 +1,109 @@
+from array import array
+
+import pytest
+
+from synthetic import status_report, histogram_report, iostat_report, HISTOGRAM_BOUNDS
+from zfsmonitor.parsing import parse_zpool_status, parse_iostat
+from zfsmonitor.latency import LatencyHistogram, LatencyWindow, histogram_report_parser
+
+POOLS = ['tank', 'pool1']
+
+@pytest.fixture(scope='module')
+def layout():
+    return parse_zpool_status(status_report(POOLS, 20))
+
+# One report per output: the repeated first pool completes it
+def parse(layout, output):
+    parser = histogram_report_parser(lambda: layout)
+    next(parser)
+    for line in output.split('\n'):
+        assert parser.send(line) is None
+    return parser.send(f"{POOLS[0]} total_wait")
+
+def test_blocks_are_keyed_by_vdev_path(layout):
+    report = parse(layout, histogram_report(POOLS, 20))
+    assert list(report) == POOLS
+    for name, pool in layout.items():
+        assert set(report[name]) == {name, *pool.vdevs}
+    # Same vdev name in both pools, two histograms
+    assert report['tank']['tank/raidz2-0'] is not report['pool1']['pool1/raidz2-0']
+    assert 'tank/logs/mirror-9000' in report['tank']
+
+def test_histogram_rows(layout):
+    report = parse(layout, histogram_report(POOLS, 20))
+    histogram = report['tank']['tank']
+    assert histogram.bounds == HISTOGRAM_BOUNDS
+    assert histogram.columns[:2] == ('total_wait_read', 'total_wait_write')
+    assert len(histogram.counts) == len(histogram.columns) * len(HISTOGRAM_BOUNDS)
+
+def test_unknown_vdev_is_kept_under_its_pool(layout):
+    output = histogram_report(['tank'], 20).replace('raidz2-0', 'raidz2-7')
+    report = parse(layout, output)
+    assert 'tank/raidz2-7' in report['tank']
+
+# A stray line made of one number must not end the generator
+def test_single_token_line_is_ignored(layout):
+    parser = histogram_report_parser(lambda: layout)
+    next(parser)
+    lines = histogram_report(POOLS, 20).split('\n')
+    lines.insert(4, '7')
+    for line in lines:
+        parser.send(line)
+    assert parser.send("tank total_wait") is not None
+
+def histogram(columns, count):
+    bounds = [10, 20, 40]
+    counts = array('Q', [0] * (len(columns) * len(bounds)))
+    counts[len(columns)] = count    # every I/O of the first column in the second bucket
+    return LatencyHistogram(columns, bounds, counts)
+
+def test_quantile_interpolates_inside_the_bucket():
+    h = histogram(('total_wait_read',), 100)
+    assert h.quantile('total_wait_read', 0.5) == 15
+    assert h.quantiles()['total_wait_read_p99'] == pytest.approx(19.9)
+    assert histogram(('total_wait_read',), 0).quantiles() == {}
+
+def test_pack_round_trips():
+    h = histogram(('total_wait_read', 'total_wait_write'), 12345)
+    assert LatencyHistogram.unpack(h.columns, h.bounds, h.pack()).counts == h.counts
+
+def test_window_sums_and_expires_intervals():
+    window = LatencyWindow(size=2)
+    columns = ('total_wait_read',)
+    for count in (100, 1, 1):
+        window.add({'tank': {'tank': histogram(columns, count)}})
+    total = window.totals['tank']
+    assert LatencyHistogram.unpack(columns, total[2], total[1]).counts[1] == 2
+
+    for _ in range(2):
+        window.add({'tank': {'tank': histogram(columns, 0)}})
+    assert window.quantiles['tank'] == {}
+
+# Shape A, then B, then A again: the first A interval expires into the new
+# A total and must not be taken from it
+def test_window_restart_does_not_subtract_older_intervals():
+    window = LatencyWindow(size=2)
+    a, b = ('total_wait_read',), ('total_wait_read', 'total_wait_write')
+    for h in (histogram(a, 100), histogram(b, 5), histogram(a, 1), histogram(a, 1)):
+        window.add({'tank': {'tank': h}})
+    total = window.totals['tank']
+    counts = LatencyHistogram.unpack(a, total[2], total[1]).counts
+    assert list(counts) == [0, 2, 0]
+    assert window.quantiles['tank']['total_wait_read_p50'] == 15
+
+def test_vdev_that_left_is_forgotten():
+    window = LatencyWindow(size=1)
+    columns = ('total_wait_read',)
+    window.add({'tank': {'tank': histogram(columns, 1), 'tank/sda': histogram(columns, 1)}})
+    window.add({'tank': {'tank': histogram(columns, 1)}})
+    assert 'tank/sda' not in window.totals
+    assert 'tank/sda' not in window.quantiles
+
+def test_annotate_matches_iostat_records_by_path(layout):
+    window = LatencyWindow()
+    window.add(parse(layout, histogram_report(POOLS, 20)))
+    report = parse_iostat(iostat_report(POOLS, 20))
+    window.annotate(report)
+    for pool in report.values():
+        for record in (pool, *pool.vdevs.values()):
+            assert record.latency['total_wait_read_p50'] == window.quantiles[record.path]['total_wait_read_p50']
@@ -0,0 +1,178 @@
+# Notifier against a private `dbus-daemon --session` with a stand-in
+# org.freedesktop.Notifications server on its own connection
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+if not shutil.which("dbus-daemon"):
+    pytest.skip("dbus-daemon not installed", allow_module_level=True)
+
+from gi.repository import GLib, Gio
+
+from zfsmonitor import notify
+from zfsmonitor.notify import Notifier, BUS_NAME, OBJECT_PATH, URGENCY_LOW
+
+INTERFACE = """
+<node>
+  <interface name="org.freedesktop.Notifications">
+    <method name="Notify">
+      <arg type="s" direction="in"/><arg type="u" direction="in"/><arg type="s" direction="in"/>
+      <arg type="s" direction="in"/><arg type="s" direction="in"/><arg type="as" direction="in"/>
+      <arg type="a{sv}" direction="in"/><arg type="i" direction="in"/><arg type="u" direction="out"/>
+    </method>
+    <method name="CloseNotification">
+      <arg type="u" direction="in"/>
+    </method>
+  </interface>
+</node>
+"""
+
+# Records every call; Notify answers with the id it replaces or a new one
+class NotificationServer:
+    def __init__(self, address):
+        self.calls = []
+        self.next_id = 1
+        self.connection = Gio.DBusConnection.new_for_address_sync(
+            address, Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION,
+            None, None
+        )
+        info = Gio.DBusNodeInfo.new_for_xml(INTERFACE).interfaces[0]
+        self.connection.register_object(OBJECT_PATH, info, self.method_call, None, None)
+        self.connection.call_sync(
+            "org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus", "RequestName",
+            GLib.Variant("(su)", (BUS_NAME, 4)), GLib.VariantType("(u)"), Gio.DBusCallFlags.NONE, -1, None
+        )
+
+    def method_call(self, connection, sender, path, interface, method, parameters, invocation):
+        parameters = parameters.unpack()
+        self.calls.append((method, parameters))
+        if method == "Notify":
+            notification_id = parameters[1]
+            if not notification_id:
+                notification_id, self.next_id = self.next_id, self.next_id + 1
+            invocation.return_value(GLib.Variant("(u)", (notification_id,)))
+        else:
+            invocation.return_value(None)
+
+    def notified(self):
+        return [(parameters[1], parameters[3], parameters[4]) for method, parameters in self.calls if method == "Notify"]
+
+    def closed(self):
+        return [parameters[0] for method, parameters in self.calls if method == "CloseNotification"]
+
+# The session bus connection is a per-process singleton, so one daemon
+# serves every test of the module
+@pytest.fixture(scope='module')
+def bus():
+    process = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                               stdout=subprocess.PIPE, text=True)
+    address = process.stdout.readline().strip()
+    previous = os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+    os.environ["DBUS_SESSION_BUS_ADDRESS"] = address
+    yield address
+    if previous is None:
+        del os.environ["DBUS_SESSION_BUS_ADDRESS"]
+    else:
+        os.environ["DBUS_SESSION_BUS_ADDRESS"] = previous
+    process.terminate()
+    process.wait()
+
+@pytest.fixture
+def server(bus):
+    server = NotificationServer(bus)
+    yield server
+    server.connection.close_sync(None)
+
+# Iterate the main loop until `done()` holds
+def run_until(done, timeout=5):
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + timeout
+    while not done():
+        assert time.monotonic() < deadline, "timed out"
+        context.iteration(False) or time.sleep(0.005)
+
+def settle(seconds=0.2):
+    deadline = time.monotonic() + seconds
+    run_until(lambda: time.monotonic() >= deadline)
+
+@pytest.fixture
+def fallbacks():
+    return []
+
+@pytest.fixture
+def notifier(server, fallbacks):
+    notifier = Notifier(fallback=lambda *args: fallbacks.append(('show', args[0])),
+                        dismiss=lambda key: fallbacks.append(('dismiss', key)),
+                        coalesce=0.05, rate=1000, burst=1000)
+    yield notifier
+    notifier.close()
+
+# Sent right after startup, before the bus lookup finished: still the bus
+def test_first_notification_waits_for_the_bus(server, notifier, fallbacks):
+    notifier.notify("a", "Disco falhou", "tank/sda")
+    notifier.flush()
+    run_until(lambda: server.notified())
+    assert server.notified() == [(0, "Disco falhou", "tank/sda")]
+    assert fallbacks == []
+
+def test_same_key_replaces_its_notification(server, notifier):
+    notifier.notify("a", "Um", "")
+    run_until(lambda: "a" in notifier.ids)
+    notifier.notify("a", "Dois", "")
+    run_until(lambda: len(server.notified()) == 2)
+    assert server.notified()[1][:2] == (notifier.ids["a"], "Dois")
+
+def test_burst_is_one_summary_replaced_by_its_keys(server, notifier):
+    for key in ("a", "b", "c"):
+        notifier.notify(key, f"Alerta {key}", "")
+    run_until(lambda: notify.SUMMARY_KEY in notifier.ids)
+    assert len(server.notified()) == 1
+    assert notifier.summary == {"a", "b", "c"}
+    assert all(notifier.shown(key) for key in "abc")
+
+    summary_id = notifier.ids[notify.SUMMARY_KEY]
+    notifier.notify("b", "Resolvido: Alerta b", "", URGENCY_LOW)
+    run_until(lambda: len(server.notified()) == 2)
+    assert server.notified()[1][:2] == (summary_id, "Resolvido: Alerta b")
+    assert notifier.ids["b"] == summary_id
+
+def test_withdrawing_one_key_keeps_the_summary(server, notifier):
+    for key in ("a", "b"):
+        notifier.notify(key, f"Alerta {key}", "")
+    run_until(lambda: notify.SUMMARY_KEY in notifier.ids)
+    summary_id = notifier.ids[notify.SUMMARY_KEY]
+
+    notifier.withdraw("a")
+    settle()
+    assert server.closed() == []
+    notifier.withdraw("b")
+    run_until(lambda: server.closed())
+    assert server.closed() == [summary_id]
+
+def test_withdrawn_before_flush_never_shows(server, notifier):
+    notifier.notify("a", "Alerta", "")
+    notifier.withdraw("a")
+    settle()
+    assert server.notified() == []
+
+def test_without_a_server_dialogs_are_shown_and_dismissed(server, notifier, fallbacks):
+    run_until(lambda: notifier.connection is not None)
+    notifier.available = False
+    for key in ("a", "b"):
+        notifier.notify(key, f"Alerta {key}", "")
+    run_until(lambda: fallbacks)
+    assert fallbacks == [('show', notify.SUMMARY_KEY)]
+
+    notifier.withdraw("a")
+    notifier.withdraw("b")
+    assert fallbacks[1:] == [('dismiss', "a"), ('dismiss', notify.SUMMARY_KEY), ('dismiss', "b")]
+
+def test_token_bucket():
+    bucket = notify.TokenBucket(rate=1, burst=2)
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+    assert 0 < bucket.wait() <= 1
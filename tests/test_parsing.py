@@ -0,0 +1,125 @@
+import pytest
+
+from synthetic import (SCENARIOS, LATENCY_GROUPS, LATENCY_LABELS, QUEUE_GROUPS, disk_name, iostat_output,
+                       iostat_report, layout, status_report)
+from zfsmonitor.parsing import LeafRecord, parse_iostat, parse_zpool_status
+
+POOLS = ('tank', 'backup')
+VDEVS = 40
+
+# What the status of `pool` should parse into, from the synthetic layout:
+# {path: (state, (read, write, cksum), annotation or None)}
+def expected_vdevs(pool, scenario):
+    expected = {}
+    prefix = pool
+    stack = []
+    for depth, name, state, read, write, cksum, note in layout(pool, VDEVS, scenario):
+        if depth == 0:
+            prefix = pool if name == pool else f"{pool}/{name}"
+            stack = []
+            continue
+        del stack[depth - 1:]
+        path = f"{stack[-1] if stack else prefix}/{name}"
+        stack.append(path)
+        expected[path] = (state, (read, write, cksum), note or None)
+    return expected
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_status_vdev_tree(scenario):
+    pools = parse_zpool_status(status_report(POOLS, VDEVS, scenario))
+    assert list(pools) == list(POOLS)
+    for name, pool in pools.items():
+        expected = expected_vdevs(name, scenario)
+        assert list(pool.vdevs) == list(expected)
+        for path, (state, errors, note) in expected.items():
+            record = pool.vdevs[path]
+            assert record.state == state, path
+            assert (record.read_errors, record.write_errors, record.cksum_errors) == errors, path
+            assert record.annotation == note, path
+        assert pool.state == layout(name, VDEVS, scenario)[0][2]
+        assert (pool.read_errors, pool.write_errors, pool.cksum_errors) == (0, 0, 0)
+
+def test_status_paths_and_classes():
+    pool = parse_zpool_status(status_report(['tank'], VDEVS))['tank']
+    disk = pool.vdevs[f"tank/raidz2-0/{disk_name('tank', 0)}"]
+    assert isinstance(disk, LeafRecord) and disk.vdev_class == 'data'
+    assert not isinstance(pool.vdevs['tank/raidz2-0'], LeafRecord)
+    assert pool.vdevs[f"tank/logs/mirror-9000/{disk_name('tank', 9001)}"].vdev_class == 'log'
+    assert pool.vdevs[f"tank/cache/{disk_name('tank', 9002)}"].vdev_class == 'cache'
+    # Top-level vdevs of every class hang off the pool
+    assert [child.name for child in pool.children] == ['raidz2-0', 'raidz2-1', 'raidz2-2', 'raidz2-3',
+                                                       'mirror-9000', disk_name('tank', 9002)]
+    assert len(pool.vdevs['tank/raidz2-0'].children) == 8
+
+def test_status_degraded():
+    pool = parse_zpool_status(status_report(['tank'], VDEVS, 'degraded'))['tank']
+    assert pool.state == 'DEGRADED'
+    assert pool.status.startswith("One or more devices could not be used")
+    assert pool.status.count('\n') == 2
+    assert pool.action == "Replace the device using 'zpool replace'."
+    states = sorted(record.state for record in pool.vdevs.values() if record.state != 'ONLINE')
+    assert 'UNAVAIL' in states and 'FAULTED' in states and 'DEGRADED' in states
+    assert pool.errors == "No known data errors"
+
+def test_status_resilvering():
+    pool = parse_zpool_status(status_report(['tank'], VDEVS, 'resilvering'))['tank']
+    replacing = pool.vdevs['tank/raidz2-0/replacing-0']
+    assert replacing.state == 'DEGRADED'
+    old, new = replacing.children
+    assert old.state == 'UNAVAIL' and old.annotation == 'was /dev/sdx1'
+    assert new.resilvering and not old.resilvering
+    assert pool.scan.startswith("resilver in progress since")
+    assert pool.scan.count('\n') == 2
+
+def test_status_errors():
+    pool = parse_zpool_status(status_report(['tank'], VDEVS, 'errors'))['tank']
+    counted = [record for record in pool.vdevs.values() if record.error_count]
+    assert counted and all(isinstance(record, LeafRecord) for record in counted)
+    assert pool.errors == "12 data errors, use '-v' for a list"
+    assert pool.state == 'ONLINE'
+    # Class headers have no counters
+    assert 'tank/logs' not in pool.vdevs
+
+# Numeric fields of every pool and vdev line of one pool's iostat block,
+# in output order
+def iostat_rows(pool, scenario, extended):
+    rows = []
+    for line in iostat_output(pool, VDEVS, scenario, extended=extended).split('\n'):
+        parts = line.split()
+        # Not the separator, nor a class header ("logs") with dashes only
+        if parts and not parts[0].startswith('-') and any(field != '-' for field in parts[1:]):
+            rows.append([None if field == '-' else int(field) for field in parts[1:]])
+    return rows
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_iostat_extended_columns(scenario):
+    report = parse_iostat(iostat_report(POOLS, VDEVS, scenario, extended=True))
+    assert list(report) == list(POOLS)
+    latency = [f"{group}_{label}" for group, label in zip(
+        [group for group in LATENCY_GROUPS[:4] for _ in range(2)] + list(LATENCY_GROUPS[4:]), LATENCY_LABELS
+    )]
+    queues = [f"{group}_{label}" for group in QUEUE_GROUPS for label in ('pend', 'activ')]
+    assert latency[:2] == ['total_wait_read', 'total_wait_write'] and latency[-1] == 'rebuild_wait'
+    for name, pool in report.items():
+        records = [pool, *pool.vdevs.values()]
+        rows = iostat_rows(name, scenario, True)
+        assert len(records) == len(rows)
+        for record, row in zip(records, rows):
+            basic, waits, depths = row[:6], row[6:6 + len(latency)], row[6 + len(latency):]
+            assert [record.alloc, record.free, record.read_ops, record.write_ops,
+                    record.read_bw, record.write_bw] == basic, record.path
+            assert record.latency == dict(zip(latency, waits)), record.path
+            assert record.queues == dict(zip(queues, depths)), record.path
+            assert record.read_wait == record.latency['total_wait_read']
+            assert record.queue_pending == sum(depths[0::2])
+            assert record.queue_active == sum(depths[1::2])
+
+def test_iostat_basic_columns():
+    report = parse_iostat(iostat_report(['tank'], VDEVS))
+    pool = report['tank']
+    assert pool.latency is None and pool.queues is None
+    rows = iostat_rows('tank', 'healthy', False)
+    assert [[record.alloc, record.free, record.read_ops, record.write_ops, record.read_bw, record.write_bw]
+            for record in (pool, *pool.vdevs.values())] == rows
+    # Leaves below a raidz have no capacity of their own
+    assert pool.vdevs[f"tank/raidz2-0/{disk_name('tank', 0)}"].alloc is None
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from synthetic import status_report
+from zfsmonitor.parsing import parse_zpool_status
+from zfsmonitor.protocol import (SnapshotState, RemoteState, MessageReader, Compressor, ProtocolError,
+                                 encode, flatten, parse_address)
+
+def pools(scenario='healthy', names=('tank',), vdevs=20):
+    return parse_zpool_status(status_report(list(names), vdevs, scenario))
+
+# What a client sees: every message through the wire format and back
+def transfer(*messages):
+    compressor = Compressor()
+    reader = MessageReader(compressed=True)
+    received = []
+    for message in messages:
+        received += reader.feed(compressor.frame(encode(message)))
+    return received
+
+def test_full_then_deltas_rebuild_the_same_tree():
+    agent = SnapshotState()
+    agent.update(pools())
+    client = RemoteState("nas1:")
+    full, = transfer(agent.full())
+    client.apply(full)
+    assert list(client.pools) == ['nas1:tank']
+    assert flatten(client.pools) == {f"nas1:{key}": value for key, value in flatten(pools()).items()}
+
+    delta = agent.update(pools('degraded'))
+    assert delta['seq'] == full['seq'] + 1
+    client.apply(transfer(delta)[0])
+    pool = client.pools['nas1:tank']
+    assert pool.state == 'DEGRADED'
+    assert {record.state for record in pool.vdevs.values()} >= {'UNAVAIL', 'FAULTED'}
+    assert pool.vdevs['nas1:tank/raidz2-0'].children
+
+def test_unchanged_snapshot_sends_nothing():
+    agent = SnapshotState()
+    agent.update(pools())
+    assert agent.update(pools()) is None
+
+# Only what changed travels
+def test_delta_carries_changed_records_only():
+    agent = SnapshotState()
+    agent.update(pools())
+    delta = agent.update(pools('degraded'))
+    assert 'order' not in delta and 'del' not in delta
+    assert len(delta['set']) < len(flatten(pools())) / 2
+
+def test_removed_pool_is_deleted():
+    agent = SnapshotState()
+    agent.update(pools(names=('tank', 'backup')))
+    client = RemoteState()
+    client.apply(agent.full())
+    delta = agent.update(pools(names=('tank',)))
+    assert 'backup' in delta['del']
+    client.apply(delta)
+    assert list(client.pools) == ['tank']
+
+def test_pool_order_is_kept():
+    agent = SnapshotState()
+    agent.update(pools(names=('tank', 'backup')))
+    client = RemoteState()
+    client.apply(agent.full())
+    client.apply(agent.update(pools('errors', names=('tank', 'backup'))))
+    assert list(client.pools) == ['tank', 'backup']
+
+def test_sequence_gap_is_an_error():
+    agent = SnapshotState()
+    agent.update(pools())
+    client = RemoteState()
+    client.apply(agent.full())
+    agent.update(pools('degraded'))
+    with pytest.raises(ProtocolError):
+        client.apply(agent.update(pools()))
+
+def test_delta_before_full_is_an_error():
+    agent = SnapshotState()
+    agent.update(pools())
+    with pytest.raises(ProtocolError):
+        RemoteState().apply(agent.update(pools('degraded')))
+
+def test_error_output_travels():
+    agent = SnapshotState()
+    agent.update({}, "no pools available")
+    client = RemoteState()
+    client.apply(agent.full())
+    assert client.error == "no pools available"
+    client.apply(agent.update(pools()))
+    assert client.error is None
+
+def test_unreachable_keeps_the_tree_unavailable():
+    agent = SnapshotState()
+    agent.update(pools())
+    client = RemoteState("nas1:")
+    client.apply(agent.full())
+    client.unreachable("Agente nas1 inacessível")
+    pool = client.pools['nas1:tank']
+    assert (pool.state, pool.status) == ('UNAVAIL', "Agente nas1 inacessível")
+    assert len(pool.vdevs) == len(pools()['tank'].vdevs)
+
+def test_reader_joins_split_lines():
+    reader = MessageReader()
+    data = encode({'type': 'refresh'}) + encode({'type': 'hello', 'name': 'x'})
+    assert reader.feed(data[:5]) == []
+    assert reader.feed(data[5:]) == [{'type': 'refresh'}, {'type': 'hello', 'name': 'x'}]
+
+@pytest.mark.parametrize('line', [b'[]\n', b'"full"\n', b'3\n', b'null\n'])
+def test_reader_rejects_non_objects(line):
+    with pytest.raises(ProtocolError):
+        MessageReader().feed(line)
+
+def test_reader_rejects_garbage():
+    with pytest.raises(ProtocolError):
+        MessageReader().feed(b'{"type":\n')
+    with pytest.raises(ProtocolError):
+        MessageReader(compressed=True).feed(b'not zlib')
+
+# Repeated paths cost next to nothing once compressed
+def test_full_snapshot_compresses():
+    agent = SnapshotState()
+    agent.update(pools(vdevs=500))
+    raw = encode(agent.full())
+    framed = Compressor().frame(raw)
+    assert len(framed) < len(raw) / 5
+    assert MessageReader(compressed=True).feed(framed) == [json.loads(raw)]
+
+@pytest.mark.parametrize('address, expected', [
+    ("unix:/run/zfs-monitor.sock", ('unix', '/run/zfs-monitor.sock')),
+    ("/run/x.sock", ('unix', '/run/x.sock')),
+    ("nas1", ('tcp', 'nas1:9135')),
+    ("nas1:9200", ('tcp', 'nas1:9200')),
+    (":9200", ('tcp', '127.0.0.1:9200')),
+    ("[::1]:9200", ('tcp', '[::1]:9200')),
+])
+def test_parse_address(address, expected):
+    assert parse_address(address, 9135) == expected
+
+def test_parse_address_needs_a_port():
+    with pytest.raises(ValueError):
+        parse_address("nas1")
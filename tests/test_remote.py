@@ -0,0 +1,119 @@
+# RemoteCollector against in-process agent servers on Unix sockets, both on
+# the default main context
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+
+from gi.repository import GLib
+
+from synthetic import status_report
+from zfsmonitor import remote
+from zfsmonitor.agent import AgentServer
+from zfsmonitor.collector import StatusSnapshot
+from zfsmonitor.parsing import parse_zpool_status
+from zfsmonitor.remote import RemoteCollector
+
+def snapshot(scenario='healthy'):
+    output = status_report(['tank'], 20, scenario)
+    return StatusSnapshot(time.monotonic(), output, parse_zpool_status(output))
+
+# Iterate the main loop until `done()` holds
+def run_until(done, timeout=10):
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + timeout
+    while not done():
+        assert time.monotonic() < deadline, "timed out"
+        context.iteration(False) or time.sleep(0.005)
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(remote, 'AGENT_RETRY', 0)
+    monkeypatch.setattr(remote, 'AGENT_COALESCE', 0.01)
+
+@pytest.fixture
+def address(tmp_path):
+    return f"unix:{tmp_path / 'agent.sock'}"
+
+def serve(address, name="nas1", scenario='healthy'):
+    server = AgentServer(address, name, lambda callback: callback(None))
+    server.publish(snapshot(scenario))
+    return server
+
+def state(collector, name='nas1:tank'):
+    pool = collector.snapshot.pools.get(name) if collector.snapshot else None
+    return pool.state if pool else None
+
+def test_pools_are_merged_under_the_agent_name(address):
+    server = serve(address)
+    collector = RemoteCollector([address])
+    run_until(lambda: state(collector) == 'ONLINE')
+    assert list(collector.snapshot.pools) == ['nas1:tank']
+    assert collector.snapshot.output == ''
+
+    server.publish(snapshot('degraded'))
+    run_until(lambda: state(collector) == 'DEGRADED')
+    collector.close()
+    server.close()
+
+def test_lost_agent_goes_unavailable_and_reconnects(address):
+    server = serve(address)
+    collector = RemoteCollector([address])
+    run_until(lambda: state(collector) == 'ONLINE')
+    link, = collector.links
+
+    server.close()
+    run_until(lambda: state(collector) == 'UNAVAIL')
+    assert not link.connected
+    assert "inacessível" in collector.snapshot.output
+
+    # The agent comes back with news; the link picks it up on its own
+    server = serve(address, scenario='degraded')
+    run_until(lambda: state(collector) == 'DEGRADED')
+    assert link.connected and link.error is None
+    assert link.failures == 0
+    collector.close()
+    server.close()
+
+# A message that is not a JSON object drops the connection, which is then
+# retried, instead of ending the read loop
+def test_malformed_message_fails_the_link(address):
+    server = serve(address)
+    collector = RemoteCollector([address])
+    run_until(lambda: state(collector) == 'ONLINE')
+    link, = collector.links
+
+    for client in list(server.connections):
+        client.send(b'[]\n')
+    run_until(lambda: link.error and "protocolo" in link.error)
+    run_until(lambda: link.connected and link.error is None)
+    collector.close()
+    server.close()
+
+def test_refresh_waits_for_every_agent(tmp_path):
+    addresses = [f"unix:{tmp_path / f'agent{n}.sock'}" for n in range(3)]
+    servers = [serve(address, f"nas{n}") for n, address in enumerate(addresses)]
+    collector = RemoteCollector(addresses)
+    run_until(lambda: collector.snapshot is not None and len(collector.snapshot.pools) == 3)
+
+    delivered = []
+    assert collector.request(delivered.append, force=True)
+    run_until(lambda: delivered)
+    assert sorted(delivered[0].pools) == ['nas0:tank', 'nas1:tank', 'nas2:tank']
+    collector.close()
+    for server in servers:
+        server.close()
+
+def test_same_name_gets_the_address(tmp_path):
+    addresses = [f"unix:{tmp_path / f'agent{n}.sock'}" for n in range(2)]
+    servers = [serve(address, "nas") for address in addresses]
+    collector = RemoteCollector(addresses)
+    run_until(lambda: collector.snapshot is not None and len(collector.snapshot.pools) == 2)
+    # Whichever hello comes second is told apart by its address
+    names = sorted(collector.snapshot.pools)
+    assert names[0] == 'nas:tank'
+    assert names[1] in (f"nas@{address}:tank" for address in addresses)
+    collector.close()
+    for server in servers:
+        server.close()
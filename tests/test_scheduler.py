@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("gi")
+
+from zfsmonitor.scheduler import Scheduler
+
+def test_raising_task_fails_and_keeps_the_timer():
+    scheduler = Scheduler(tick=5)
+    runs = []
+
+    def broken(done):
+        runs.append('broken')
+        raise RuntimeError("boom")
+
+    def healthy(done):
+        runs.append('healthy')
+        done(True)
+
+    scheduler.add('broken', broken, 30)
+    scheduler.add('healthy', healthy, 30)
+    scheduler.wakeup()
+    assert runs == ['broken', 'healthy']
+
+    task = scheduler.tasks['broken']
+    assert not task.running
+    assert task.failures == 1
+    assert scheduler.timeout_id is not None
+    # Backed off like any other failure
+    assert task.due - task.last >= 60
+    scheduler.stop()
+
+def test_done_after_failure_is_ignored():
+    scheduler = Scheduler(tick=5)
+    late = []
+
+    def broken(done):
+        late.append(done)
+        raise RuntimeError("boom")
+
+    task = scheduler.add('broken', broken, 30)
+    scheduler.wakeup()
+    late[0](True)
+    assert task.failures == 1
+    scheduler.stop()
+
+def test_busy_and_hidden_intervals():
+    scheduler = Scheduler(tick=5)
+    task = scheduler.add('status', lambda done: done(True), 30, busy_interval=10, hidden_interval=60,
+                         views=('status',))
+    assert scheduler.interval(task) == 60
+    scheduler.set_visible('status', True)
+    assert scheduler.interval(task) == 30
+    scheduler.set_busy(True)
+    assert scheduler.interval(task) == 10
+    scheduler.stop()
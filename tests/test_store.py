@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+from gi.repository import GLib
+
+from zfsmonitor import store as store_module
+from zfsmonitor.store import HistoryStore
+
+KEY = ('tank', 'read_ops')
+NOW = 900125   # 900000 is a 15 min boundary, 900120 a 1 min one
+
+# A store whose thread is stopped, so the tests drive the database directly
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module.time, 'time', lambda: NOW)
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.close()
+    store._open()
+    yield store
+    store.db.close()
+
+def raw_rows(store):
+    buckets = store._read(1, 0, 2 ** 31, 1, {})
+    return {ts: bucket[KEY][1] / bucket[KEY][3] for ts, bucket in buckets.items()}
+
+def query(store, start, end, resolution):
+    result = []
+    store._query(start, end, resolution, result.append)
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + 5
+    while not result and time.monotonic() < deadline:
+        context.iteration(False)
+    return result[0]
+
+def test_same_second_is_averaged(history):
+    history.append(1000.2, {}, [(KEY, 10.0)])
+    history.append(1000.7, {}, [(KEY, 20.0)])
+    history.append(1001.1, {}, [(KEY, 5.0)])
+    assert len(history.pending) == 2
+    history._flush()
+    assert raw_rows(history) == {1000: 15.0, 1001: 5.0}
+
+def test_same_second_across_flushes(history):
+    history.append(1000.1, {}, [(KEY, 10.0)])
+    history.append(1000.4, {}, [(KEY, 20.0)])
+    history._flush()
+    history.append(1000.9, {}, [(KEY, 60.0)])
+    history._flush()
+    assert raw_rows(history) == {1000: 30.0}
+
+def test_same_second_with_other_keys(history):
+    other = ('tank', 'write_ops')
+    history.append(1000.1, {}, [(KEY, 10.0)])
+    history.append(1000.5, {}, [(KEY, 30.0), (other, 4.0)])
+    history._flush()
+    row = history._read(1, 0, 2000, 1, {})[1000]
+    assert row[KEY][1] == 20.0
+    assert row[other][1] == 4.0
+
+def test_compact_rolls_up_complete_buckets(history):
+    # Four minutes of raw samples, the value being the second in its minute
+    for ts in range(NOW - 265, NOW):
+        history.append(ts, {}, [(KEY, ts % 60)])
+    history._flush()
+    history._compact()
+
+    minutes = history._read(60, 0, 2 ** 31, 60, {})
+    assert sorted(minutes) == [899820, 899880, 899940, 900000, 900060]
+    assert minutes[899880][KEY] == [0, 29.5 * 60, 59, 60]
+    # The first minute only has its last 20 seconds, the current one none
+    assert minutes[899820][KEY][0] == 40
+    assert history._watermark(60) == 900120
+    # 15 min rollups are made from the 1 min rows
+    quarters = history._read(900, 0, 2 ** 31, 900, {})
+    assert sorted(quarters) == [899100]
+    assert quarters[899100][KEY][0] == 0
+    assert quarters[899100][KEY][2] == 59
+    assert history._watermark(900) == 900000
+
+def test_compact_resumes_at_watermark(history, monkeypatch):
+    for ts in range(NOW - 65, NOW):
+        history.append(ts, {}, [(KEY, 1.0)])
+    history._flush()
+    history._compact()
+    assert sorted(history._read(60, 0, 2 ** 31, 60, {})) == [900060]
+
+    # A late raw row before the watermark is not rolled up again
+    history.append(900070, {}, [(KEY, 1000.0)])
+    for ts in range(NOW, NOW + 60):
+        history.append(ts, {}, [(KEY, 2.0)])
+    history._flush()
+    monkeypatch.setattr(store_module.time, 'time', lambda: NOW + 60)
+    history._compact()
+    minutes = history._read(60, 0, 2 ** 31, 60, {})
+    assert sorted(minutes) == [900060, 900120]
+    assert minutes[900060][KEY][2] == 1.0
+    # 900120-900124 from the first batch, the rest from the second
+    assert minutes[900120][KEY][1] / minutes[900120][KEY][3] == pytest.approx((5 * 1.0 + 55 * 2.0) / 60)
+    assert history._watermark(60) == 900180
+
+def test_compact_expires_old_rows(history):
+    history.append(NOW - store_module.STORE_RETENTION[1] - 10, {}, [(KEY, 1.0)])
+    history.append(NOW - 5, {}, [(KEY, 1.0)])
+    history._flush()
+    history._compact()
+    assert list(raw_rows(history)) == [NOW - 5]
+
+def test_query_stitches_steps(history):
+    for ts in range(NOW - 245, NOW):
+        history.append(ts, {}, [(KEY, 1.0 if ts < 900000 else 3.0 if ts < 900120 else 5.0)])
+    history._flush()
+    history._compact()
+    # Whatever is before the 1 min watermark can only come from rollups
+    history.db.execute("DELETE FROM samples WHERE step = 1 AND ts < 900120")
+
+    series = query(history, 899000, NOW + 1, 900)
+    # 899100 from the 15 min row; 900000 from two 1 min rows and the five
+    # raw seconds after them, merged into one point weighted by duration
+    assert [point[0] for point in series[KEY]] == [899100, 900000]
+    assert series[KEY][0][1:] == (1.0, 1.0, 1.0)
+    assert series[KEY][1][1] == 3.0
+    assert series[KEY][1][2] == pytest.approx((3.0 * 120 + 5.0 * 5) / 125)
+    assert series[KEY][1][3] == 5.0
+
+def test_query_at_raw_resolution(history):
+    history.append(1000, {}, [(KEY, 1.0)])
+    history.append(1002, {}, [(KEY, 2.0)])
+    series = query(history, 0, 2000, 1)
+    assert series[KEY] == [(1000, 1.0, 1.0, 1.0), (1002, 2.0, 2.0, 2.0)]
@@ -0,0 +1,222 @@
+# Agent mode (--agent ADDRESS): a small headless collector that polls
+# `zpool status` and serves every snapshot to remote monitors (--connect)
+# over a Unix or TCP socket, as deltas against what each one already has
+# (see protocol.py). Nothing but the status collector runs; never imports GTK.
+import os
+import stat
+import signal
+import socket
+
+from gi.repository import GLib, Gio
+
+from .config import AGENT_ADDRESS, AGENT_PORT, AGENT_REFRESH, AGENT_BACKLOG, STATUS_BUSY, POOLS
+from .collector import StatusCollector
+from .alerts import scan_in_progress
+from .scheduler import Scheduler
+from .protocol import (PROTOCOL_VERSION, SnapshotState, Compressor, MessageReader, ProtocolError,
+                       encode, parse_address)
+from .daemon import notify_systemd
+from .instrument import stats, log
+
+# One connected monitor. Its messages are compressed into a zlib stream of
+# its own and written one batch at a time; a monitor that falls more than
+# AGENT_BACKLOG bytes behind is dropped, and gets a full snapshot again when
+# it reconnects.
+class AgentConnection:
+    def __init__(self, server, connection):
+        self.server = server
+        self.connection = connection
+        self.output = connection.get_output_stream()
+        self.compressor = Compressor()
+        self.reader = MessageReader()
+        self.pending = bytearray()
+        self.writing = False
+        self.closed = False
+        self.cancellable = Gio.Cancellable()
+        connection.get_socket().set_keepalive(True)
+        connection.get_input_stream().read_bytes_async(65536, GLib.PRIORITY_DEFAULT, self.cancellable, self._read)
+
+    # Queue one encoded message
+    def send(self, data):
+        if self.closed:
+            return
+        self.pending += self.compressor.frame(data)
+        if len(self.pending) > AGENT_BACKLOG:
+            log(f"agent: dropping a client {len(self.pending)} bytes behind")
+            self.close()
+            return
+        self._write()
+
+    def _write(self):
+        if self.writing or not self.pending or self.closed:
+            return
+        data = bytes(self.pending)
+        self.pending.clear()
+        self.writing = True
+        stats.count("agent:bytes sent", len(data))
+        self.output.write_all_async(data, GLib.PRIORITY_DEFAULT, self.cancellable, self._written)
+
+    def _written(self, stream, async_result):
+        self.writing = False
+        try:
+            stream.write_all_finish(async_result)
+        except GLib.Error:
+            self.close()
+            return
+        self._write()
+
+    # Monitors only ever ask for a refresh
+    def _read(self, stream, async_result):
+        try:
+            data = stream.read_bytes_finish(async_result).get_data()
+        except GLib.Error:
+            data = b''
+        if self.closed:
+            return
+        if not data:
+            self.close()
+            return
+        try:
+            messages = self.reader.feed(data)
+        except ProtocolError as e:
+            log(f"agent: {e}")
+            self.close()
+            return
+        for message in messages:
+            if message.get('type') == 'refresh':
+                self.server.refresh(self)
+        stream.read_bytes_async(65536, GLib.PRIORITY_DEFAULT, self.cancellable, self._read)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.cancellable.cancel()
+        try:
+            self.connection.get_socket().close()
+        except GLib.Error:
+            pass
+        self.server.connections.discard(self)
+
+# Listening socket plus the published state. publish(snapshot) is a
+# StatusCollector subscriber: the delta is computed and encoded once and
+# queued on every connection; `on_refresh(callback)` runs `zpool status` now
+# and calls back once the result is published.
+class AgentServer:
+    def __init__(self, address, name, on_refresh):
+        self.name = name
+        self.on_refresh = on_refresh
+        self.state = SnapshotState()
+        self.connections = set()
+        self.path = None
+        self.service = Gio.SocketService.new()
+        kind, target = parse_address(address, AGENT_PORT)
+        if kind == 'unix':
+            # A socket left behind by a previous run, never any other file
+            if os.path.exists(target):
+                if not stat.S_ISSOCK(os.stat(target).st_mode):
+                    raise ValueError(f"{target} exists and is not a socket")
+                os.unlink(target)
+            socket_address = Gio.UnixSocketAddress.new(target)
+            self.path = target
+        else:
+            host, _, port = target.rpartition(':')
+            socket_address = Gio.InetSocketAddress.new_from_string(host.strip('[]'), int(port))
+            if socket_address is None:
+                raise ValueError(f"{host} is not an IP address to listen on")
+        try:
+            self.service.add_address(socket_address, Gio.SocketType.STREAM, Gio.SocketProtocol.DEFAULT, None)
+        except GLib.Error as e:
+            raise OSError(e.message) from None
+        self.service.connect("incoming", self._incoming)
+        self.service.start()
+
+    def _incoming(self, service, connection, source):
+        client = AgentConnection(self, connection)
+        self.connections.add(client)
+        stats.count("agent:connections")
+        client.send(encode({'type': 'hello', 'version': PROTOCOL_VERSION, 'name': self.name}))
+        client.send(encode(self.state.full()))
+        return True
+
+    def publish(self, snapshot):
+        error = None if snapshot.pools else (snapshot.output.strip() or "zpool status reported no pools")
+        message = self.state.update(snapshot.pools, error)
+        if message is None:
+            return
+        data = encode(message)
+        stats.count("agent:deltas")
+        for client in list(self.connections):
+            client.send(data)
+
+    # The forced snapshot reaches every monitor as a delta (if anything
+    # changed); the one that asked is also told that it is done
+    def refresh(self, client):
+        self.on_refresh(lambda snapshot: client.send(encode({'type': 'refreshed'})))
+
+    def close(self):
+        self.service.stop()
+        self.service.close()
+        for client in list(self.connections):
+            client.close()
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+class Agent:
+    def __init__(self, pools, address, name, profiler=None):
+        self.loop = GLib.MainLoop()
+        self.collector = StatusCollector(pools)
+        self.server = AgentServer(address, name, self.refresh)
+        self.collector.subscribe(self.server.publish)
+        self.collector.subscribe(self.on_snapshot)
+        self.scheduler = Scheduler()
+        self.profiler = profiler
+        if profiler:
+            self.collector.subscribe(self.on_profile_cycle)
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            GLib.unix_signal_add(GLib.PRIORITY_HIGH, signum, self.stop)
+        if self.profiler:
+            self.profiler.start()
+        self.scheduler.add('status', self.poll_status, AGENT_REFRESH, busy_interval=STATUS_BUSY)
+        notify_systemd("READY=1")
+        self.loop.run()
+
+    def stop(self):
+        notify_systemd("STOPPING=1")
+        self.scheduler.stop()
+        self.server.close()
+        self.loop.quit()
+        return GLib.SOURCE_REMOVE
+
+    def poll_status(self, done):
+        self.collector.request(callback=lambda snapshot: done(bool(snapshot.pools)))
+
+    def refresh(self, callback):
+        self.collector.request(callback=callback, force=True)
+
+    # Poll faster while a scrub or resilver runs
+    def on_snapshot(self, snapshot):
+        self.scheduler.set_busy(any(map(scan_in_progress, snapshot.pools.values())))
+
+    def on_profile_cycle(self, snapshot):
+        if self.profiler.cycle():
+            self.stop()
+
+# Serve on `address` under `name` (the host name by default) until
+# SIGTERM/SIGINT, profiling with `profiler` (an instrument.Profiler) when
+# given; returns the exit status
+def main(address=AGENT_ADDRESS, name=None, profiler=None):
+    name = name or socket.gethostname()
+    try:
+        agent = Agent(POOLS, address, name, profiler)
+    except (OSError, ValueError) as e:
+        log(f"Cannot serve the agent on {address}: {e}")
+        return 1
+    log(f"agent {name}: serving on {address}")
+    agent.run()
+    return 0
@@ -0,0 +1,326 @@
+# Alert rules and the engine that evaluates them, shared by the alerts tab,
+# the tray and the daemon. Rules are declared as data over the parsed
+# records (a pool or one of its vdevs), never over the raw text; the engine
+# keeps the open alerts and emits events when they open or resolve.
+import time
+from datetime import datetime
+
+from .config import ALERT_COOLDOWN, CAPACITY_ALERT, CAPACITY_CLEAR, SCRUB_MAX_AGE
+from .parsing import STATE_SEVERITY
+from .instrument import timed
+
+SEVERITIES = ('CRÍTICO', 'ALERTA', 'RECOMENDAÇÃO')
+
+# When the last scrub finished ("... on Sun Oct 11 05:36:12 2026"), or None
+def scrub_finished(pool):
+    scan = pool.scan or ""
+    if not scan.startswith("scrub repaired"):
+        return None
+    _, _, date = scan.split('\n', 1)[0].rpartition(' on ')
+    try:
+        return datetime.strptime(date.strip(), "%a %b %d %H:%M:%S %Y")
+    except ValueError:
+        return None
+
+# A scrub or resilver is running
+def scan_in_progress(pool):
+    return bool(pool.scan) and "in progress" in pool.scan.split('\n', 1)[0]
+
+def has_data_errors(pool):
+    return bool(pool.errors) and pool.errors.lower() != 'no known data errors'
+
+# Fraction of the pool in use, None without capacity columns
+def capacity_used(pool):
+    if pool.alloc is None or pool.free is None or pool.alloc + pool.free == 0:
+        return None
+    return pool.alloc / (pool.alloc + pool.free)
+
+# Rule checks take (record, previous record or None, now) and return None
+# when the record says nothing about the rule, a false value when it passes
+# and a true one when it fires; that value fills {detail} in the texts.
+def check_pool_degraded(pool, previous, now):
+    return pool.state and pool.state == "DEGRADED"
+
+def check_pool_failed(pool, previous, now):
+    return pool.state and STATE_SEVERITY.get(pool.state, 0) >= 3 and pool.state
+
+def check_missing_label(pool, previous, now):
+    return bool(pool.status) and "missing or" in pool.status and "invalid" in pool.status
+
+def check_data_errors(pool, previous, now):
+    return has_data_errors(pool) and pool.errors
+
+def check_capacity(pool, previous, now):
+    used = capacity_used(pool)
+    return None if used is None else used >= CAPACITY_ALERT and f"{used:.0%}"
+
+def clear_capacity(pool, previous, now):
+    used = capacity_used(pool)
+    return used is not None and used < CAPACITY_CLEAR
+
+def check_scrub_age(pool, previous, now):
+    finished = scrub_finished(pool)
+    if finished is None:
+        return False
+    days = (datetime.fromtimestamp(now) - finished).days
+    return days > SCRUB_MAX_AGE and days
+
+def check_vdev_faulted(vdev, previous, now):
+    return vdev.state and vdev.state == "FAULTED"
+
+def check_vdev_unavailable(vdev, previous, now):
+    return vdev.state and vdev.state in ("UNAVAIL", "REMOVED") and vdev.state
+
+def check_vdev_errors(vdev, previous, now):
+    if vdev.error_count is None:
+        return None
+    return vdev.error_count > 0 and f"{vdev.read_errors}/{vdev.write_errors}/{vdev.cksum_errors}"
+
+# New errors since the previous snapshot; `zpool clear` resets the counters
+def check_vdev_new_errors(vdev, previous, now):
+    if vdev.error_count is None or previous is None or previous.error_count is None:
+        return None
+    return vdev.error_count > previous.error_count and vdev.error_count - previous.error_count
+
+def check_vdev_resilvering(vdev, previous, now):
+    return vdev.resilvering
+
+# A declarative alert rule. `scope` is "pool" or "vdev", `source` the feed
+# it reads ("status" snapshots or "iostat" reports). The alert opens after
+# `raise_after` firing evaluations in a row and resolves after `clear_after`
+# passing ones (or, with `clear`, ones where clear() holds); re-opening
+# within `cooldown` seconds of the last notification does not notify again.
+class Rule:
+    __slots__ = ('name', 'scope', 'source', 'severity', 'title', 'description',
+                 'check', 'clear', 'raise_after', 'clear_after', 'cooldown')
+
+    def __init__(self, name, scope, severity, title, description, check, source='status',
+                 clear=None, raise_after=1, clear_after=1, cooldown=ALERT_COOLDOWN):
+        self.name = name
+        self.scope = scope
+        self.source = source
+        self.severity = severity
+        self.title = title
+        self.description = description
+        self.check = check
+        self.clear = clear
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.cooldown = cooldown
+
+RULES = (
+    Rule('pool-degraded', 'pool', "CRÍTICO", "Pool {pool} em estado DEGRADED",
+         "O pool está funcionando com capacidade reduzida. Substitua dispositivos com falha imediatamente.",
+         check_pool_degraded),
+    Rule('pool-failed', 'pool', "CRÍTICO", "Pool {pool} em estado {detail}",
+         "O pool tem falhas graves. Dados podem estar em risco. Ação imediata necessária.",
+         check_pool_failed),
+    Rule('missing-label', 'pool', "ALERTA", "Label ausente ou inválido em {pool}",
+         "Dispositivos com labels ausentes ou inválidos detectados. Pode afetar a redundância.",
+         check_missing_label),
+    Rule('data-errors', 'pool', "ALERTA", "Dados corrompidos em {pool}", "{detail}",
+         check_data_errors),
+    Rule('capacity', 'pool', "ALERTA", "Pool {pool} quase cheio",
+         "{detail} do espaço em uso. O desempenho do ZFS cai com o pool muito cheio; libere espaço ou adicione vdevs.",
+         check_capacity, source='iostat', clear=clear_capacity),
+    Rule('scrub-age', 'pool', "RECOMENDAÇÃO", "Scrub desatualizado em {pool}",
+         "Último scrub foi há {detail} dias. Recomenda-se executar scrub.",
+         check_scrub_age),
+    Rule('vdev-faulted', 'vdev', "CRÍTICO", "Dispositivo {vdev} com falha em {pool}",
+         "O dispositivo está em estado FAULTED. Substitua-o o quanto antes.",
+         check_vdev_faulted),
+    Rule('vdev-unavailable', 'vdev', "ALERTA", "Dispositivo {vdev} indisponível em {pool}",
+         "Estado {detail}: o dispositivo não está acessível. Verifique conexões e hardware.",
+         check_vdev_unavailable),
+    Rule('vdev-errors', 'vdev', "ALERTA", "Erros no dispositivo {vdev} ({pool})",
+         "Erros de leitura/escrita/checksum: {detail}. Monitore a situação; 'zpool clear' zera os contadores.",
+         check_vdev_errors),
+    Rule('vdev-new-errors', 'vdev', "CRÍTICO", "Erros aumentando em {vdev} ({pool})",
+         "{detail} novos erros desde a verificação anterior. O dispositivo pode estar falhando.",
+         check_vdev_new_errors, clear_after=3),
+    Rule('vdev-resilvering', 'vdev', "RECOMENDAÇÃO", "Resilver em andamento em {vdev} ({pool})",
+         "Reconstruindo o dispositivo. Evite operações pesadas até o término.",
+         check_vdev_resilvering),
+)
+
+# One open (or resolved) alert: a rule firing on one pool or vdev
+class Alert:
+    __slots__ = ('rule', 'pool', 'vdev', 'detail', 'opened', 'resolved', 'notify')
+
+    def __init__(self, rule, pool, vdev, detail, opened):
+        self.rule = rule
+        self.pool = pool
+        self.vdev = vdev
+        self.detail = detail
+        self.opened = opened
+        self.resolved = None
+        self.notify = True
+
+    @property
+    def severity(self):
+        return self.rule.severity
+
+    @property
+    def title(self):
+        return self.rule.title.format(pool=self.pool, vdev=self.vdev, detail=self.detail)
+
+    @property
+    def description(self):
+        return self.rule.description.format(pool=self.pool, vdev=self.vdev, detail=self.detail)
+
+def alert_order(alert):
+    return SEVERITIES.index(alert.severity), alert.pool, alert.title
+
+# What the vdev rules read from a record; vdevs whose fields did not change
+# since the previous snapshot are skipped unless they have an alert pending
+def vdev_key(record):
+    return (record.state, record.read_errors, record.write_errors, record.cksum_errors, record.annotation)
+
+# Evaluates RULES on every status snapshot (on_snapshot) and iostat report
+# (on_report). Alerts are keyed by (rule, pool, vdev path), so a condition
+# that persists is reported once. Subscribers receive the events of each
+# evaluation as a list of (kind, alert), kind being "open", "update" (the
+# detail changed) or "resolve". A pool whose vdev tree is unchanged costs
+# only its pool rules plus the vdevs with open or pending alerts.
+class AlertEngine:
+    def __init__(self, rules=RULES):
+        self.rules = {
+            (source, scope): [rule for rule in rules if (rule.source, rule.scope) == (source, scope)]
+            for source in ('status', 'iostat') for scope in ('pool', 'vdev')
+        }
+        self.alerts = {}     # key -> open Alert
+        self.streaks = {}    # key -> evaluations in a row towards opening or resolving
+        self.notified = {}   # key -> when it last opened with a notification
+        self.previous = {'status': {}, 'iostat': {}}   # source -> {pool name: PoolRecord}
+        self.trees = {}      # pool name -> vdev tree fingerprint of the last snapshot
+        self.by_name = {rule.name: rule for rule in rules}
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    # Open alerts, most severe first
+    def active(self):
+        return sorted(self.alerts.values(), key=alert_order)
+
+    # Whether any open alert is more than a recommendation
+    def urgent(self):
+        return any(alert.severity != "RECOMENDAÇÃO" for alert in self.alerts.values())
+
+    def on_snapshot(self, snapshot):
+        trees = {name: sections['config'] for name, sections in snapshot.sections.items()}
+        self.publish(self.evaluate(snapshot.pools, 'status', trees))
+
+    def on_report(self, report):
+        self.publish(self.evaluate(report, 'iostat'))
+
+    def publish(self, events):
+        if events:
+            for callback in list(self.subscribers):
+                callback(events)
+
+    # Run the rules of `source` over {name: PoolRecord}; `trees` maps pool
+    # names to a fingerprint of their vdev tree when the caller has one.
+    # Returns the events. An empty `pools` (a failed command) changes nothing.
+    @timed("alerts:evaluate")
+    def evaluate(self, pools, source='status', trees=None, now=None):
+        now = time.time() if now is None else now
+        events = []
+        if not pools:
+            return events
+        previous = self.previous[source]
+        pool_rules = self.rules[source, 'pool']
+        vdev_rules = self.rules[source, 'vdev']
+
+        for name, pool in pools.items():
+            last = previous.get(name)
+            for rule in pool_rules:
+                self.step(rule, (rule.name, name, name), pool, last, now, events)
+
+            if vdev_rules:
+                pending = {key[2] for key in (*self.alerts, *self.streaks) if key[1] == name and key[2] != name}
+                unchanged = last is not None and trees is not None and trees.get(name) == self.trees.get(name)
+                for path in (pending if unchanged else pool.vdevs):
+                    record = pool.vdevs.get(path)
+                    before = last.vdevs.get(path) if last is not None else None
+                    if record is None:
+                        self.resolve_all(name, path, now, events)
+                    elif path in pending or before is None or vdev_key(record) != vdev_key(before):
+                        for rule in vdev_rules:
+                            self.step(rule, (rule.name, name, path), record, before, now, events)
+                if not unchanged:
+                    # Vdevs that left the tree (replaced or removed)
+                    for path in pending.difference(pool.vdevs):
+                        self.resolve_all(name, path, now, events)
+            previous[name] = pool
+
+        # Pools no longer reported (exported or destroyed)
+        for name in [name for name in previous if name not in pools]:
+            del previous[name]
+            self.resolve_all(name, None, now, events, source)
+        if trees is not None:
+            self.trees = trees
+        return events
+
+    # Advance one rule on one record: count firing (or passing) evaluations
+    # until the alert opens (or resolves)
+    def step(self, rule, key, record, previous, now, events):
+        detail = rule.check(record, previous, now)
+        alert = self.alerts.get(key)
+
+        if alert is None:
+            if detail is None:
+                return
+            if not detail:
+                self.streaks.pop(key, None)
+                return
+            streak = self.streaks.get(key, 0) + 1
+            if streak < rule.raise_after:
+                self.streaks[key] = streak
+                return
+            self.streaks.pop(key, None)
+            alert = self.alerts[key] = Alert(rule, key[1], getattr(record, 'name', key[1]), detail, now)
+            last = self.notified.get(key)
+            alert.notify = last is None or now - last >= rule.cooldown
+            if alert.notify:
+                self.notified[key] = now
+            events.append(("open", alert))
+            return
+
+        cleared = rule.clear(record, previous, now) if rule.clear else detail is not None and not detail
+        if not cleared:
+            self.streaks.pop(key, None)
+            if detail and detail != alert.detail:
+                alert.detail = detail
+                events.append(("update", alert))
+            return
+        streak = self.streaks.get(key, 0) + 1
+        if streak < rule.clear_after:
+            self.streaks[key] = streak
+            return
+        self.resolve(key, now, events)
+
+    def resolve(self, key, now, events):
+        self.streaks.pop(key, None)
+        alert = self.alerts.pop(key)
+        alert.resolved = now
+        events.append(("resolve", alert))
+
+    # Resolve every alert of a vdev path (or of the whole pool with path None)
+    def resolve_all(self, pool, path, now, events, source=None):
+        for key in [key for key in (*self.alerts, *self.streaks) if key[1] == pool]:
+            if path is not None and key[2] != path:
+                continue
+            if source is not None and self.by_name[key[0]].source != source:
+                continue
+            if key in self.alerts:
+                self.resolve(key, now, events)
+            else:
+                self.streaks.pop(key, None)
+
+# Pools in a critical state and pools reporting data errors
+def pool_problems(snapshot):
+    pools = snapshot.pools.values()
+    critical = [pool.name for pool in pools if STATE_SEVERITY.get(pool.state, 1) >= 2]
+    with_errors = [pool.name for pool in pools if has_data_errors(pool)]
+    return critical, with_errors
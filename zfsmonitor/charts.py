@@ -0,0 +1,102 @@
+# Per-pixel decimation for the live charts. A chart `width` pixels wide over
+# `seconds` keeps the min and max of every sample that fell into each pixel
+# column, in a ring like the history tiers. Drawing reads the ring, never
+# the samples, so an hour and a week both cost O(width); a new sample
+# touches one column and tells the chart how many columns time moved on,
+# which is all it has to scroll and paint.
+import math
+from array import array
+
+EMPTY = -1.0   # charted metrics are never negative
+
+class PixelColumns:
+    __slots__ = ('width', 'span', 'lows', 'highs', 'head', 'peak')
+
+    def __init__(self, series, width, seconds):
+        self.width = width
+        self.span = seconds / width   # seconds per pixel
+        self.lows = [array('d', [EMPTY]) * width for _ in range(series)]
+        self.highs = [array('d', [EMPTY]) * width for _ in range(series)]
+        self.head = None              # pixel number of the newest column
+        self.peak = EMPTY             # highest value on screen, None once unknown
+
+    # Make `pixel` the newest column, emptying the ones it scrolls in;
+    # returns how many columns that is
+    def advance(self, pixel):
+        if self.head is None:
+            self.head = pixel
+            return 0
+        shift = pixel - self.head
+        if shift <= 0:
+            return 0
+        for number in range(self.head + 1, self.head + 1 + min(shift, self.width)):
+            slot = number % self.width
+            for lows, highs in zip(self.lows, self.highs):
+                lows[slot] = highs[slot] = EMPTY
+        self.head = pixel
+        # The highest column may have scrolled out
+        self.peak = None
+        return shift
+
+    # Widen the column of `timestamp` to [low, high] for one series
+    def merge(self, series, timestamp, low, high):
+        pixel = int(timestamp // self.span)
+        self.advance(pixel)
+        if pixel <= self.head - self.width:
+            return
+        slot = pixel % self.width
+        lows, highs = self.lows[series], self.highs[series]
+        if self.peak is not None and high > self.peak:
+            self.peak = high
+        if highs[slot] == EMPTY:
+            lows[slot], highs[slot] = low, high
+        else:
+            if low < lows[slot]:
+                lows[slot] = low
+            if high > highs[slot]:
+                highs[slot] = high
+
+    # One sample, a value (or None) per series; returns the columns scrolled
+    def add(self, timestamp, values):
+        shift = self.advance(int(timestamp // self.span))
+        for series, value in enumerate(values):
+            if value is not None:
+                self.merge(series, timestamp, value, value)
+        return shift
+
+    # Every point (ts, min, avg, max) of a history tier, oldest first
+    def fill(self, series, points):
+        for timestamp, low, _, high in points:
+            self.merge(series, timestamp, low, high)
+
+    # (low, high) of the column drawn at `x` (0 is the oldest), None if empty
+    def column(self, series, x):
+        if self.head is None:
+            return None
+        slot = (self.head - (self.width - 1 - x)) % self.width
+        high = self.highs[series][slot]
+        return None if high == EMPTY else (self.lows[series][slot], high)
+
+    # Highest value on screen, EMPTY without any; only scanned again after
+    # time moved on
+    def top(self):
+        if self.peak is None:
+            self.peak = max(max(highs) for highs in self.highs) if self.highs else EMPTY
+        return self.peak
+
+# Finest history tier that covers `seconds`, to fill a chart from
+def covering_tier(tiers, seconds):
+    for tier in tiers:
+        if tier.step * tier.size >= seconds:
+            return tier
+    return tiers[-1]
+
+# Chart scale: the next 1, 2 or 5 times a power of ten, so the scale (and
+# a full repaint) only changes when a value crosses one of those
+def nice_ceiling(value):
+    if value <= 0:
+        return 1.0
+    power = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * power:
+            return float(step * power)
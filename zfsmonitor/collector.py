@@ -0,0 +1,271 @@
+# Status snapshots and the iostat stream, shared by every consumer
+import time
+
+from gi.repository import GLib, Gio
+
+from .config import STATUS_TTL, IOSTAT_RESTART, BACKOFF_MAX, SAMPLER_BACKEND, KSTAT_ROOT
+from .commands import runner
+from .parsing import parse_zpool_status, iostat_report_parser, STATUS_SECTIONS, section_key
+from .latency import histogram_report_parser
+from .kstat import KstatReader
+from .instrument import stats
+
+# One parsed `zpool status` run over every monitored pool, shared by every
+# consumer, parsed once into each pool's vdev tree. `fingerprint` hashes the
+# whole output and `sections` each rendered section per pool, so consumers
+# can skip or patch redraws when nothing (or only one section) changed.
+class StatusSnapshot:
+    __slots__ = ('timestamp', 'output', 'pools', 'fingerprint', 'sections')
+
+    def __init__(self, timestamp, output, pools):
+        self.timestamp = timestamp
+        self.output = output
+        self.pools = pools
+        self.fingerprint = hash(output)
+        self.sections = {
+            name: {section: section_key(pool, section) for section in STATUS_SECTIONS}
+            for name, pool in pools.items()
+        }
+
+# Central `zpool status` collector: TTL cache, single-flight fetches and
+# subscribers that receive every new snapshot on the main loop. One command
+# covers every pool in `pools` (all imported pools when empty).
+class StatusCollector:
+    remote = False   # see remote.RemoteCollector
+
+    def __init__(self, pools, ttl=STATUS_TTL):
+        self.pools = pools
+        self.ttl = ttl
+        self.snapshot = None
+        self.subscribers = []
+        self.waiters = None  # callbacks of the fetch in flight, None when idle
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        if self.snapshot is not None:
+            GLib.idle_add(self._deliver, callback, self.snapshot)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    # Deliver a snapshot no older than the TTL to `callback` (if given) and to
+    # the subscribers, forking `zpool status` only when nothing fresh is cached
+    # and no other fetch is already running. Returns True when a new snapshot
+    # is on its way, False when the cached one was served.
+    def request(self, callback=None, force=False):
+        snapshot = self.snapshot
+        fresh = snapshot is not None and time.monotonic() - snapshot.timestamp < self.ttl
+        if fresh and not force:
+            if callback:
+                GLib.idle_add(self._deliver, callback, snapshot)
+            return False
+        if self.waiters is not None:
+            if callback:
+                self.waiters.append(callback)
+            return True
+        self.waiters = [callback] if callback else []
+
+        runner.run(["zpool", "status", "-p", *self.pools], self._fetched, timeout=15)
+        return True
+
+    def _deliver(self, callback, snapshot):
+        callback(snapshot)
+        return False
+
+    def _fetched(self, result):
+        output = result.text()
+        with stats.timer("parse:zpool status"):
+            snapshot = StatusSnapshot(time.monotonic(), output, parse_zpool_status(output))
+        self.snapshot = snapshot
+        waiters, self.waiters = self.waiters, None
+
+        for callback in list(self.subscribers):
+            callback(snapshot)
+        for callback in waiters:
+            if callback not in self.subscribers:
+                callback(snapshot)
+
+# Long-lived `zpool iostat -p -v -y -l -q [POOL...] INTERVAL` child covering
+# every monitored pool, whose stdout is read asynchronously on the main loop
+# and parsed as it streams, delivering one report per interval
+class IostatSampler:
+    name = "zpool iostat"
+
+    def __init__(self, pools, on_report, on_error=None):
+        self.pools = pools
+        self.on_report = on_report
+        self.on_error = on_error
+        self.interval = None
+        self.process = None
+        self.cancellable = None
+        self.generation = 0
+        self.restart_id = None
+        self.failures = 0   # deaths in a row, for the restart backoff
+
+    def start(self, interval):
+        self.stop()
+        self.interval = interval
+        generation = self.generation
+
+        try:
+            process = Gio.Subprocess.new(
+                self.command(interval), Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE
+            )
+        except GLib.Error as e:
+            self._exited(generation, f"Unexpected error: {e.message}")
+            return
+
+        stats.fork(self.name)
+        self.process = process
+        self.cancellable = Gio.Cancellable()
+        parser = self.parser()
+        next(parser)
+        stream = Gio.DataInputStream.new(process.get_stdout_pipe())
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, self.cancellable, self._read, (process, parser, generation, [0.0]))
+
+    # -y skips the since-boot average, so every report is live activity;
+    # -l and -q add the wait times and queue depths
+    def command(self, interval):
+        return ["zpool", "iostat", "-p", "-v", "-y", "-l", "-q", *self.pools, str(interval)]
+
+    def parser(self):
+        return iostat_report_parser()
+
+    def stop(self):
+        self.generation += 1
+        if self.restart_id:
+            GLib.source_remove(self.restart_id)
+            self.restart_id = None
+        if self.process is not None:
+            self.cancellable.cancel()
+            self.process.force_exit()
+            self.process = None
+
+    def _read(self, stream, async_result, data):
+        process, parser, generation, parsing = data
+        try:
+            line, _ = stream.read_line_finish_utf8(async_result)
+        except GLib.Error:
+            line = None
+        if generation != self.generation:
+            return
+
+        if line is None:
+            # End of stream: collect stderr and the exit status
+            process.get_stderr_pipe().read_bytes_async(
+                65536, GLib.PRIORITY_DEFAULT, None, self._read_stderr, (process, generation)
+            )
+            return
+
+        # Parse time is summed over the lines of one report
+        start = time.perf_counter()
+        report = parser.send(line)
+        parsing[0] += time.perf_counter() - start
+        if report:
+            stats.observe(f"parse:{self.name}", parsing[0])
+            parsing[0] = 0.0
+            self.failures = 0
+            self.on_report(report)
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, self.cancellable, self._read, data)
+
+    def _read_stderr(self, pipe, async_result, data):
+        process, generation = data
+        try:
+            stderr = pipe.read_bytes_finish(async_result).get_data().decode(errors='replace').strip()
+        except GLib.Error:
+            stderr = ""
+        process.wait_async(None, lambda proc, res: self._exited(
+            generation, f"Error {proc.get_exit_status() if proc.get_if_exited() else -proc.get_term_sig()}: {stderr}"
+        ))
+
+    # The child died on its own: report it and start a fresh one, waiting
+    # twice as long after each death without a report in between
+    def _exited(self, generation, message):
+        if generation == self.generation:
+            self.process = None
+            if self.on_error:
+                self.on_error(message)
+            delay = min(IOSTAT_RESTART * 2 ** self.failures, BACKOFF_MAX)
+            self.failures += 1
+            self.restart_id = GLib.timeout_add_seconds(delay, self._restart)
+        return False
+
+    def _restart(self):
+        self.restart_id = None
+        self.start(self.interval)
+        return False
+
+# A second stream, `zpool iostat -p -v -y -w`, for the latency histograms,
+# which zpool cannot print together with -l/-q. Reports come from
+# histogram_report_parser, which resolves each block against the vdev tree
+# of `collector`'s latest snapshot; without one yet, the stream starts once
+# the collector has fetched it.
+class HistogramSampler(IostatSampler):
+    name = "zpool iostat -w"
+
+    def __init__(self, pools, collector, on_report, on_error=None):
+        super().__init__(pools, on_report, on_error)
+        self.collector = collector
+
+    def start(self, interval):
+        if self.collector.snapshot is not None:
+            super().start(interval)
+            return
+        self.stop()
+        self.interval = interval
+        generation = self.generation
+        self.collector.request(lambda snapshot: generation == self.generation and self.start(interval))
+
+    def command(self, interval):
+        return ["zpool", "iostat", "-p", "-v", "-y", "-w", *self.pools, str(interval)]
+
+    def parser(self):
+        return histogram_report_parser(lambda: self.collector.snapshot.pools)
+
+# Drop-in alternative to IostatSampler that reads the kstats on a main loop
+# timer instead of keeping a `zpool` child; cheap enough for sub-second
+# intervals. Reports carry pool-level state and rates only.
+class KstatSampler:
+    def __init__(self, pools, on_report, on_error=None, root=KSTAT_ROOT):
+        self.reader = KstatReader(pools, root)
+        self.on_report = on_report
+        self.on_error = on_error
+        self.timeout_id = None
+        self.failing = False
+
+    def start(self, interval):
+        self.stop()
+        self.reader.sample()  # baseline for the first rates
+        self.timeout_id = GLib.timeout_add(int(interval * 1000), self._sample)
+
+    def stop(self):
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+
+    def _sample(self):
+        with stats.timer("sample:kstat"):
+            report = self.reader.sample()
+        if report:
+            self.failing = False
+            self.on_report(report)
+        elif not self.failing:
+            # Reported once until the kstats come back
+            self.failing = True
+            if self.on_error:
+                self.on_error(f"No pool kstats under {self.reader.root}")
+        return True
+
+# The iostat sampler selected by SAMPLER_BACKEND
+def make_sampler(pools, on_report, on_error=None):
+    if SAMPLER_BACKEND == "kstat":
+        return KstatSampler(pools, on_report, on_error)
+    return IostatSampler(pools, on_report, on_error)
+
+# The latency histogram sampler over `collector`'s vdev trees; None with the
+# kstat backend, which forks nothing
+def make_histogram_sampler(pools, collector, on_report, on_error=None):
+    if SAMPLER_BACKEND == "kstat":
+        return None
+    return HistogramSampler(pools, collector, on_report, on_error)
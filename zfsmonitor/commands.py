@@ -0,0 +1,133 @@
+# Running zpool/zfs commands: blocking before the main loop starts,
+# asynchronous on it
+import time
+import subprocess
+from collections import deque
+
+from gi.repository import GLib, Gio
+
+from .config import POOLS, MAX_CHILDREN
+from .instrument import stats
+
+# Function to run system commands with robust error handling. Blocks, so it
+# is only used before the main loop starts; everything else goes through
+# CommandRunner. `cmd` is an argv list, never run through a shell.
+def run_command(cmd, timeout=10):
+    stats.fork(' '.join(cmd[:2]))
+    try:
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+        return f"Error {result.returncode}: {result.stderr}"
+    except subprocess.TimeoutExpired:
+        return "Timeout: Command took too long to execute"
+    except Exception as e:
+        return f"Unexpected error: {str(e)}"
+
+# Outcome of one CommandRunner command
+class CommandResult:
+    __slots__ = ('argv', 'returncode', 'stdout', 'stderr', 'error')
+
+    def __init__(self, argv, returncode=None, stdout="", stderr="", error=None):
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.error = error  # set when the command timed out, was cancelled or could not start
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+    # Same text run_command returns: the output, or a description of the failure
+    def text(self):
+        if self.error is not None:
+            return self.error
+        if self.returncode == 0:
+            return self.stdout.strip()
+        return f"Error {self.returncode}: {self.stderr}"
+
+# Asynchronous command execution on the GLib main loop with Gio.Subprocess:
+# argv lists (no shell), per-command deadlines, cancellation and a cap on how
+# many children run at once. Callbacks always run on the main loop.
+class CommandRunner:
+    def __init__(self, max_children=MAX_CHILDREN):
+        self.max_children = max_children
+        self.running = 0
+        self.queue = deque()
+
+    # Queue `argv`; `callback(CommandResult)` is called when it finishes. The
+    # returned Gio.Cancellable stops the command (or drops it from the queue).
+    def run(self, argv, callback, timeout=10):
+        cancellable = Gio.Cancellable()
+        self.queue.append((argv, callback, timeout, cancellable))
+        self._start_next()
+        return cancellable
+
+    def _start_next(self):
+        while self.running < self.max_children and self.queue:
+            argv, callback, timeout, cancellable = self.queue.popleft()
+            if cancellable.is_cancelled():
+                callback(CommandResult(argv, error="Cancelled"))
+                continue
+            try:
+                process = Gio.Subprocess.new(argv, Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE)
+            except GLib.Error as e:
+                callback(CommandResult(argv, error=f"Unexpected error: {e.message}"))
+                continue
+            self.running += 1
+            stats.fork(' '.join(argv[:2]))
+            state = {'argv': argv, 'callback': callback, 'timed_out': False, 'started': time.monotonic()}
+            state['deadline'] = GLib.timeout_add_seconds(timeout, self._expire, process, state)
+            process.communicate_utf8_async(None, cancellable, self._finished, state)
+
+    def _expire(self, process, state):
+        state['timed_out'] = True
+        state['deadline'] = None
+        process.force_exit()
+        return False
+
+    def _finished(self, process, async_result, state):
+        if state['deadline']:
+            GLib.source_remove(state['deadline'])
+        self.running -= 1
+
+        argv = state['argv']
+        try:
+            _, stdout, stderr = process.communicate_utf8_finish(async_result)
+            if state['timed_out']:
+                result = CommandResult(argv, error="Timeout: Command took too long to execute")
+            elif process.get_if_exited():
+                result = CommandResult(argv, process.get_exit_status(), stdout or "", stderr or "")
+            else:
+                result = CommandResult(argv, -process.get_term_sig(), stdout or "", stderr or "")
+        except GLib.Error as e:
+            process.force_exit()
+            if e.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                result = CommandResult(argv, error="Cancelled")
+            else:
+                result = CommandResult(argv, error=f"Unexpected error: {e.message}")
+
+        # Latency per command ("zpool status", ...) and its failures
+        name = ' '.join(argv[:2])
+        stats.observe(f"command:{name}", time.monotonic() - state['started'])
+        if not result.ok:
+            stats.count(f"command failures:{name}")
+        state['callback'](result)
+        self._start_next()
+
+runner = CommandRunner()
+
+# Imported pools and the configured POOLS that are not among them
+def discover_pools():
+    output = run_command(["zpool", "list", "-H", "-o", "name"], timeout=5)
+    if output.startswith(("Error", "Timeout", "Unexpected")):
+        return [], POOLS
+    names = output.split()
+    return names, [name for name in POOLS if name not in names]
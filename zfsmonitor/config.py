@@ -0,0 +1,129 @@
+# Settings shared by the GUI and the headless daemon
+import os
+
+# Pools to monitor, e.g. ZPOOL_MONITOR_POOLS="tank backup"; empty means every imported pool
+POOLS = os.environ.get("ZPOOL_MONITOR_POOLS", "").replace(",", " ").split()
+REFRESH_INTERVAL = 5  # seconds for performance updates
+STATUS_REFRESH = 30   # seconds between status checks while the Status or Alerts tab is shown
+STATUS_IDLE = 60      # seconds between status checks while neither is shown
+STATUS_BUSY = 10      # seconds between status checks during a scrub/resilver or with alerts open
+IOSTAT_HIDDEN = 60    # iostat interval while the Performance tab is not shown
+STATUS_TTL = 5        # seconds a `zpool status` snapshot is reused before forking again
+IOSTAT_RESTART = 5    # seconds before restarting a `zpool iostat` stream that died
+MAX_CHILDREN = 4      # commands the runner lets run at the same time
+KSTAT_RESCAN = 30     # seconds between scans for new or removed objset kstats
+SCHEDULER_TICK = 5    # periodic tasks are aligned to this many seconds and share wakeups
+BACKOFF_MAX = 600     # seconds a failing task or iostat stream backs off to at most
+SLOW_FACTOR = 10      # a task waits at least this many times its last run's duration
+
+# Alert rules: seconds before a re-opened alert notifies again, pool capacity
+# that opens (and the lower one that resolves) the capacity alert, and days
+# since the last scrub before recommending one
+ALERT_COOLDOWN = 3600
+CAPACITY_ALERT = 0.80
+CAPACITY_CLEAR = 0.75
+SCRUB_MAX_AGE = 30
+
+# Scrub/resilver tracking: samples kept per scan (one per status snapshot),
+# seconds the rates are smoothed over and seconds without progress before a
+# scan counts as stalled
+SCAN_SAMPLES = 360
+SCAN_SMOOTHING = 60
+SCAN_STALL = 600
+
+# Latency histograms (`zpool iostat -w`): seconds per histogram interval
+# (at least the iostat interval) and intervals merged into the quantiles
+LATENCY_INTERVAL = 10
+LATENCY_WINDOW = 30
+
+# Datasets tab: seconds between `zfs list` runs while it is shown and
+# while it is not, the same for the objset kstat reads, seconds the growth
+# rate is smoothed over and how many datasets each ranking lists
+DATASET_REFRESH = 60
+DATASET_HIDDEN = 900
+DATASET_IO = 5
+DATASET_IO_HIDDEN = 600
+DATASET_SMOOTHING = 900
+DATASET_TOP = 10
+
+# Desktop notifications: seconds a burst is collected before it is sent (as
+# one summary when there are several), and a token bucket of NOTIFY_RATE
+# notifications per second with up to NOTIFY_BURST at once
+NOTIFY_COALESCE = 2
+NOTIFY_RATE = 1 / 30
+NOTIFY_BURST = 3
+
+# Where iostat samples come from: "zpool" (a `zpool iostat` stream, per vdev)
+# or "kstat" (pool-level rates read from KSTAT_ROOT, no forks)
+SAMPLER_BACKEND = os.environ.get("ZPOOL_MONITOR_BACKEND", "zpool")
+KSTAT_ROOT = "/proc/spl/kstat/zfs"
+
+# In-memory history tiers: (seconds per slot, number of slots)
+HISTORY_TIERS = (
+    (1, 3600),    # last hour at 1 s
+    (60, 1440),   # last day at 1 min
+    (900, 672),   # last week at 15 min
+)
+HISTORY_METRICS = ('alloc', 'free', 'read_ops', 'write_ops', 'read_bw', 'write_bw',
+                   'read_wait', 'write_wait', 'read_p50', 'write_p50', 'read_p99', 'write_p99',
+                   'read_p999', 'write_p999', 'queue_pending')
+# ArcRecord fields kept in the history, under the "arc" path
+ARC_METRICS = ('arc_size', 'arc_mru_size', 'arc_mfu_size', 'arc_hit_ratio', 'arc_demand_hit_ratio',
+               'arc_prefetch_hit_ratio', 'arc_evict_bw', 'l2_hit_ratio', 'l2_read_bw',
+               'zil_commit_rate', 'zil_slog_bw', 'dbuf_hit_ratio')
+
+# On-disk history: batched appends every STORE_FLUSH seconds, rolled up into
+# coarser steps and dropped after STORE_RETENTION seconds per step
+STORE_PATH = os.path.join(
+    os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share")),
+    "zfs-monitor", "history.db"
+)
+STORE_FLUSH = 30
+STORE_RETENTION = {
+    1: 24 * 3600,         # raw samples for a day
+    60: 14 * 24 * 3600,   # 1 min rollups for two weeks
+    900: 180 * 24 * 3600, # 15 min rollups for six months
+}
+HISTORY_LABELS = {
+    'alloc': "Alocado",
+    'free': "Livre",
+    'read_ops': "Ops leitura/s",
+    'write_ops': "Ops escrita/s",
+    'read_bw': "Banda leitura",
+    'write_bw': "Banda escrita",
+    'read_wait': "Espera leitura",
+    'write_wait': "Espera escrita",
+    'read_p50': "Leitura p50",
+    'write_p50': "Escrita p50",
+    'read_p99': "Leitura p99",
+    'write_p99': "Escrita p99",
+    'read_p999': "Leitura p99.9",
+    'write_p999': "Escrita p99.9",
+    'queue_pending': "Fila pendente",
+    'arc_size': "Tamanho ARC",
+    'arc_mru_size': "ARC MRU",
+    'arc_mfu_size': "ARC MFU",
+    'arc_hit_ratio': "Acertos ARC",
+    'arc_demand_hit_ratio': "Acertos ARC (demanda)",
+    'arc_prefetch_hit_ratio': "Acertos ARC (prefetch)",
+    'arc_evict_bw': "Despejo ARC",
+    'l2_hit_ratio': "Acertos L2ARC",
+    'l2_read_bw': "Leitura L2ARC",
+    'zil_commit_rate': "Commits ZIL/s",
+    'zil_slog_bw': "Escrita SLOG",
+    'dbuf_hit_ratio': "Acertos dbuf",
+}
+
+# OpenMetrics endpoint, e.g. ZPOOL_MONITOR_METRICS="127.0.0.1:9134"; empty disables it
+METRICS_ADDRESS = os.environ.get("ZPOOL_MONITOR_METRICS", "")
+
+# Agent mode: where --agent listens (e.g. ZPOOL_MONITOR_AGENT="0.0.0.0:9135"
+# or "unix:/run/zfs-monitor.sock") and the agents a monitor connects to
+# instead of running zpool locally (ZPOOL_MONITOR_AGENTS="nas1 nas2:9200")
+AGENT_ADDRESS = os.environ.get("ZPOOL_MONITOR_AGENT", "")
+AGENTS = os.environ.get("ZPOOL_MONITOR_AGENTS", "").replace(",", " ").split()
+AGENT_PORT = 9135           # TCP port when an address has none
+AGENT_REFRESH = 15          # seconds between status checks on an agent
+AGENT_BACKLOG = 4 * 2**20   # bytes queued for a client before it is dropped
+AGENT_RETRY = 5             # seconds before reconnecting, doubled per failure up to BACKOFF_MAX
+AGENT_COALESCE = 0.5        # seconds the monitor collects agent updates into one snapshot
@@ -0,0 +1,161 @@
+# Headless collector for servers without a display: the same status polling,
+# iostat stream, history store and alert engine as the tray application,
+# on a plain GLib main loop. Never imports GTK.
+import os
+import signal
+import socket
+import time
+
+from gi.repository import GLib
+
+from .config import POOLS, REFRESH_INTERVAL, STATUS_REFRESH, STATUS_BUSY, LATENCY_INTERVAL, METRICS_ADDRESS
+from .commands import discover_pools
+from .collector import StatusCollector, make_sampler, make_histogram_sampler
+from .latency import LatencyWindow
+from .store import HistoryStore
+from .kstat import ArcReader
+from .history import arc_series
+from .alerts import AlertEngine, scan_in_progress
+from .scheduler import Scheduler
+from .scan import ScanMonitor, format_eta
+from .exporter import MetricsExporter
+from .instrument import log
+
+# Report daemon state to systemd (Type=notify units); a no-op elsewhere
+def notify_systemd(state):
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(state.encode(), address)
+    except OSError:
+        pass
+
+class Daemon:
+    def __init__(self, pools, interval=REFRESH_INTERVAL, metrics=None, profiler=None):
+        self.interval = interval
+        self.loop = GLib.MainLoop()
+        self.collector = StatusCollector(pools)
+        self.alerts = AlertEngine()
+        self.alerts.subscribe(self.on_alerts)
+        self.collector.subscribe(self.alerts.on_snapshot)
+        self.collector.subscribe(self.on_snapshot)
+        self.scans = ScanMonitor()
+        self.scans.subscribe(self.on_scans)
+        self.collector.subscribe(self.scans.on_snapshot)
+        self.sampler = make_sampler(pools, self.on_report, self.on_error)
+        self.latency = LatencyWindow()
+        self.histograms = make_histogram_sampler(pools, self.collector, self.latency.add, self.on_histogram_error)
+        self.store = HistoryStore()
+        self.arc = ArcReader()
+        self.exporter = None
+        if metrics:
+            self.exporter = MetricsExporter(metrics)
+            self.collector.subscribe(self.exporter.update_status)
+        self.states = {}     # pool name -> last logged state
+        self.scheduler = Scheduler()
+        self.profiler = profiler
+        if profiler:
+            self.collector.subscribe(self.on_profile_cycle)
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            GLib.unix_signal_add(GLib.PRIORITY_HIGH, signum, self.stop)
+        if self.profiler:
+            self.profiler.start()
+        self.sampler.start(self.interval)
+        if self.histograms:
+            self.histograms.start(max(self.interval, LATENCY_INTERVAL))
+        self.scheduler.add('status', self.poll_status, STATUS_REFRESH, busy_interval=STATUS_BUSY)
+        notify_systemd("READY=1")
+        self.loop.run()
+
+    def stop(self):
+        notify_systemd("STOPPING=1")
+        self.scheduler.stop()
+        self.sampler.stop()
+        if self.histograms:
+            self.histograms.stop()
+        self.arc.close()
+        self.store.close()
+        if self.exporter:
+            self.exporter.close()
+        self.loop.quit()
+        return GLib.SOURCE_REMOVE
+
+    def poll_status(self, done):
+        self.collector.request(callback=lambda snapshot: done(bool(snapshot.pools)))
+
+    # Log pool state transitions
+    def on_snapshot(self, snapshot):
+        if not snapshot.pools:
+            log(f"zpool status failed: {snapshot.output.strip()}")
+            return
+
+        for name, pool in snapshot.pools.items():
+            if self.states.get(name) != pool.state:
+                log(f"pool {name}: {self.states.get(name, '-')} -> {pool.state}")
+                self.states[name] = pool.state
+        for name in [name for name in self.states if name not in snapshot.pools]:
+            log(f"pool {name}: no longer reported")
+            del self.states[name]
+        self.scheduler.set_busy(self.alerts.urgent() or any(map(scan_in_progress, snapshot.pools.values())))
+        notify_systemd(f"STATUS={', '.join(f'{name} {state}' for name, state in self.states.items())}")
+
+    def on_profile_cycle(self, snapshot):
+        if self.profiler.cycle():
+            self.stop()
+
+    # Log alerts as they open and resolve
+    def on_alerts(self, events):
+        for kind, alert in events:
+            if kind == "open":
+                log(f"{alert.severity}: {alert.title} - {alert.description}")
+            elif kind == "resolve":
+                log(f"resolved: {alert.title}")
+
+    # Log scans as they start, stall, resume and finish
+    def on_scans(self, events):
+        for kind, tracker in events:
+            progress = tracker.progress
+            if kind == "started":
+                log(f"pool {tracker.pool}: {progress.function} started, {format_eta(tracker.eta)} to go")
+            elif kind == "stalled":
+                log(f"pool {tracker.pool}: {progress.function} has made no progress for {format_eta(time.monotonic() - tracker.advanced)}")
+            elif kind == "resumed":
+                log(f"pool {tracker.pool}: {progress.function} progressing again, {format_eta(tracker.eta)} to go")
+            elif kind == "finished":
+                log(f"pool {tracker.pool}: {progress.function} no longer running")
+
+    def on_report(self, report):
+        self.latency.annotate(report)
+        arc = self.arc.sample()
+        self.store.append(time.time(), report, arc_series(arc) if arc else ())
+        self.alerts.on_report(report)
+        if self.exporter:
+            self.exporter.update_report(report)
+
+    def on_error(self, message):
+        log(f"iostat sampler: {message}")
+
+    def on_histogram_error(self, message):
+        log(f"latency histogram sampler: {message}")
+
+# Run the daemon until SIGTERM/SIGINT, serving OpenMetrics on `metrics`
+# (host:port) when given and profiling with `profiler` (an
+# instrument.Profiler) when given; returns the exit status
+def main(metrics=METRICS_ADDRESS, profiler=None):
+    names, missing = discover_pools()
+    if missing or not names:
+        log(f"Pools not found: {', '.join(missing)}" if missing else "No imported ZFS pool found.")
+        return 1
+    try:
+        daemon = Daemon(POOLS, metrics=metrics, profiler=profiler)
+    except (OSError, ValueError) as e:
+        log(f"Cannot serve metrics on {metrics}: {e}")
+        return 1
+    daemon.run()
+    return 0
@@ -0,0 +1,149 @@
+# Per-dataset usage from `zfs list -Hp` and logical I/O from the objset
+# kstats, for pools with thousands of datasets and zvols. Both refreshes are
+# incremental: a `zfs list` line identical to the previous run's is skipped
+# unparsed, and only datasets whose values moved are reported as changed, so
+# the view patches just those rows. Growth is the smoothed rate of the space
+# a dataset holds itself (`used` minus its children), so parents do not
+# rank above the child that is actually filling up.
+import heapq
+import math
+from operator import attrgetter
+
+from .config import DATASET_SMOOTHING
+from .parsing import parse_count
+
+# `zfs list -o` columns; the name comes first
+DATASET_PROPERTIES = ('name', 'type', 'used', 'avail', 'refer', 'quota', 'written',
+                      'usedbysnapshots', 'usedbychildren')
+
+def dataset_command(pools):
+    return ["zfs", "list", "-Hp", "-t", "filesystem,volume", "-o", ','.join(DATASET_PROPERTIES), "-r", *pools]
+
+# One filesystem or volume. Sizes are bytes, `quota` None without one,
+# `growth` bytes per second; I/O rates are None until the objset kstats
+# have been sampled twice (or when the dataset has none, e.g. unmounted).
+class Dataset:
+    __slots__ = ('name', 'kind', 'used', 'avail', 'refer', 'quota', 'written', 'snapshots', 'children',
+                 'read_ops', 'write_ops', 'read_bw', 'write_bw', 'growth', 'line')
+
+    def __init__(self, name):
+        self.name = name
+        self.kind = None
+        self.used = self.avail = self.refer = self.quota = None
+        self.written = self.snapshots = self.children = None
+        self.read_ops = self.write_ops = self.read_bw = self.write_bw = None
+        self.growth = None
+        self.line = None   # `zfs list` line the values came from
+
+    @property
+    def pool(self):
+        return self.name.split('/', 1)[0]
+
+    # Space held by the dataset and its snapshots, without its children
+    @property
+    def own(self):
+        if self.used is None:
+            return None
+        return self.used - (self.children or 0)
+
+    # Fraction of the quota in use, None without a quota
+    @property
+    def quota_used(self):
+        if not self.quota or self.used is None:
+            return None
+        return self.used / self.quota
+
+# Every dataset by name, updated from `zfs list` runs and kstat samples
+class DatasetTable:
+    def __init__(self):
+        self.datasets = {}
+        self.growing = set()   # names with a growth that is still decaying
+        self.stamp = None      # time of the last `zfs list` run
+
+    # Apply one `zfs list` output; returns (added, changed, removed) names
+    def update_usage(self, output, now):
+        elapsed = now - self.stamp if self.stamp is not None else 0
+        self.stamp = now
+        weight = 1 - math.exp(-elapsed / DATASET_SMOOTHING) if elapsed > 0 else 0
+        datasets = self.datasets
+        added = []
+        changed = []
+        seen = set()
+        updated = set()
+
+        for line in output.splitlines():
+            name, _, rest = line.partition('\t')
+            if not rest:
+                continue
+            seen.add(name)
+            dataset = datasets.get(name)
+            if dataset is None:
+                dataset = datasets[name] = Dataset(name)
+                added.append(name)
+            elif dataset.line == line:
+                # Seen unchanged a second time: not growing
+                if dataset.growth is None and weight:
+                    dataset.growth = 0.0
+                    changed.append(name)
+                continue
+            else:
+                changed.append(name)
+            dataset.line = line
+            updated.add(name)
+
+            fields = rest.split('\t')
+            fields += ['-'] * (len(DATASET_PROPERTIES) - 1 - len(fields))
+            own = dataset.own
+            dataset.kind = fields[0]
+            dataset.used = parse_count(fields[1])
+            dataset.avail = parse_count(fields[2])
+            dataset.refer = parse_count(fields[3])
+            dataset.quota = parse_count(fields[4]) or None
+            dataset.written = parse_count(fields[5])
+            dataset.snapshots = parse_count(fields[6])
+            dataset.children = parse_count(fields[7])
+
+            current = dataset.own
+            if weight and own is not None and current is not None:
+                rate = (current - own) / elapsed
+                dataset.growth = rate if dataset.growth is None else dataset.growth + weight * (rate - dataset.growth)
+                self.growing.add(name)
+
+        # Unchanged datasets that were growing decay towards zero
+        for name in list(self.growing):
+            dataset = datasets.get(name)
+            if dataset is None or name not in seen:
+                self.growing.discard(name)
+                continue
+            if name not in updated:
+                dataset.growth -= weight * dataset.growth
+                if abs(dataset.growth) < 1:
+                    dataset.growth = 0.0
+                    self.growing.discard(name)
+                changed.append(name)
+
+        removed = [name for name in datasets if name not in seen]
+        for name in removed:
+            del datasets[name]
+        return added, changed, removed
+
+    # Copy the rates of a KstatReader.sample_datasets() result; returns the
+    # names whose rates changed
+    def update_io(self, objsets):
+        changed = []
+        datasets = self.datasets
+        for records in objsets.values():
+            for record in records.values():
+                dataset = datasets.get(record.name)
+                if dataset is None:
+                    continue
+                rates = (record.read_ops, record.write_ops, record.read_bw, record.write_bw)
+                if rates != (dataset.read_ops, dataset.write_ops, dataset.read_bw, dataset.write_bw):
+                    dataset.read_ops, dataset.write_ops, dataset.read_bw, dataset.write_bw = rates
+                    changed.append(dataset.name)
+        return changed
+
+    # The `count` datasets with the largest positive `metric`
+    def top(self, metric, count):
+        key = attrgetter(metric)
+        return heapq.nlargest(count, (dataset for dataset in self.datasets.values() if (key(dataset) or 0) > 0), key=key)
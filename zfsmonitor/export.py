@@ -0,0 +1,251 @@
+# Streaming export of a status snapshot and the stored history to JSON Lines
+# or CSV, optionally compressed with gzip or zstd. History rows are read from
+# the store one database row at a time and written as they are decoded, so
+# memory stays flat however long the range. Export.run() blocks and is meant
+# for a worker thread (HistoryStore.export) or the command line (--export);
+# it opens its own read-only connection, which WAL lets run beside the
+# store's writer.
+import os
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import sys
+import time
+import subprocess
+import fnmatch
+from array import array
+
+from .config import STORE_PATH, STORE_RETENTION
+from .parsing import parse_zpool_status
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMATS = ('jsonl', 'csv')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+STEPS = tuple(sorted(STORE_RETENTION))
+
+# Every row has `kind` "status" (one per pool and vdev of the snapshot) or
+# "history" (one per series and stored timestamp); CSV leaves the other
+# kind's columns empty, JSON Lines omits them
+FIELDS = ('kind', 'ts', 'step', 'path', 'metric', 'min', 'avg', 'max',
+          'state', 'read_errors', 'write_errors', 'cksum_errors', 'errors')
+
+# Seconds between progress callbacks
+PROGRESS_INTERVAL = 0.25
+
+# "30d", "12h", "15m", "90s" or plain seconds
+def parse_duration(text):
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+# Format and compression implied by the file name ("x.csv.gz", "x.jsonl.zst")
+def guess_format(path):
+    name = path.lower()
+    compression = 'gzip' if name.endswith('.gz') else 'zstd' if name.endswith('.zst') else 'none'
+    if compression != 'none':
+        name = name.rsplit('.', 1)[0]
+    return ('csv' if name.endswith('.csv') else 'jsonl'), compression
+
+# Finest stored step still holding data from `start`
+def covering_step(start, now=None):
+    age = (time.time() if now is None else now) - start
+    for step in STEPS:
+        if STORE_RETENTION[step] >= age:
+            return step
+    return STEPS[-1]
+
+# Text stream that writes `path` through the compressor
+def open_output(path, compression):
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the zstandard module")
+        return zstandard.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+# Status rows of one parsed `zpool status -p -v` snapshot
+def status_rows(pools, timestamp):
+    for pool in pools.values():
+        for record in (pool, *pool.vdevs.values()):
+            yield {
+                'kind': 'status', 'ts': int(timestamp), 'path': record.path, 'state': record.state,
+                'read_errors': record.read_errors, 'write_errors': record.write_errors,
+                'cksum_errors': record.cksum_errors,
+                'errors': pool.errors if record is pool else None,
+            }
+
+class ExportCancelled(Exception):
+    pass
+
+# One export job. `patterns` are fnmatch globs over vdev paths ("tank",
+# "tank/mirror-0/*"); a series is exported when any matches, every series
+# without patterns. `start`/`end` are Unix times, None for unbounded; `step`
+# None picks the finest step that still covers `start`.
+class Export:
+    def __init__(self, path, format='jsonl', compression='none', start=None, end=None, step=None,
+                 patterns=(), history=True, pools=None, timestamp=None, database=STORE_PATH):
+        self.path = path
+        self.format = format
+        self.compression = compression
+        self.start = start
+        self.end = end
+        self.step = step if step is not None else covering_step(start) if start is not None else STEPS[-1]
+        self.patterns = tuple(patterns)
+        self.history = history
+        self.pools = pools             # parsed status snapshot to write first, if any
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.database = database
+        self.cancelled = False
+        self.rows = 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wanted(self, path):
+        return not self.patterns or any(fnmatch.fnmatchcase(path, pattern) for pattern in self.patterns)
+
+    # Write everything to a temporary file next to `path`, renamed into place
+    # once complete; `progress(done, total)` counts database rows. Returns the
+    # number of rows written.
+    def run(self, progress=None):
+        partial = f"{self.path}.part"
+        try:
+            with open_output(partial, self.compression) as output:
+                if self.format == 'csv':
+                    csv.writer(output).writerow(FIELDS)
+                if self.pools:
+                    for row in status_rows(self.pools, self.timestamp):
+                        if self.wanted(row['path']):
+                            output.write(self.format_row(row))
+                            self.rows += 1
+                if self.history:
+                    self.write_history(output, progress)
+            os.replace(partial, self.path)
+        except BaseException:
+            try:
+                os.unlink(partial)
+            except OSError:
+                pass
+            raise
+        return self.rows
+
+    def format_row(self, row):
+        if self.format == 'csv':
+            line = io.StringIO()
+            csv.writer(line).writerow(['' if row.get(field) is None else row[field] for field in FIELDS])
+            return line.getvalue()
+        return json.dumps({key: value for key, value in row.items() if value is not None}, separators=(',', ':')) + '\n'
+
+    # History lines are built from text: the path and metric part of each
+    # series is formatted once per layout, leaving only the numbers per row
+    def series_text(self, path, metric):
+        if self.format == 'csv':
+            line = io.StringIO()
+            csv.writer(line, lineterminator='').writerow([path, metric, ''])
+            return line.getvalue()
+        return f'"path":{json.dumps(path)},"metric":{json.dumps(metric)},'
+
+    def write_history(self, output, progress):
+        if not os.path.exists(self.database):
+            return
+        db = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True)
+        try:
+            where = "step = ?"
+            arguments = [self.step]
+            if self.start is not None:
+                where += " AND ts >= ?"
+                arguments.append(int(self.start))
+            if self.end is not None:
+                where += " AND ts < ?"
+                arguments.append(int(self.end))
+            total = db.execute(f"SELECT COUNT(*) FROM samples WHERE {where}", arguments).fetchone()[0]
+
+            # Raw rows hold one float64 per series, rollups float32 min/avg/max
+            raw = self.step == 1
+            typecode, width = ('d', 1) if raw else ('f', 3)
+            number = repr if raw else (lambda value: format(value, '.7g'))
+            if self.format == 'csv':
+                head = f"history,{{}},{self.step},"
+                line = "{}{},{},{}" + "," * (len(FIELDS) - 8) + "\r\n"
+            else:
+                head = f'{{{{"kind":"history","ts":{{}},"step":{self.step},'
+                line = '{}"min":{},"avg":{},"max":{}}}\n'
+
+            layouts = {}   # layout id -> [(offset in row, series text)] of wanted series
+            done = 0
+            reported = time.monotonic()
+            rows = db.execute(f"SELECT ts, layout, data FROM samples WHERE {where} ORDER BY ts", arguments)
+            for timestamp, layout_id, data in rows:
+                series = layouts.get(layout_id)
+                if series is None:
+                    keys = json.loads(db.execute("SELECT keys FROM layouts WHERE id = ?", (layout_id,)).fetchone()[0])
+                    series = layouts[layout_id] = [
+                        (index * width, self.series_text(path, metric))
+                        for index, (path, metric) in enumerate(keys) if self.wanted(path)
+                    ]
+                if series:
+                    values = array(typecode)
+                    values.frombytes(data)
+                    prefix = head.format(timestamp)
+                    if raw:
+                        output.write(''.join(
+                            line.format(prefix + text, *([number(values[offset])] * 3)) for offset, text in series
+                        ))
+                    else:
+                        output.write(''.join(
+                            line.format(prefix + text, *map(number, values[offset:offset + 3])) for offset, text in series
+                        ))
+                    self.rows += len(series)
+                done += 1
+                if self.cancelled:
+                    raise ExportCancelled()
+                if progress and time.monotonic() - reported >= PROGRESS_INTERVAL:
+                    reported = time.monotonic()
+                    progress(done, total)
+            if progress:
+                progress(done, total)
+        finally:
+            db.close()
+
+# --export from the command line: the current status and the stored
+# history (either can be left out), with progress on stderr; returns the
+# exit status
+def run_export(path, format=None, compression=None, since=None, until=None, step=None,
+               patterns=(), status=True, history=True, pools=()):
+    guessed_format, guessed_compression = guess_format(path)
+    now = time.time()
+    snapshot = None
+    if status:
+        result = subprocess.run(["zpool", "status", "-p", "-v", *pools], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"zpool status failed: {result.stderr.strip()}", file=sys.stderr)
+            return 1
+        snapshot = parse_zpool_status(result.stdout)
+
+    export = Export(
+        path, format or guessed_format, compression or guessed_compression,
+        start=now - parse_duration(since) if since else None,
+        end=now - parse_duration(until) if until else None,
+        step=step, patterns=patterns, history=history, pools=snapshot, timestamp=now,
+    )
+
+    def progress(done, total):
+        if sys.stderr.isatty():
+            sys.stderr.write(f"\r{done}/{total} stored rows")
+
+    try:
+        rows = export.run(progress)
+    except (OSError, RuntimeError, sqlite3.Error) as e:
+        print(f"\nExport failed: {e}", file=sys.stderr)
+        return 1
+    print(f"\n{rows} rows written to {path}", file=sys.stderr)
+    return 0
@@ -0,0 +1,177 @@
+# OpenMetrics endpoint for Prometheus. The body is rendered once per status
+# snapshot or iostat report on the main loop and kept as ready-to-send bytes,
+# so a scrape is a single write that never forks `zpool`.
+import gzip
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .parsing import STATE_SEVERITY, parse_scan
+from .instrument import timed
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# (metric, record attribute, type, help) of each per-record series
+STATUS_METRICS = (
+    ('read_errors', 'read_errors', 'counter', "READ errors reported by zpool status"),
+    ('write_errors', 'write_errors', 'counter', "WRITE errors reported by zpool status"),
+    ('checksum_errors', 'cksum_errors', 'counter', "CKSUM errors reported by zpool status"),
+)
+IOSTAT_METRICS = (
+    ('allocated_bytes', 'alloc', 'gauge', "Allocated capacity"),
+    ('free_bytes', 'free', 'gauge', "Free capacity"),
+    ('read_ops_per_second', 'read_ops', 'gauge', "Read operations per second over the last interval"),
+    ('write_ops_per_second', 'write_ops', 'gauge', "Write operations per second over the last interval"),
+    ('read_bytes_per_second', 'read_bw', 'gauge', "Read bandwidth over the last interval"),
+    ('write_bytes_per_second', 'write_bw', 'gauge', "Write bandwidth over the last interval"),
+)
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Label sets of a pool and of every vdev below it, as (labels, record)
+def labelled_records(pool):
+    name = escape_label(pool.name)
+    yield f'pool="{name}"', pool
+    for record in pool.vdevs.values():
+        yield f'pool="{name}",vdev="{escape_label(record.path[len(pool.name) + 1:])}",class="{record.vdev_class}"', record
+
+# One metric family for pools (zfs_pool_*) and one for vdevs (zfs_vdev_*)
+def render_families(pools, metrics, lines):
+    for metric, attribute, kind, help_text in metrics:
+        suffix = '_total' if kind == 'counter' else ''
+        for scope in ('pool', 'vdev'):
+            family = f"zfs_{scope}_{metric}"
+            lines.append(f"# TYPE {family} {kind}")
+            lines.append(f"# HELP {family} {help_text}")
+            for pool in pools:
+                for labels, record in labelled_records(pool):
+                    if (record is pool) != (scope == 'pool'):
+                        continue
+                    value = getattr(record, attribute)
+                    if value is not None:
+                        lines.append(f"{family}{suffix}{{{labels}}} {value}")
+
+# Metric lines for a status snapshot: state, health and error counters
+def render_status(snapshot):
+    pools = list(snapshot.pools.values())
+    lines = [
+        "# TYPE zfs_monitor_status_up gauge",
+        "# HELP zfs_monitor_status_up Whether the last zpool status run succeeded",
+        f"zfs_monitor_status_up {1 if pools else 0}",
+        "# TYPE zfs_monitor_status_timestamp_seconds gauge",
+        "# HELP zfs_monitor_status_timestamp_seconds When the last zpool status ran",
+        f"zfs_monitor_status_timestamp_seconds {time.time():.3f}",
+    ]
+    for scope in ('pool', 'vdev'):
+        lines.append(f"# TYPE zfs_{scope}_state gauge")
+        lines.append(f"# HELP zfs_{scope}_state Current state, as a 1-valued series labelled with it")
+        for pool in pools:
+            for labels, record in labelled_records(pool):
+                if (record is pool) == (scope == 'pool') and record.state:
+                    lines.append(f'zfs_{scope}_state{{{labels},state="{escape_label(record.state)}"}} 1')
+        lines.append(f"# TYPE zfs_{scope}_health gauge")
+        lines.append(f"# HELP zfs_{scope}_health State severity: 0 online, 1 offline, 2 degraded, 3 faulted")
+        for pool in pools:
+            for labels, record in labelled_records(pool):
+                if (record is pool) == (scope == 'pool') and record.state:
+                    lines.append(f"zfs_{scope}_health{{{labels}}} {STATE_SEVERITY.get(record.state, 1)}")
+    render_families(pools, STATUS_METRICS, lines)
+    render_scans(pools, lines)
+    return '\n'.join(lines) + '\n'
+
+# Progress of running scrubs/resilvers; rate() over the byte gauges gives
+# the throughput
+SCAN_METRICS = (
+    ('scanned_bytes', 'scanned', "Bytes scanned by the running scrub or resilver"),
+    ('issued_bytes', 'issued', "Bytes issued by the running scrub or resilver"),
+    ('total_bytes', 'total', "Bytes the running scrub or resilver has to scan"),
+    ('eta_seconds', 'eta', "Time left estimated by zpool"),
+)
+
+def render_scans(pools, lines):
+    scans = [(pool, parse_scan(pool.scan)) for pool in pools]
+    scans = [(f'pool="{escape_label(pool.name)}",function="{progress.function}"', progress)
+             for pool, progress in scans if progress is not None]
+    for metric, attribute, help_text in SCAN_METRICS:
+        lines.append(f"# TYPE zfs_pool_scan_{metric} gauge")
+        lines.append(f"# HELP zfs_pool_scan_{metric} {help_text}")
+        for labels, progress in scans:
+            value = getattr(progress, attribute)
+            if value is not None:
+                lines.append(f"zfs_pool_scan_{metric}{{{labels}}} {value}")
+
+# Metric lines for an iostat report: capacity, ops and bandwidth
+def render_report(report):
+    lines = []
+    render_families(list(report.values()), IOSTAT_METRICS, lines)
+    return '\n'.join(lines) + '\n'
+
+# Complete HTTP response for `body` (already encoded)
+def http_response(status, body, content_type, encoding=None):
+    headers = [f"HTTP/1.1 {status}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}"]
+    if encoding:
+        headers.append(f"Content-Encoding: {encoding}")
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode() + body
+
+NOT_FOUND = http_response("404 Not Found", b"Not found\n", "text/plain; charset=utf-8")
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != "/metrics":
+            self.wfile.write(NOT_FOUND)
+            return
+        plain, compressed = self.server.exporter.responses
+        self.wfile.write(compressed if "gzip" in self.headers.get("Accept-Encoding", "") else plain)
+
+    def log_message(self, format, *args):
+        pass
+
+# Listens on IPv6 when the host is an IPv6 address ("::1", "::")
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler):
+        if ':' in address[0]:
+            self.address_family = socket.AF_INET6
+        super().__init__(address, handler)
+
+# HTTP server on its own thread serving the latest rendered body. Feed it
+# with update_status(snapshot) and update_report(report) from the main loop.
+# `address` is "host:port", IPv6 hosts in brackets ("[::1]:9134").
+class MetricsExporter:
+    def __init__(self, address):
+        host, _, port = address.rpartition(':')
+        self.status_text = ""
+        self.report_text = ""
+        self.responses = None
+        self.publish()
+        self.server = MetricsServer((host.strip('[]') or "127.0.0.1", int(port)), MetricsHandler)
+        self.server.exporter = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+    @timed("render:metrics status")
+    def update_status(self, snapshot):
+        self.status_text = render_status(snapshot)
+        self.publish()
+
+    @timed("render:metrics report")
+    def update_report(self, report):
+        self.report_text = render_report(report)
+        self.publish()
+
+    # Swap in both encodings at once; handlers read the tuple without locking
+    def publish(self):
+        body = (self.status_text + self.report_text + "# EOF\n").encode()
+        self.responses = (
+            http_response("200 OK", body, CONTENT_TYPE),
+            http_response("200 OK", gzip.compress(body, compresslevel=1), CONTENT_TYPE, "gzip"),
+        )
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
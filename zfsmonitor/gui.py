@@ -0,0 +1,1876 @@
+# GTK front end: the monitor window, its tabs and the tray icon
+import sys
+import time
+from datetime import datetime
+
+import cairo
+import gi
+gi.require_version('Gtk', '3.0')
+gi.require_version('Gdk', '3.0')
+gi.require_version('AyatanaAppIndicator3', '0.1')
+from gi.repository import Gtk, Gdk, GLib, AyatanaAppIndicator3 as AppIndicator3, Pango
+
+from .config import (POOLS, STATUS_REFRESH, STATUS_IDLE, STATUS_BUSY, IOSTAT_HIDDEN,
+                     LATENCY_INTERVAL, DATASET_REFRESH, DATASET_HIDDEN, DATASET_IO, DATASET_IO_HIDDEN,
+                     DATASET_TOP, HISTORY_LABELS, METRICS_ADDRESS, AGENTS)
+from .commands import runner, discover_pools
+from .parsing import STATUS_SECTIONS, STATE_SEVERITY, worst_state, pools_label, format_number, format_latency
+from .collector import StatusCollector, make_sampler, make_histogram_sampler
+from .remote import RemoteCollector
+from .latency import LatencyWindow, QUANTILES
+from .datasets import DatasetTable, dataset_command
+from .kstat import KstatReader, ArcReader
+from .history import MetricHistory, arc_series, report_series
+from .charts import PixelColumns, covering_tier, nice_ceiling
+from .store import HistoryStore, start_export
+from .export import Export, ExportCancelled, guess_format
+from .alerts import AlertEngine, pool_problems, scan_in_progress
+from .exporter import MetricsExporter
+from .scheduler import Scheduler
+from .scan import ScanMonitor, format_eta
+from .instrument import stats, timed
+from .notify import Notifier, URGENCY_LOW, URGENCY_NORMAL, URGENCY_CRITICAL
+
+# Function to create formatted labels
+def create_formatted_label(text, color=None, bold=False, size=None, monospace=False, halign=Gtk.Align.START):
+    label = Gtk.Label()
+    label.set_markup(text)
+    label.set_line_wrap(True)
+    label.set_selectable(True)
+    label.set_halign(halign)
+    
+    attrs = Pango.AttrList()
+    if color:
+        r, g, b = [int(c * 65535) for c in color]
+        color_attr = Pango.attr_foreground_new(r, g, b)
+        attrs.insert(color_attr)
+    if bold:
+        bold_attr = Pango.attr_weight_new(Pango.Weight.BOLD)
+        attrs.insert(bold_attr)
+    if size:
+        size_attr = Pango.attr_scale_new(size)
+        attrs.insert(size_attr)
+    if monospace:
+        font_attr = Pango.attr_family_new("Monospace")
+        attrs.insert(font_attr)
+    
+    label.set_attributes(attrs)
+    return label
+
+# Per-vdev columns of the Performance tab table, in model order after the path
+VDEV_COLUMNS = ('alloc', 'free', 'read_ops', 'write_ops', 'read_bw', 'write_bw',
+                'read_wait', 'write_wait', 'read_p99', 'write_p99', 'queue_pending')
+
+# Chart choices of the Performance tab: series per metric, range in seconds
+CHART_METRICS = (
+    ("Operações/s", ('read_ops', 'write_ops')),
+    ("Largura de banda", ('read_bw', 'write_bw')),
+    ("Latência p99", ('read_p99', 'write_p99')),
+    ("Capacidade alocada", ('alloc',)),
+)
+CHART_RANGES = (("Última hora", 3600), ("Último dia", 86400), ("Última semana", 7 * 86400))
+CHART_COLORS = ((0.20, 0.60, 0.86), (0.90, 0.49, 0.13))
+
+# Text of a metric value: latencies in time units, ratios as percentages,
+# bandwidth and rates per second
+def format_metric(metric, value):
+    if metric.endswith(('_wait', '_p50', '_p99', '_p999')):
+        return format_latency(value)
+    if metric.endswith('_ratio'):
+        return '-' if value is None else f"{value * 100:.1f}%"
+    return format_number(value, "/s" if metric.endswith(('_bw', '_rate')) else "")
+
+# Diff the pools and vdevs of a report against the rows on screen
+# ({path: values}, updated in place). Returns (added {path: values},
+# changed {path: {column: value}}, removed paths); unknown values are -1.
+def vdev_row_changes(shown, report):
+    added = {}
+    changed = {}
+    records = [record for pool in report.values() for record in (pool, *pool.vdevs.values())]
+    for record in records:
+        path = record.path
+        values = tuple(-1.0 if value is None else float(value)
+                       for value in (getattr(record, column) for column in VDEV_COLUMNS))
+        previous = shown.get(path)
+        if previous is None:
+            added[path] = values
+        elif previous != values:
+            changed[path] = {col: value for col, (old, value) in enumerate(zip(previous, values)) if old != value}
+        else:
+            continue
+        shown[path] = values
+    current = {record.path for record in records}
+    removed = [path for path in shown if path not in current]
+    for path in removed:
+        del shown[path]
+    return added, changed, removed
+
+# Loading spinner widget
+class LoadingSpinner(Gtk.Spinner):
+    def __init__(self):
+        super().__init__()
+        self.set_size_request(24, 24)
+    
+    def start(self):
+        self.show()
+        super().start()
+    
+    def stop(self):
+        super().stop()
+        self.hide()
+
+# Live chart of one device's metrics (a series per metric) over `seconds`,
+# filled from the history and then fed every report through add(). The
+# plot lives in an offscreen surface: a new sample scrolls it by the
+# columns time moved on and repaints only those, and draw just blits it.
+# Everything is repainted only when the size or the scale changes, and
+# not at all while the chart is off screen.
+class MetricChart(Gtk.DrawingArea):
+    def __init__(self, history, path, metrics, seconds, height):
+        super().__init__()
+        self.history = history
+        self.surface = None
+        self.spare = None
+        self.top = None
+        self.set_size_request(-1, height)
+        self.set_series(path, metrics, seconds)
+        self.connect("draw", self.on_draw)
+    
+    def set_series(self, path, metrics, seconds):
+        self.path = path
+        self.metrics = metrics
+        self.seconds = seconds
+        self.columns = None   # rebuilt from the history on the next draw
+        self.queue_draw()
+    
+    # `sample` is {(path, metric): value} of one report
+    @timed("chart:update")
+    def add(self, timestamp, sample):
+        if self.columns is None:
+            return
+        shift = self.columns.add(timestamp, [sample.get((self.path, metric)) for metric in self.metrics])
+        if not self.get_mapped():
+            self.surface = None
+            return
+        top = nice_ceiling(self.columns.top())
+        if self.surface is None or top != self.top:
+            self.surface = None
+        else:
+            # The newest column may have widened even without a shift
+            if shift:
+                self.scroll(shift)
+            self.paint(self.surface, self.columns.width - 1 - min(shift, self.columns.width - 1))
+        self.queue_draw()
+    
+    def scroll(self, shift):
+        cr = cairo.Context(self.spare)
+        cr.set_operator(cairo.OPERATOR_SOURCE)
+        cr.set_source_surface(self.surface, -shift, 0)
+        cr.paint()
+        self.surface, self.spare = self.spare, self.surface
+    
+    # Paint the columns from x = `first` to the right edge
+    def paint(self, surface, first):
+        columns = self.columns
+        height = surface.get_height()
+        cr = cairo.Context(surface)
+        cr.set_operator(cairo.OPERATOR_CLEAR)
+        cr.rectangle(first, 0, columns.width - first, height)
+        cr.fill()
+        cr.set_operator(cairo.OPERATOR_OVER)
+        scale = (height - 2) / self.top
+        for series, color in zip(range(len(self.metrics)), CHART_COLORS):
+            band = []
+            for x in range(first, columns.width):
+                column = columns.column(series, x)
+                if column is not None:
+                    band.append((x, height - 1 - column[1] * scale, height - 1 - column[0] * scale))
+            # Faint area under the minimum, solid min..max band
+            cr.set_source_rgba(*color, 0.15)
+            for x, high, low in band:
+                cr.rectangle(x, low, 1, height - low)
+            cr.fill()
+            cr.set_source_rgb(*color)
+            for x, high, low in band:
+                cr.rectangle(x, high, 1, max(1.0, low - high))
+            cr.fill()
+    
+    @timed("chart:redraw")
+    def redraw(self, width, height):
+        window = self.get_window()
+        self.surface = window.create_similar_surface(cairo.CONTENT_COLOR_ALPHA, width, height)
+        self.spare = window.create_similar_surface(cairo.CONTENT_COLOR_ALPHA, width, height)
+        self.top = nice_ceiling(self.columns.top())
+        self.paint(self.surface, 0)
+    
+    def on_draw(self, widget, cr):
+        width, height = widget.get_allocated_width(), widget.get_allocated_height()
+        if width < 2 or height < 2:
+            return False
+        if self.columns is None or self.columns.width != width:
+            self.columns = PixelColumns(len(self.metrics), width, self.seconds)
+            tier = covering_tier(self.history.tiers, self.seconds)
+            for series, metric in enumerate(self.metrics):
+                self.columns.fill(series, tier.points((self.path, metric)))
+            self.surface = None
+        if self.surface is None or self.surface.get_height() != height:
+            self.redraw(width, height)
+        cr.set_source_surface(self.surface, 0, 0)
+        cr.paint()
+        
+        # Scale, drawn over the plot so scrolling never moves it
+        cr.set_source_rgba(0.5, 0.5, 0.5, 0.9)
+        cr.set_font_size(9)
+        cr.move_to(3, 10)
+        cr.show_text(format_metric(self.metrics[0], self.top))
+        return False
+
+# Status Tab
+# Persistent section widgets of one pool; snapshots only patch the sections
+# that changed
+class PoolStatusView(Gtk.Box):
+    # Without `on_scrub` (pools of remote agents) there is no scrub button
+    def __init__(self, name, on_scrub):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.name = name
+        
+        # Pool header with its own scrub button
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        title = create_formatted_label(f"<big><b>Pool: {GLib.markup_escape_text(name)}</b></big>")
+        header.pack_start(title, False, False, 0)
+        
+        if on_scrub:
+            self.scrub_btn = Gtk.Button.new_with_label("⏱ Iniciar Scrub")
+            self.scrub_btn.connect("clicked", on_scrub, name)
+            header.pack_end(self.scrub_btn, False, False, 0)
+        self.pack_start(header, False, False, 0)
+        
+        self.section_labels = {}
+        for section in STATUS_SECTIONS[:-1]:
+            label = create_formatted_label("")
+            self.pack_start(label, False, False, 0)
+            self.section_labels[section] = label
+            if section == 'scan':
+                self.build_scan()
+        
+        # Device Configuration
+        self.config_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        config_title = create_formatted_label("<b>▣ Configuração dos Dispositivos:</b>")
+        self.config_box.pack_start(config_title, False, False, 0)
+        
+        config_frame = Gtk.Frame()
+        config_frame.set_shadow_type(Gtk.ShadowType.IN)
+        
+        # Vdev tree: name, class, state, READ, WRITE, CKSUM, note, state color
+        self.config_store = Gtk.TreeStore(str, str, str, str, str, str, str, str)
+        config_view = Gtk.TreeView(model=self.config_store)
+        for col, header in enumerate(["Dispositivo", "Classe", "Estado", "READ", "WRITE", "CKSUM", "Observação"]):
+            renderer = Gtk.CellRendererText()
+            if col == 2:
+                column = Gtk.TreeViewColumn(header, renderer, text=col, foreground=7)
+            else:
+                column = Gtk.TreeViewColumn(header, renderer, text=col)
+            if 3 <= col <= 5:
+                renderer.set_property("xalign", 1.0)
+            config_view.append_column(column)
+        self.config_view = config_view
+        
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_min_content_height(200)
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(config_view)
+        
+        config_frame.add(scrolled)
+        self.config_box.pack_start(config_frame, True, True, 0)
+        self.pack_start(self.config_box, True, True, 0)
+        
+        separator = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
+        self.pack_start(separator, False, False, 10)
+        
+        # Visibility is managed per section from here on
+        self.show_all()
+        for label in self.section_labels.values():
+            label.set_no_show_all(True)
+            label.hide()
+        self.config_box.set_no_show_all(True)
+        self.config_box.hide()
+        self.scan_box.set_no_show_all(True)
+        self.scan_box.hide()
+        
+        self.section_fingerprints = {}
+    
+    # Rates and ETA of a running scrub/resilver over an issue rate sparkline
+    def build_scan(self):
+        self.scan_tracker = None
+        self.scan_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        self.scan_label = create_formatted_label("")
+        self.scan_box.pack_start(self.scan_label, False, False, 0)
+        self.sparkline = Gtk.DrawingArea()
+        self.sparkline.set_size_request(-1, 48)
+        self.sparkline.connect("draw", self.draw_sparkline)
+        self.scan_box.pack_start(self.sparkline, False, False, 0)
+        self.pack_start(self.scan_box, False, False, 0)
+    
+    def update_scan(self, tracker):
+        self.scan_tracker = tracker
+        if tracker is None:
+            self.scan_box.hide()
+            return
+        
+        progress = tracker.progress
+        kind = "Resilver" if progress.function == "resilver" else "Scrub"
+        done = "" if progress.percent is None else f" {progress.percent:.2f}%"
+        markup = (f"<b>{kind} em andamento:</b>{done} — varredura {format_number(tracker.scan_rate, '/s')}, "
+                  f"emissão {format_number(tracker.issue_rate, '/s')}, término em {format_eta(tracker.eta)}")
+        if tracker.stalled:
+            markup += (f"\n<span color='#e74c3c'><b>Sem progresso há "
+                       f"{format_eta(time.monotonic() - tracker.advanced)}</b></span>")
+        self.scan_label.set_markup(markup)
+        self.scan_box.show()
+        self.sparkline.queue_draw()
+    
+    # Issue rate of every sample of the scan, scaled to the highest one
+    def draw_sparkline(self, widget, cr):
+        tracker = self.scan_tracker
+        points = [(stamp, rate) for stamp, _, rate in tracker.samples if rate is not None] if tracker else []
+        if len(points) < 2:
+            return False
+        width, height = widget.get_allocated_width(), widget.get_allocated_height()
+        start, span = points[0][0], (points[-1][0] - points[0][0]) or 1
+        top = max(rate for _, rate in points) or 1
+        
+        cr.set_line_width(1.5)
+        cr.set_source_rgb(0.20, 0.60, 0.86)
+        for index, (stamp, rate) in enumerate(points):
+            x = 1 + (stamp - start) / span * (width - 2)
+            y = height - 1 - rate / top * (height - 2)
+            if index == 0:
+                cr.move_to(x, y)
+            else:
+                cr.line_to(x, y)
+        cr.stroke_preserve()
+        cr.line_to(x, height)
+        cr.line_to(1, height)
+        cr.close_path()
+        cr.set_source_rgba(0.20, 0.60, 0.86, 0.2)
+        cr.fill()
+        return False
+    
+    @staticmethod
+    def section_markup(section, pool):
+        value = getattr(pool, section)
+        if value is None:
+            return None
+        text = GLib.markup_escape_text(value)
+        
+        if section == 'state':
+            if value == 'ONLINE':
+                return f"<b>Estado:</b> <span color='#2ecc71'>[OK] {text}</span>"
+            elif value in ['DEGRADED', 'FAULTED']:
+                return f"<b>Estado:</b> <span color='#e74c3c'>[ERRO] {text}</span>"
+            return f"<b>Estado:</b> <span color='#f1c40f'>[ATENÇÃO] {text}</span>"
+        
+        # Status/Issues
+        if section == 'status':
+            if any(word in value.upper() for word in ['MISSING', 'INVALID', 'DEGRADED', 'FAULTED']):
+                return f"<b>⚠ ATENÇÃO - Problema Detectado:</b>\n<span color='#e74c3c'>{text}</span>"
+            return f"<b>Status:</b>\n{text}"
+        
+        # Recommended Action
+        if section == 'action':
+            return f"<b>⚙ Ação Recomendada:</b>\n<span color='#3498db'>{text}</span>"
+        
+        # Last Scan
+        if section == 'scan':
+            return f"<b>≡ Último Scan:</b> {text}"
+        
+        # Errors
+        if value.lower() != 'no known data errors':
+            return f"<b>⚠ Erros:</b> <span color='#e74c3c'>{text}</span>"
+        return f"<b>✓ Erros:</b> <span color='#2ecc71'>{text}</span>"
+    
+    # Rebuild the vdev tree; only runs when the tree's fingerprint changed
+    def fill_config(self, pool):
+        colors = ('#2ecc71', '#f1c40f', '#e74c3c', '#e74c3c')
+        def count(value):
+            return '-' if value is None else str(value)
+        def append(parent, record):
+            row = self.config_store.append(parent, [
+                record.name, record.vdev_class, record.state or '',
+                count(record.read_errors), count(record.write_errors), count(record.cksum_errors),
+                record.annotation or '', colors[STATE_SEVERITY.get(record.state, 1)],
+            ])
+            for child in record.children:
+                append(row, child)
+        
+        self.config_store.clear()
+        append(None, pool)
+        self.config_view.expand_all()
+    
+    def update(self, pool, fingerprints):
+        for section, fingerprint in fingerprints.items():
+            if self.section_fingerprints.get(section) == fingerprint:
+                continue
+            if section == 'config':
+                self.fill_config(pool)
+                self.config_box.set_visible(bool(pool.children))
+                continue
+            markup = self.section_markup(section, pool)
+            label = self.section_labels[section]
+            if markup is None:
+                label.hide()
+            else:
+                label.set_markup(markup)
+                label.show()
+        self.section_fingerprints = fingerprints
+
+# Time ranges offered by the export dialog, None for everything stored
+EXPORT_RANGES = (("Última hora", 3600), ("Últimas 24 horas", 86400), ("Últimos 7 dias", 7 * 86400),
+                 ("Últimos 30 dias", 30 * 86400), ("Todo o histórico", None))
+
+class StatusTab(Gtk.ScrolledWindow):
+    # `store` runs exports of the stored history off the main loop; without
+    # one (remote hosts) only the status snapshot is exported
+    def __init__(self, collector, notifier, scans, store=None):
+        super().__init__()
+        self.collector = collector
+        self.scans = scans
+        self.notifier = notifier
+        self.store = store
+        self.export = None   # export.Export in progress
+        self.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        
+        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=15)
+        self.main_box.set_margin_start(20)
+        self.main_box.set_margin_end(20)
+        self.main_box.set_margin_top(20)
+        self.main_box.set_margin_bottom(20)
+        
+        # Header
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        title = create_formatted_label("<big><b>Status dos Pools ZFS</b></big>")
+        header.pack_start(title, False, False, 0)
+        
+        self.spinner = LoadingSpinner()
+        header.pack_end(self.spinner, False, False, 0)
+        self.main_box.pack_start(header, False, False, 0)
+        
+        # Info container
+        self.info_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.main_box.pack_start(self.info_container, True, True, 0)
+        self.build_sections()
+        
+        # Action buttons
+        action_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        
+        refresh_btn = Gtk.Button.new_with_label("↻ Atualizar")
+        refresh_btn.connect("clicked", self.refresh)
+        action_box.pack_start(refresh_btn, False, False, 0)
+        
+        self.export_btn = Gtk.Button.new_with_label("💾 Exportar Status")
+        self.export_btn.connect("clicked", self.export_status)
+        action_box.pack_start(self.export_btn, False, False, 0)
+        
+        self.export_progress = Gtk.ProgressBar(show_text=True)
+        self.export_progress.set_valign(Gtk.Align.CENTER)
+        self.export_progress.set_no_show_all(True)
+        action_box.pack_start(self.export_progress, True, True, 0)
+        
+        self.main_box.pack_end(action_box, False, False, 0)
+        
+        self.add(self.main_box)
+        self.collector.subscribe(self.update_ui)
+        self.scans.subscribe(self.on_scans)
+        self.refresh()
+    
+    def start_scrub(self, widget, pool_name):
+        widget.set_sensitive(False)
+        widget.set_label("⏳ Executando...")
+        
+        def scrub_done(result):
+            widget.set_sensitive(True)
+            widget.set_label("⏱ Iniciar Scrub")
+            self.refresh(widget)
+            if result.ok:
+                self.notifier.notify(f"scrub:{pool_name}", "Scrub iniciado",
+                                     f"A operação de scrub foi iniciada com sucesso no pool {pool_name}", URGENCY_LOW)
+            else:
+                self.notifier.notify(f"scrub:{pool_name}", "Erro no scrub", result.text())
+        
+        runner.run(["zpool", "scrub", pool_name], scrub_done, timeout=300)
+    
+    # Ask for a file, range and vdev filter, then stream the cached snapshot
+    # and the stored history there on a worker thread; while it runs the
+    # button cancels it
+    def export_status(self, widget):
+        if self.export is not None:
+            self.export.cancel()
+            return
+        
+        dialog = Gtk.FileChooserDialog(
+            title="Exportar Status",
+            parent=None,
+            action=Gtk.FileChooserAction.SAVE,
+            buttons=("_Cancelar", Gtk.ResponseType.CANCEL, "_Salvar", Gtk.ResponseType.OK)
+        )
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_name(f"zfs_status_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        for name, pattern in (("JSON Lines", "*.jsonl*"), ("CSV", "*.csv*")):
+            file_filter = Gtk.FileFilter()
+            file_filter.set_name(name)
+            file_filter.add_pattern(pattern)
+            dialog.add_filter(file_filter)
+        
+        options = Gtk.Grid(column_spacing=10, row_spacing=6)
+        range_combo = Gtk.ComboBoxText()
+        for label, seconds in EXPORT_RANGES:
+            range_combo.append_text(label)
+        range_combo.set_active(1)
+        compression_combo = Gtk.ComboBoxText()
+        for label in ("Pelo nome do arquivo", "gzip (.gz)", "zstd (.zst)"):
+            compression_combo.append_text(label)
+        compression_combo.set_active(0)
+        vdev_entry = Gtk.Entry(placeholder_text="todos, ou tank, tank/mirror-0/*")
+        fields = (("Período:", range_combo),) if self.store else ()
+        fields += (("Compressão:", compression_combo), ("Vdevs:", vdev_entry))
+        for row, (label, field) in enumerate(fields):
+            options.attach(Gtk.Label(label=label, halign=Gtk.Align.END), 0, row, 1, 1)
+            options.attach(field, 1, row, 1, 1)
+        options.show_all()
+        dialog.set_extra_widget(options)
+        
+        response = dialog.run()
+        filename = dialog.get_filename()
+        seconds = EXPORT_RANGES[range_combo.get_active()][1]
+        compression = (None, 'gzip', 'zstd')[compression_combo.get_active()]
+        patterns = vdev_entry.get_text().replace(',', ' ').split()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK or not filename:
+            return
+        
+        format, guessed = guess_format(filename)
+        if compression is not None and guessed != compression:
+            filename += {'gzip': '.gz', 'zstd': '.zst'}[compression]
+        snapshot = self.collector.snapshot
+        now = time.time()
+        self.export = Export(
+            filename, format, compression or guessed,
+            start=now - seconds if seconds else None, patterns=patterns, history=self.store is not None,
+            pools=snapshot.pools if snapshot is not None else None, timestamp=now,
+        )
+        self.export_btn.set_label("✖ Cancelar Exportação")
+        self.export_progress.set_fraction(0)
+        self.export_progress.set_text("Exportando...")
+        self.export_progress.show()
+        if self.store:
+            self.store.export(self.export, self.export_progressed, self.export_done)
+        else:
+            start_export(self.export, self.export_progressed, self.export_done)
+    
+    def export_progressed(self, done, total):
+        if self.export is not None and total:
+            self.export_progress.set_fraction(done / total)
+            self.export_progress.set_text(f"{done}/{total} amostras")
+    
+    def export_done(self, rows, error):
+        path = self.export.path
+        self.export = None
+        self.export_btn.set_label("💾 Exportar Status")
+        self.export_progress.hide()
+        if error is None:
+            self.notifier.notify("export", "Exportação concluída", f"{rows} linhas salvas em {path}", URGENCY_LOW)
+        elif isinstance(error, ExportCancelled):
+            self.notifier.notify("export", "Exportação cancelada", path, URGENCY_LOW)
+        else:
+            self.notifier.notify("export", "Erro na exportação", str(error))
+    
+    # Persistent widgets: one PoolStatusView per pool, added and removed as
+    # pools appear in or leave the snapshots
+    def build_sections(self):
+        self.placeholder = create_formatted_label("Coletando dados...", halign=Gtk.Align.CENTER)
+        self.info_container.pack_start(self.placeholder, True, True, 0)
+        
+        self.error_label = create_formatted_label("", color=(1,0,0))
+        self.info_container.pack_start(self.error_label, True, True, 0)
+        
+        # Worst state across every pool
+        self.overall_label = create_formatted_label("")
+        self.info_container.pack_start(self.overall_label, False, False, 0)
+        
+        self.pools_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.info_container.pack_start(self.pools_box, True, True, 0)
+        
+        # Visibility is managed per widget from here on
+        self.info_container.show_all()
+        for widget in self.info_container.get_children():
+            widget.set_no_show_all(True)
+            if widget is not self.placeholder:
+                widget.hide()
+        
+        self.fingerprint = None
+        self.views = {}
+    
+    def refresh(self, widget=None):
+        # The manual button always asks for a new snapshot
+        if self.collector.request(force=widget is not None):
+            self.spinner.start()
+        elif self.collector.snapshot is not None:
+            self.update_ui(self.collector.snapshot)
+    
+    @timed("render:status tab")
+    def update_ui(self, snapshot):
+        self.spinner.stop()
+        # Nothing changed since the last render
+        if snapshot.fingerprint == self.fingerprint:
+            return
+        self.fingerprint = snapshot.fingerprint
+        self.placeholder.hide()
+        
+        pools = {name: pool for name, pool in snapshot.pools.items() if pool.state is not None}
+        if not pools:
+            raw = GLib.markup_escape_text(snapshot.output or 'Sem dados')
+            self.error_label.set_markup(f"<b>Erro ao obter status:</b>\n<tt>{raw}</tt>")
+            self.error_label.show()
+            self.overall_label.hide()
+            self.pools_box.hide()
+            return
+        self.error_label.hide()
+        
+        worst = worst_state(pools.values())
+        color = ('#2ecc71', '#f1c40f', '#e74c3c', '#e74c3c')[STATE_SEVERITY.get(worst, 1)]
+        self.overall_label.set_markup(
+            f"<b>Estado geral:</b> <span color='{color}'>{worst}</span> ({len(pools)} pools)")
+        self.overall_label.show()
+        
+        # Pools that are gone
+        for name in [name for name in self.views if name not in pools]:
+            self.views.pop(name).destroy()
+        
+        # Pools in output order, creating views for new ones
+        for position, (name, pool) in enumerate(pools.items()):
+            view = self.views.get(name)
+            if view is None:
+                view = self.views[name] = PoolStatusView(name, None if self.collector.remote else self.start_scrub)
+                view.update_scan(self.scans.trackers.get(name))
+                self.pools_box.pack_start(view, False, False, 0)
+            self.pools_box.reorder_child(view, position)
+            view.update(pool, snapshot.sections[name])
+        self.pools_box.show()
+    
+    # Scan rates change on every snapshot while a scan runs, even when the
+    # rest of the output does not
+    def on_scans(self, events):
+        for kind, tracker in events:
+            view = self.views.get(tracker.pool)
+            if view is not None:
+                view.update_scan(None if kind == "finished" else tracker)
+
+# Performance Tab
+class PerformanceTab(Gtk.ScrolledWindow):
+    # `listeners` also receive every report (alert engine, metrics exporter);
+    # the latency histograms are matched to the vdevs of `collector`'s snapshots
+    def __init__(self, collector, scheduler, listeners=()):
+        super().__init__()
+        self.collector = collector
+        self.scheduler = scheduler
+        self.listeners = listeners
+        self.interval = None
+        self.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        
+        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=15)
+        self.main_box.set_margin_start(20)
+        self.main_box.set_margin_end(20)
+        self.main_box.set_margin_top(20)
+        self.main_box.set_margin_bottom(20)
+        
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        title = create_formatted_label("<big><b>Desempenho em Tempo Real</b></big>")
+        header.pack_start(title, False, False, 0)
+        
+        self.spinner = LoadingSpinner()
+        header.pack_end(self.spinner, False, False, 0)
+        self.main_box.pack_start(header, False, False, 0)
+        
+        self.history = MetricHistory()
+        self.stats_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.main_box.pack_start(self.stats_container, True, True, 0)
+        self.build_stats()
+        
+        # Controls
+        controls_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        
+        self.interval_combo = Gtk.ComboBoxText()
+        self.interval_combo.append_text("Atualização rápida (2s)")
+        self.interval_combo.append_text("Atualização normal (5s)")
+        self.interval_combo.append_text("Atualização lenta (10s)")
+        self.interval_combo.set_active(1)
+        self.interval_combo.connect("changed", self.change_interval)
+        controls_box.pack_start(self.interval_combo, False, False, 0)
+        
+        history_btn = Gtk.Button.new_with_label("📈 Histórico (Última hora)")
+        history_btn.connect("clicked", self.show_history)
+        controls_box.pack_end(history_btn, False, False, 0)
+        
+        self.main_box.pack_end(controls_box, False, False, 0)
+        
+        self.add(self.main_box)
+        self.store = HistoryStore()
+        self.restore_history()
+        self.sampler = make_sampler(POOLS, self.on_report, self.show_error)
+        self.latency = LatencyWindow()
+        self.histograms = make_histogram_sampler(POOLS, collector, self.latency.add, self.show_error)
+        self.arc = ArcReader()
+        self.connect("destroy", self.on_destroy)
+        self.scheduler.subscribe(self.change_interval)
+        self.change_interval()
+    
+    # The chosen interval while the tab is on screen, IOSTAT_HIDDEN otherwise;
+    # the stream is only restarted when that changes
+    def change_interval(self, widget=None):
+        if self.scheduler.is_visible(('performance',)):
+            index = self.interval_combo.get_active()
+            intervals = [2, 5, 10]
+            interval = intervals[index]
+        else:
+            interval = IOSTAT_HIDDEN
+        if interval == self.interval:
+            return
+        self.interval = interval
+        
+        # The stream only reports after its first interval has elapsed
+        self.spinner.start()
+        self.sampler.start(interval)
+        if self.histograms:
+            self.histograms.start(max(interval, LATENCY_INTERVAL))
+    
+    def on_destroy(self, widget):
+        self.sampler.stop()
+        if self.histograms:
+            self.histograms.stop()
+        self.arc.close()
+        self.store.close()
+    
+    # Refill every in-memory tier from the store so history survives restarts
+    def restore_history(self):
+        now = time.time()
+        for tier in self.history.tiers:
+            self.store.query(
+                now - tier.step * tier.size, now, tier.step,
+                lambda series, step=tier.step: self.on_restored(step, series)
+            )
+    
+    def on_restored(self, step, series):
+        self.history.restore(step, series)
+        for chart in self.charts():
+            chart.set_series(chart.path, chart.metrics, chart.seconds)
+    
+    def on_report(self, report):
+        timestamp = time.time()
+        self.latency.annotate(report)
+        # ARC counters are read on the same beat, so their ratios cover the
+        # same interval as the report
+        arc = self.arc.sample()
+        series = list(arc_series(arc)) if arc else ()
+        self.history.record(timestamp, report, series)
+        self.store.append(timestamp, report, series)
+        for listener in self.listeners:
+            listener(report)
+        self.update_ui(report)
+        self.update_arc(arc)
+        sample = dict(report_series(report))
+        for chart in self.charts():
+            chart.add(timestamp, sample)
+    
+    def show_history(self, widget):
+        dialog = Gtk.Dialog(
+            title="Histórico de Desempenho",
+            parent=None,
+            flags=0
+        )
+        dialog.set_default_size(700, 450)
+        
+        content = dialog.get_content_area()
+        content.set_spacing(10)
+        
+        tier_combo = Gtk.ComboBoxText()
+        tier_combo.append_text("Última hora (1 s)")
+        tier_combo.append_text("Último dia (1 min)")
+        tier_combo.append_text("Última semana (15 min)")
+        tier_combo.set_active(0)
+        content.pack_start(tier_combo, False, False, 0)
+        
+        # Device, metric, min, avg, max, samples
+        store = Gtk.ListStore(str, str, str, str, str, int)
+        view = Gtk.TreeView(model=store)
+        for col, title in enumerate(["Dispositivo", "Métrica", "Mínimo", "Média", "Máximo", "Amostras"]):
+            renderer = Gtk.CellRendererText()
+            if col >= 2:
+                renderer.set_property("xalign", 1.0)
+            column = Gtk.TreeViewColumn(title, renderer, text=col)
+            column.set_resizable(True)
+            view.append_column(column)
+        
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(view)
+        content.pack_start(scrolled, True, True, 0)
+        
+        # Everything comes from the ring buffers; zpool is never queried here
+        def fill(combo):
+            tier = self.history.tiers[combo.get_active()]
+            store.clear()
+            for path, metric in self.history.keys():
+                points = tier.points((path, metric))
+                if not points:
+                    continue
+                low, avg, high = tier.summary((path, metric))
+                store.append([
+                    path,
+                    HISTORY_LABELS[metric],
+                    format_metric(metric, low),
+                    format_metric(metric, avg),
+                    format_metric(metric, high),
+                    len(points)
+                ])
+        
+        tier_combo.connect("changed", fill)
+        fill(tier_combo)
+        
+        dialog.add_button("_Fechar", Gtk.ResponseType.CLOSE)
+        dialog.connect("response", lambda dialog, response: dialog.destroy())
+        dialog.show_all()
+    
+    # Persistent widgets: summary labels and a per-vdev model that later
+    # reports only patch in place
+    def build_stats(self):
+        self.error_label = create_formatted_label("", color=(1,0,0))
+        self.error_label.set_no_show_all(True)
+        self.stats_container.pack_start(self.error_label, False, False, 0)
+        
+        # Stats grid
+        grid = Gtk.Grid(column_spacing=12, row_spacing=8)
+        grid.set_margin_top(10)
+        
+        # Headers
+        grid.attach(create_formatted_label("<b>Métrica</b>", bold=True), 0, 0, 1, 1)
+        grid.attach(create_formatted_label("<b>Valor</b>", bold=True, halign=Gtk.Align.END), 1, 0, 1, 1)
+        
+        metrics = [
+            ("Capacidade Alocada", 'alloc'),
+            ("Espaço Livre", 'free'),
+            ("Operações Leitura/s", 'read_ops'),
+            ("Operações Escrita/s", 'write_ops'),
+            ("Largura Banda Leitura", 'read_bw'),
+            ("Largura Banda Escrita", 'write_bw'),
+            ("Latência Leitura p99", 'read_p99'),
+            ("Latência Escrita p99", 'write_p99'),
+            ("Fila Pendente", 'queue_pending')
+        ]
+        
+        self.summary_labels = {}
+        for i, (label, metric) in enumerate(metrics, start=1):
+            grid.attach(create_formatted_label(label), 0, i, 1, 1)
+            value_label = create_formatted_label("-", halign=Gtk.Align.END)
+            grid.attach(value_label, 1, i, 1, 1)
+            self.summary_labels[metric] = value_label
+        
+        # ARC, L2ARC and ZIL, beside the pool totals; hidden without arcstats
+        self.arc_grid = Gtk.Grid(column_spacing=12, row_spacing=8)
+        self.arc_grid.set_margin_top(10)
+        self.arc_grid.attach(create_formatted_label("<b>Cache e ZIL</b>", bold=True), 0, 0, 1, 1)
+        self.arc_grid.attach(create_formatted_label("<b>Valor</b>", bold=True, halign=Gtk.Align.END), 1, 0, 1, 1)
+        
+        arc_metrics = [
+            ("Tamanho ARC", 'arc_size'),
+            ("ARC MRU / MFU", 'arc_mru_size'),
+            ("Acertos ARC", 'arc_hit_ratio'),
+            ("Acertos Demanda", 'arc_demand_hit_ratio'),
+            ("Acertos Prefetch", 'arc_prefetch_hit_ratio'),
+            ("Despejo ARC", 'arc_evict_bw'),
+            ("Tamanho L2ARC", 'l2_size'),
+            ("Acertos L2ARC", 'l2_hit_ratio'),
+            ("Leitura / Escrita L2ARC", 'l2_read_bw'),
+            ("Commits ZIL/s", 'zil_commit_rate'),
+            ("ZIL SLOG / Pool", 'zil_slog_bw'),
+            ("Acertos dbuf", 'dbuf_hit_ratio')
+        ]
+        
+        self.arc_labels = {}
+        for i, (label, metric) in enumerate(arc_metrics, start=1):
+            self.arc_grid.attach(create_formatted_label(label), 0, i, 1, 1)
+            value_label = create_formatted_label("-", halign=Gtk.Align.END)
+            self.arc_grid.attach(value_label, 1, i, 1, 1)
+            self.arc_labels[metric] = value_label
+        self.arc_grid.set_no_show_all(True)
+        
+        summary_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=40)
+        summary_box.pack_start(grid, False, False, 0)
+        summary_box.pack_start(self.arc_grid, False, False, 0)
+        self.stats_container.pack_start(summary_box, False, False, 20)
+        self.build_charts()
+        
+        # Devices
+        separator = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
+        self.stats_container.pack_start(separator, False, False, 10)
+        
+        devices_header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        devices_header.pack_start(create_formatted_label("<b>▣ Desempenho por Dispositivo</b>"), False, False, 0)
+        self.filter_entry = Gtk.SearchEntry()
+        self.filter_entry.set_placeholder_text("Filtrar dispositivos")
+        self.filter_entry.connect("search-changed", lambda _: self.device_filter.refilter())
+        devices_header.pack_end(self.filter_entry, False, False, 0)
+        self.stats_container.pack_start(devices_header, False, False, 0)
+        
+        # Devices table: path, display name, then one float per VDEV_COLUMNS.
+        # Rows are keyed by vdev path and only their changed cells are set;
+        # the cells are formatted when drawn, so only visible rows cost anything.
+        self.device_store = Gtk.ListStore(str, str, *([float] * len(VDEV_COLUMNS)))
+        self.device_rows = {}   # path -> iter (ListStore iters persist)
+        self.device_values = {} # path -> values currently in the model
+        self.device_filter = self.device_store.filter_new()
+        self.device_filter.set_visible_func(self.device_visible)
+        devices_view = Gtk.TreeView(model=Gtk.TreeModelSort(model=self.device_filter))
+        
+        name_column = Gtk.TreeViewColumn("Dispositivo", Gtk.CellRendererText(), text=1)
+        name_column.set_sort_column_id(0)
+        name_column.set_expand(True)
+        devices_view.append_column(name_column)
+        
+        headers = ["Alocado", "Livre", "Ops R", "Ops W", "BW R", "BW W",
+                   "Espera R", "Espera W", "p99 R", "p99 W", "Fila"]
+        for col, (header, metric) in enumerate(zip(headers, VDEV_COLUMNS), start=2):
+            renderer = Gtk.CellRendererText()
+            renderer.set_property("xalign", 1.0)
+            column = Gtk.TreeViewColumn(header, renderer)
+            column.set_cell_data_func(renderer, self.format_cell, (col, metric))
+            column.set_sort_column_id(col)
+            devices_view.append_column(column)
+        devices_view.get_selection().connect("changed", self.on_device_selected)
+        
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_min_content_height(250)
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(devices_view)
+        self.stats_container.pack_start(scrolled, True, True, 0)
+        
+        # Latency breakdown of the selected device
+        self.selected_path = None
+        self.last_report = {}
+        self.latency_label = create_formatted_label("Selecione um dispositivo para ver a distribuição de latência.")
+        self.stats_container.pack_start(self.latency_label, False, False, 0)
+    
+    # A large chart of the selected device (the first pool by default) and a
+    # sparkline per device, all showing the chosen metric and range
+    def build_charts(self):
+        expander = Gtk.Expander(label="<b>📈 Gráficos</b>", use_markup=True, expanded=True)
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        box.set_margin_top(10)
+        
+        controls = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        self.chart_metric_combo = Gtk.ComboBoxText()
+        for label, _ in CHART_METRICS:
+            self.chart_metric_combo.append_text(label)
+        self.chart_metric_combo.set_active(0)
+        self.chart_range_combo = Gtk.ComboBoxText()
+        for label, _ in CHART_RANGES:
+            self.chart_range_combo.append_text(label)
+        self.chart_range_combo.set_active(0)
+        for combo in (self.chart_metric_combo, self.chart_range_combo):
+            combo.connect("changed", self.change_charts)
+            controls.pack_start(combo, False, False, 0)
+        self.chart_title = create_formatted_label("")
+        controls.pack_start(self.chart_title, False, False, 0)
+        box.pack_start(controls, False, False, 0)
+        
+        metrics, seconds = self.chart_settings()
+        self.chart_path = None
+        self.chart = MetricChart(self.history, None, metrics, seconds, 160)
+        box.pack_start(self.chart, False, False, 0)
+        
+        self.sparklines = {}   # path -> (FlowBoxChild, MetricChart)
+        self.sparkline_box = Gtk.FlowBox()
+        self.sparkline_box.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.sparkline_box.set_homogeneous(True)
+        self.sparkline_box.set_max_children_per_line(8)
+        box.pack_start(self.sparkline_box, False, False, 0)
+        
+        expander.add(box)
+        self.stats_container.pack_start(expander, False, False, 0)
+    
+    def chart_settings(self):
+        metrics = CHART_METRICS[self.chart_metric_combo.get_active()][1]
+        seconds = CHART_RANGES[self.chart_range_combo.get_active()][1]
+        return metrics, seconds
+    
+    def charts(self):
+        return [self.chart, *(chart for _, chart in self.sparklines.values())]
+    
+    def change_charts(self, widget=None):
+        metrics, seconds = self.chart_settings()
+        for chart in self.charts():
+            chart.set_series(chart.path, metrics, seconds)
+        self.update_chart_title()
+    
+    # The large chart follows the selected device
+    def update_chart_title(self):
+        path = self.selected_path or next(iter(self.last_report), None)
+        metrics = self.chart.metrics
+        if path != self.chart.path:
+            self.chart.set_series(path, metrics, self.chart.seconds)
+        legend = ' · '.join(
+            f"<span color='#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}'>■</span> {HISTORY_LABELS[metric]}"
+            for metric, (r, g, b) in zip(metrics, CHART_COLORS)
+        )
+        markup = f"<b>{GLib.markup_escape_text(path or '-')}</b>  {legend}"
+        if self.chart_title.get_label() != markup:
+            self.chart_title.set_markup(markup)
+    
+    def add_sparkline(self, path):
+        metrics, seconds = self.chart_settings()
+        chart = MetricChart(self.history, path, metrics, seconds, 40)
+        chart.set_size_request(160, 40)
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        label = create_formatted_label(GLib.markup_escape_text(path), size=0.8)
+        label.set_line_wrap(False)
+        label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+        box.pack_start(label, False, False, 0)
+        box.pack_start(chart, False, False, 0)
+        child = Gtk.FlowBoxChild()
+        child.add(box)
+        child.show_all()
+        self.sparkline_box.add(child)
+        self.sparklines[path] = (child, chart)
+    
+    def device_visible(self, model, tree_iter, data):
+        text = self.filter_entry.get_text().strip()
+        return not text or text in model[tree_iter][0]
+    
+    def format_cell(self, column, renderer, model, tree_iter, data):
+        col, metric = data
+        value = model[tree_iter][col]
+        renderer.set_property("text", format_metric(metric, None if value < 0 else value))
+    
+    def on_device_selected(self, selection):
+        model, tree_iter = selection.get_selected()
+        self.selected_path = model[tree_iter][0] if tree_iter else None
+        self.update_latency_label()
+        self.update_chart_title()
+    
+    # Averages of the last interval, windowed quantiles and queue depths of
+    # the selected device
+    def update_latency_label(self):
+        path = self.selected_path
+        pool = self.last_report.get(path.split('/')[0]) if path else None
+        record = pool if pool is not None and path == pool.name else pool and pool.vdevs.get(path)
+        if record is None:
+            return
+        latency = record.latency or {}
+        lines = [f"<b>{GLib.markup_escape_text(path)}</b>"]
+        for direction, label in (('read', "Leitura"), ('write', "Escrita")):
+            quantiles = ' · '.join(
+                f"p{q * 100:g} {format_latency(latency.get(f'total_wait_{direction}_{suffix}'))}"
+                for suffix, q in QUANTILES
+            )
+            lines.append(
+                f"{label}: média {format_latency(latency.get(f'total_wait_{direction}'))}"
+                f" (disco {format_latency(latency.get(f'disk_wait_{direction}'))}) · {quantiles}"
+            )
+        lines.append(f"Fila: {format_number(record.queue_pending)} pendentes, {format_number(record.queue_active)} ativas")
+        markup = '\n'.join(lines)
+        if self.latency_label.get_label() != markup:
+            self.latency_label.set_markup(markup)
+    
+    def show_error(self, message):
+        self.spinner.stop()
+        self.error_label.set_markup(f"<b>Erro ao obter estatísticas:</b>\n{GLib.markup_escape_text(message)}")
+        self.error_label.show()
+    
+    @timed("render:performance tab")
+    def update_ui(self, stats):
+        if not stats:
+            self.show_error(str(stats))
+            return
+        
+        self.spinner.stop()
+        self.error_label.hide()
+        
+        # Summary totals across every pool; the worst pool for latencies
+        for metric, label in self.summary_labels.items():
+            values = [getattr(pool, metric) for pool in stats.values()]
+            total = None if None in values else (max if metric.endswith('_p99') else sum)(values)
+            value = format_metric(metric, total)
+            if label.get_text() != value:
+                label.set_text(value)
+        
+        added, changed, removed = vdev_row_changes(self.device_values, stats)
+        for path in removed:
+            self.device_store.remove(self.device_rows.pop(path))
+            self.sparklines.pop(path)[0].destroy()
+        for path, cells in changed.items():
+            columns = [col + 2 for col in cells]
+            self.device_store.set(self.device_rows[path], columns, list(cells.values()))
+        for path, values in added.items():
+            self.device_rows[path] = self.device_store.append([path, path, *values])
+            self.add_sparkline(path)
+        
+        self.last_report = stats
+        self.update_latency_label()
+        self.update_chart_title()
+    
+    # Some rows pair two values: MRU/MFU, L2ARC read/write, SLOG/pool ZIL writes
+    def update_arc(self, arc):
+        if arc is None:
+            self.arc_grid.hide()
+            return
+        for metric, label in self.arc_labels.items():
+            value = format_metric(metric, getattr(arc, metric))
+            if metric == 'arc_size' and arc.arc_target is not None:
+                value = f"{value} (alvo {format_metric(metric, arc.arc_target)})"
+            elif metric == 'arc_mru_size':
+                value = f"{value} / {format_metric('arc_mfu_size', arc.arc_mfu_size)}"
+            elif metric == 'l2_read_bw':
+                value = f"{value} / {format_metric('l2_write_bw', arc.l2_write_bw)}"
+            elif metric == 'zil_slog_bw':
+                value = f"{value} / {format_metric('zil_normal_bw', arc.zil_normal_bw)}"
+            if label.get_text() != value:
+                label.set_text(value)
+        self.arc_grid.show_all()
+
+# Alerts Tab
+class AlertsTab(Gtk.ScrolledWindow):
+    def __init__(self, collector, engine):
+        super().__init__()
+        self.collector = collector
+        self.engine = engine
+        self.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        
+        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=15)
+        self.main_box.set_margin_start(20)
+        self.main_box.set_margin_end(20)
+        self.main_box.set_margin_top(20)
+        self.main_box.set_margin_bottom(20)
+        
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        title = create_formatted_label("<big><b>Monitoramento de Alertas</b></big>")
+        header.pack_start(title, False, False, 0)
+        
+        self.spinner = LoadingSpinner()
+        header.pack_end(self.spinner, False, False, 0)
+        self.main_box.pack_start(header, False, False, 0)
+        
+        self.alerts_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.main_box.pack_start(self.alerts_container, True, True, 0)
+        
+        # Only this box is rebuilt, and only when the open alerts change
+        self.problems_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.alerts_container.pack_start(self.problems_box, True, True, 0)
+        self.build_commands()
+        self.problems = None
+        
+        self.add(self.main_box)
+        self.collector.subscribe(self.on_snapshot)
+        self.engine.subscribe(self.on_alerts)
+        # The tray's scheduler polls the status; wait for its first snapshot
+        self.spinner.start()
+    
+    # The engine has already evaluated the snapshot; the first one also
+    # replaces the empty box when nothing is open
+    def on_snapshot(self, snapshot):
+        self.spinner.stop()
+        if self.problems is None and snapshot.pools:
+            self.on_alerts(())
+    
+    def on_alerts(self, events):
+        problems = [(alert.severity, alert.title, alert.description) for alert in self.engine.active()]
+        if problems != self.problems:
+            self.problems = problems
+            self.update_ui(problems)
+    
+    @timed("render:alerts tab")
+    def update_ui(self, problems):
+        # Clear container
+        for child in self.problems_box.get_children():
+            self.problems_box.remove(child)
+        
+        if not problems:
+            # Healthy pool
+            success_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+            success_box.set_valign(Gtk.Align.CENTER)
+            success_box.set_halign(Gtk.Align.CENTER)
+            
+            icon = Gtk.Image.new_from_icon_name("emblem-default", Gtk.IconSize.DIALOG)
+            success_box.pack_start(icon, False, False, 0)
+            
+            title = create_formatted_label("<big><b>✓ Pool Saudável</b></big>", color=(0.18, 0.80, 0.44))
+            success_box.pack_start(title, False, False, 0)
+            
+            msg = create_formatted_label("Não foram detectados problemas críticos no momento.")
+            success_box.pack_start(msg, False, False, 0)
+            
+            self.problems_box.pack_start(success_box, True, True, 0)
+        else:
+            for severity, title, description in problems:
+                alert_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+                alert_box.set_margin_top(10)
+                alert_box.set_margin_bottom(10)
+                
+                # Header with icon
+                header_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+                
+                if severity == "CRÍTICO":
+                    icon_name = "dialog-error"
+                    color = (0.91, 0.30, 0.24)
+                elif severity == "ALERTA":
+                    icon_name = "dialog-warning"
+                    color = (0.95, 0.75, 0.06)
+                else:
+                    icon_name = "dialog-information"
+                    color = (0.20, 0.60, 0.86)
+                
+                icon = Gtk.Image.new_from_icon_name(icon_name, Gtk.IconSize.BUTTON)
+                header_box.pack_start(icon, False, False, 0)
+                
+                title_label = create_formatted_label(f"<b>{severity}: {title}</b>", color=color)
+                header_box.pack_start(title_label, False, False, 0)
+                
+                alert_box.pack_start(header_box, False, False, 0)
+                
+                # Description
+                desc_label = create_formatted_label(description)
+                alert_box.pack_start(desc_label, False, False, 0)
+                
+                self.problems_box.pack_start(alert_box, False, False, 0)
+        
+        self.problems_box.show_all()
+    
+    def build_commands(self):
+        # Useful commands
+        separator = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
+        self.alerts_container.pack_start(separator, False, False, 10)
+        
+        commands_title = create_formatted_label("<b>⚙ Comandos Úteis</b>")
+        self.alerts_container.pack_start(commands_title, False, False, 0)
+        
+        commands = [
+            "zpool scrub <pool>  # Verificar integridade",
+            "zpool status -v     # Status detalhado",
+            "zpool clear <pool>  # Limpar erros",
+            "zpool replace <pool> dispositivo  # Substituir dispositivo"
+        ]
+        
+        for cmd in commands:
+            cmd_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+            cmd_box.pack_start(create_formatted_label("• "), False, False, 0)
+            cmd_box.pack_start(create_formatted_label(f"<tt>{GLib.markup_escape_text(cmd)}</tt>"), False, False, 0)
+            self.alerts_container.pack_start(cmd_box, False, False, 0)
+
+# Datasets Tab: usage from `zfs list` and I/O from the objset kstats, for
+# thousands of rows. The tree view runs in fixed-height mode and formats
+# cells as they are drawn, so only the visible rows cost anything; refreshes
+# patch the changed cells of changed datasets only, and large batches of
+# new rows are inserted unsorted with the view detached from its model.
+DATASET_COLUMNS = ('used', 'avail', 'refer', 'quota', 'growth', 'read_ops', 'write_ops', 'read_bw', 'write_bw')
+UNKNOWN = float('-inf')
+
+class DatasetsTab(Gtk.Box):
+    def __init__(self, scheduler):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.set_margin_start(20)
+        self.set_margin_end(20)
+        self.set_margin_top(20)
+        self.set_margin_bottom(20)
+        self.table = DatasetTable()
+        self.kstats = KstatReader(POOLS)
+        self.rows = {}     # name -> iter (ListStore iters persist)
+        self.values = {}   # name -> values currently in the model
+        
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        header.pack_start(create_formatted_label("<big><b>Datasets e Volumes</b></big>"), False, False, 0)
+        self.spinner = LoadingSpinner()
+        header.pack_end(self.spinner, False, False, 0)
+        self.filter_entry = Gtk.SearchEntry()
+        self.filter_entry.set_placeholder_text("Filtrar datasets")
+        self.filter_entry.connect("search-changed", lambda _: self.filter.refilter())
+        header.pack_end(self.filter_entry, False, False, 0)
+        self.pack_start(header, False, False, 0)
+        
+        self.error_label = create_formatted_label("", color=(1,0,0))
+        self.error_label.set_no_show_all(True)
+        self.pack_start(self.error_label, False, False, 0)
+        
+        # Top-N rankings, one grid of name/value labels each
+        rankings = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=20)
+        self.rankings = {}
+        for metric, title in (('write_bw', "Mais escrita"), ('growth', "Maior crescimento")):
+            grid = Gtk.Grid(column_spacing=12, row_spacing=4)
+            grid.attach(create_formatted_label(f"<b>{title}</b>"), 0, 0, 2, 1)
+            labels = []
+            for row in range(1, DATASET_TOP + 1):
+                name_label = create_formatted_label("")
+                name_label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+                name_label.set_line_wrap(False)
+                name_label.set_hexpand(True)
+                value_label = create_formatted_label("", halign=Gtk.Align.END)
+                grid.attach(name_label, 0, row, 1, 1)
+                grid.attach(value_label, 1, row, 1, 1)
+                labels.append((name_label, value_label))
+            self.rankings[metric] = labels
+            rankings.pack_start(grid, True, True, 0)
+        self.pack_start(rankings, False, False, 0)
+        
+        # Name, type, then one float per DATASET_COLUMNS (UNKNOWN when missing)
+        self.store = Gtk.ListStore(str, str, *([float] * len(DATASET_COLUMNS)))
+        self.filter = self.store.filter_new()
+        self.filter.set_visible_func(self.dataset_visible)
+        self.sorted = Gtk.TreeModelSort(model=self.filter)
+        self.sorted.set_sort_column_id(0, Gtk.SortType.ASCENDING)
+        self.view = Gtk.TreeView(model=self.sorted)
+        self.view.set_fixed_height_mode(True)
+        
+        for col, (title, width) in enumerate((("Dataset", 320), ("Tipo", 90))):
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=col)
+            column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+            column.set_fixed_width(width)
+            column.set_resizable(True)
+            column.set_sort_column_id(col)
+            self.view.append_column(column)
+        headers = ["Usado", "Disponível", "Referenciado", "Cota", "Crescimento", "Ops L/s", "Ops E/s", "BW L", "BW E"]
+        for col, (title, metric) in enumerate(zip(headers, DATASET_COLUMNS), start=2):
+            renderer = Gtk.CellRendererText()
+            renderer.set_property("xalign", 1.0)
+            column = Gtk.TreeViewColumn(title, renderer)
+            column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+            column.set_fixed_width(100)
+            column.set_resizable(True)
+            column.set_cell_data_func(renderer, self.format_cell, (col, metric))
+            column.set_sort_column_id(col)
+            self.view.append_column(column)
+        
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(self.view)
+        self.pack_start(scrolled, True, True, 0)
+        
+        self.spinner.start()
+        scheduler.add('datasets', self.poll_usage, DATASET_REFRESH,
+                      hidden_interval=DATASET_HIDDEN, views=('datasets',))
+        scheduler.add('dataset-io', self.poll_io, DATASET_IO,
+                      hidden_interval=DATASET_IO_HIDDEN, views=('datasets',))
+    
+    def dataset_visible(self, model, tree_iter, data):
+        text = self.filter_entry.get_text().strip()
+        return not text or text in model.get_value(tree_iter, 0)
+    
+    def format_cell(self, column, renderer, model, tree_iter, data):
+        col, metric = data
+        value = model.get_value(tree_iter, col)
+        if value == UNKNOWN:
+            text = '-'
+        elif metric == 'growth':
+            text = f"{'+' if value >= 0 else '-'}{format_number(abs(value) * 3600)}/h"
+        else:
+            text = format_metric(metric, value)
+        renderer.set_property("text", text)
+    
+    def poll_usage(self, done):
+        def listed(result):
+            self.spinner.stop()
+            if not result.ok:
+                self.error_label.set_markup(f"<b>Erro ao listar datasets:</b>\n{GLib.markup_escape_text(result.text())}")
+                self.error_label.show()
+                done(False)
+                return
+            self.error_label.hide()
+            with stats.timer("parse:zfs list"):
+                added, changed, removed = self.table.update_usage(result.stdout, time.monotonic())
+            self.update_rows(added, changed, removed)
+            done(True)
+        
+        runner.run(dataset_command(POOLS), listed, timeout=60)
+    
+    # Objset kstats are plain file reads on the main loop; no fork
+    def poll_io(self, done):
+        with stats.timer("sample:objset kstats"):
+            changed = self.table.update_io(self.kstats.sample_datasets())
+        self.update_rows((), changed, ())
+        done(True)
+    
+    @timed("render:datasets tab")
+    def update_rows(self, added, changed, removed):
+        for name in removed:
+            self.store.remove(self.rows.pop(name))
+            del self.values[name]
+        for name in changed:
+            dataset = self.table.datasets.get(name)
+            if dataset is None or name not in self.rows:
+                continue
+            values = self.row_values(dataset)
+            previous = self.values[name]
+            if values != previous:
+                columns = [col for col, (old, new) in enumerate(zip(previous, values), start=2) if old != new]
+                self.store.set(self.rows[name], columns, [values[col - 2] for col in columns])
+                self.values[name] = values
+        
+        # Inserting thousands of rows into a sorted, attached model resorts
+        # and redraws on every row: the sort model stays unsorted and the
+        # view detached until the batch is in, then sorts once
+        detach = len(added) > 100
+        if detach:
+            column, order = self.sorted.get_sort_column_id()
+            self.view.set_model(None)
+            self.sorted.set_sort_column_id(Gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID, Gtk.SortType.ASCENDING)
+        for name in added:
+            dataset = self.table.datasets[name]
+            values = self.values[name] = self.row_values(dataset)
+            self.rows[name] = self.store.append([name, dataset.kind or '-', *values])
+        if detach:
+            if column is not None:
+                self.sorted.set_sort_column_id(column, order)
+            self.view.set_model(self.sorted)
+        
+        self.update_rankings()
+    
+    @staticmethod
+    def row_values(dataset):
+        return tuple(UNKNOWN if value is None else float(value)
+                     for value in (getattr(dataset, metric) for metric in DATASET_COLUMNS))
+    
+    def update_rankings(self):
+        for metric, labels in self.rankings.items():
+            top = self.table.top(metric, DATASET_TOP)
+            for index, (name_label, value_label) in enumerate(labels):
+                if index < len(top):
+                    dataset = top[index]
+                    name = dataset.name
+                    value = getattr(dataset, metric)
+                    value = f"+{format_number(value * 3600)}/h" if metric == 'growth' else format_metric(metric, value)
+                else:
+                    name = value = ""
+                if name_label.get_text() != name:
+                    name_label.set_text(name)
+                if value_label.get_text() != value:
+                    value_label.set_text(value)
+
+# Diagnostics Tab: the monitor's own counters and latencies, refreshed while
+# it is on screen. Hidden until Ctrl+Shift+D.
+class DiagnosticsTab(Gtk.ScrolledWindow):
+    def __init__(self):
+        super().__init__()
+        self.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        self.view = Gtk.TextView()
+        self.view.set_editable(False)
+        self.view.set_monospace(True)
+        self.add(self.view)
+        self.timeout_id = None
+        self.connect("map", self.on_map)
+        self.connect("unmap", self.on_unmap)
+    
+    def on_map(self, widget):
+        self.refresh()
+        self.timeout_id = GLib.timeout_add_seconds(2, self.refresh)
+    
+    def on_unmap(self, widget):
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+    
+    def refresh(self):
+        self.view.get_buffer().set_text(stats.report())
+        return True
+
+# Main Window with Tabs
+class ZpoolMonitorWindow(Gtk.Window):
+    def __init__(self, collector, engine, notifier, scheduler, scans, report_listeners=()):
+        super().__init__(title="Monitor ZFS")
+        self.set_default_size(800, 600)
+        self.set_position(Gtk.WindowPosition.CENTER)
+        self.connect("delete-event", self.on_close)
+        
+        notebook = Gtk.Notebook()
+        
+        notebook.set_tab_pos(Gtk.PositionType.TOP)
+        
+        # Tabs with icons; the Status tab exports through the Performance
+        # tab's history store. The Performance and Datasets tabs read the
+        # local machine, so they are left out for remote hosts.
+        tabs = []
+        performance_tab = None
+        if not collector.remote:
+            performance_tab = PerformanceTab(collector, scheduler, report_listeners)
+        status_tab = StatusTab(collector, notifier, scans, performance_tab and performance_tab.store)
+        status_label = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        status_label.pack_start(Gtk.Image.new_from_icon_name("drive-harddisk", Gtk.IconSize.MENU), False, False, 0)
+        status_label.pack_start(Gtk.Label(label="Status"), False, False, 0)
+        notebook.append_page(status_tab, status_label)
+        tabs.append(('status', status_tab))
+        
+        if performance_tab:
+            performance_label = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+            performance_label.pack_start(Gtk.Image.new_from_icon_name("utilities-system-monitor", Gtk.IconSize.MENU), False, False, 0)
+            performance_label.pack_start(Gtk.Label(label="Desempenho"), False, False, 0)
+            notebook.append_page(performance_tab, performance_label)
+            tabs.append(('performance', performance_tab))
+            
+            datasets_tab = DatasetsTab(scheduler)
+            datasets_label = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+            datasets_label.pack_start(Gtk.Image.new_from_icon_name("folder", Gtk.IconSize.MENU), False, False, 0)
+            datasets_label.pack_start(Gtk.Label(label="Datasets"), False, False, 0)
+            notebook.append_page(datasets_tab, datasets_label)
+            tabs.append(('datasets', datasets_tab))
+        
+        alerts_tab = AlertsTab(collector, engine)
+        alerts_label = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        alerts_label.pack_start(Gtk.Image.new_from_icon_name("dialog-warning", Gtk.IconSize.MENU), False, False, 0)
+        alerts_label.pack_start(Gtk.Label(label="Alertas"), False, False, 0)
+        notebook.append_page(alerts_tab, alerts_label)
+        tabs.append(('alerts', alerts_tab))
+        
+        self.diagnostics_tab = DiagnosticsTab()
+        self.diagnostics_tab.set_no_show_all(True)
+        self.diagnostics_tab.view.show()
+        notebook.append_page(self.diagnostics_tab, Gtk.Label(label="Diagnóstico"))
+        self.notebook = notebook
+        self.connect("key-press-event", self.on_key_press)
+        
+        self.add(notebook)
+        
+        # Notebook pages that are not current, and every page while the window
+        # is hidden, are unmapped; the scheduler slows down what they poll
+        for view, tab in tabs:
+            tab.connect("map", lambda widget, view=view: scheduler.set_visible(view, True))
+            tab.connect("unmap", lambda widget, view=view: scheduler.set_visible(view, False))
+        
+        # Apply CSS
+        css_provider = Gtk.CssProvider()
+        css = b"""
+        window {
+            background-color: #f5f6f5;
+            font-family: 'Segoe UI', sans-serif;
+        }
+        box, grid, frame {
+            background-color: #ffffff;
+            border-radius: 8px;
+            padding: 12px;
+            margin: 8px;
+        }
+        button {
+            background-color: #3498db;
+            color: white;
+            border-radius: 6px;
+            padding: 8px 16px;
+            font-weight: bold;
+            transition: background-color 0.2s;
+        }
+        button:hover {
+            background-color: #2980b9;
+        }
+        button:active {
+            background-color: #2c3e50;
+        }
+        .alert-box {
+            background-color: #fff5f5;
+            border: 1px solid #ffcccc;
+            border-radius: 8px;
+            padding: 12px;
+            margin: 8px;
+        }
+        separator {
+            background-color: #e0e0e0;
+            margin: 12px 0;
+        }
+        textview {
+            background-color: #f8f9fa;
+            font-family: 'Monospace';
+            padding: 10px;
+            border-radius: 4px;
+        }
+        notebook tab {
+            background-color: #ecf0f1;
+            border-radius: 6px 6px 0 0;
+            padding: 8px 12px;
+            font-weight: 500;
+        }
+        notebook tab:checked {
+            background-color: #ffffff;
+            border-bottom: 2px solid #3498db;
+        }
+        label {
+            font-size: 11pt;
+            color: #2c3e50;
+        }
+        """
+        css_provider.load_from_data(css)
+        Gtk.StyleContext.add_provider_for_screen(
+            Gdk.Screen.get_default(),
+            css_provider,
+            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+        )
+    
+    def on_close(self, window, event):
+        window.hide()
+        return True  # Prevent closing, just hide
+    
+    # Ctrl+Shift+D shows or hides the diagnostics tab
+    def on_key_press(self, window, event):
+        state = event.state & Gtk.accelerator_get_default_mod_mask()
+        if event.keyval in (Gdk.KEY_d, Gdk.KEY_D) and state == Gdk.ModifierType.CONTROL_MASK | Gdk.ModifierType.SHIFT_MASK:
+            if self.diagnostics_tab.get_visible():
+                self.diagnostics_tab.hide()
+            else:
+                self.diagnostics_tab.show()
+                self.notebook.set_current_page(self.notebook.page_num(self.diagnostics_tab))
+            return True
+        return False
+
+# System Tray Icon and Control
+class TrayApp:
+    # With `agents` (addresses of --agent processes) the pools of those hosts
+    # are monitored instead of the local ones
+    def __init__(self, metrics=None, profiler=None, agents=()):
+        self.indicator = AppIndicator3.Indicator.new(
+            "zfs-monitor", "drive-harddisk",
+            AppIndicator3.IndicatorCategory.APPLICATION_STATUS
+        )
+        self.indicator.set_status(AppIndicator3.IndicatorStatus.ACTIVE)
+        self.indicator.set_title("ZFS Monitor")
+        
+        self.menu = Gtk.Menu()
+        
+        # Item: Open Window
+        item_open = Gtk.MenuItem(label="Abrir Monitor")
+        item_open.connect("activate", self.show_window)
+        self.menu.append(item_open)
+        
+        # Item: Quick Status
+        item_status = Gtk.MenuItem(label="Verificar Status")
+        item_status.connect("activate", self.quick_status)
+        self.menu.append(item_status)
+        
+        # Separator
+        self.menu.append(Gtk.SeparatorMenuItem())
+        
+        # Item: Quit
+        item_quit = Gtk.MenuItem(label="Sair")
+        item_quit.connect("activate", self.quit)
+        self.menu.append(item_quit)
+        
+        self.menu.show_all()
+        self.indicator.set_menu(self.menu)
+        
+        # Notifications go to the desktop's notification server, or to
+        # non-modal dialogs when there is none
+        self.dialogs = {}   # notification key -> fallback dialog shown for it
+        self.notifier = Notifier(fallback=self.show_alert_notification, dismiss=self.dismiss_alert_notification)
+        
+        # Every status consumer shares this collector's snapshots; the alert
+        # engine sees each one first, so the tab and the tray read its result
+        self.collector = RemoteCollector(agents) if agents else StatusCollector(POOLS)
+        self.alerts = AlertEngine()
+        self.alerts.subscribe(self.on_alerts)
+        self.collector.subscribe(self.alerts.on_snapshot)
+        self.collector.subscribe(self.update_tray_status)
+        # Local iostat reports; remote hosts send status only
+        report_listeners = [] if agents else [self.alerts.on_report]
+        
+        # Optional OpenMetrics endpoint fed from the same snapshots and reports
+        self.exporter = None
+        if metrics:
+            try:
+                self.exporter = MetricsExporter(metrics)
+                self.collector.subscribe(self.exporter.update_status)
+                if not agents:
+                    report_listeners.append(self.exporter.update_report)
+            except (OSError, ValueError) as e:
+                print(f"Cannot serve metrics on {metrics}: {e}", file=sys.stderr)
+        
+        self.scans = ScanMonitor()
+        self.collector.subscribe(self.scans.on_snapshot)
+        self.scheduler = Scheduler()
+        self.window = ZpoolMonitorWindow(self.collector, self.alerts, self.notifier, self.scheduler,
+                                         self.scans, report_listeners)
+        
+        # Background status monitoring, faster while a tab shows it or
+        # something needs attention
+        self.scheduler.add('status', self.poll_status, STATUS_REFRESH, busy_interval=STATUS_BUSY,
+                           hidden_interval=STATUS_IDLE, views=('status', 'alerts'))
+        
+        # --profile: quit after its refresh cycles
+        self.profiler = profiler
+        if profiler:
+            self.collector.subscribe(self.on_profile_cycle)
+            profiler.start()
+    
+    def show_window(self, _):
+        if not self.window.get_visible():
+            self.window.show_all()
+        self.window.present()
+    
+    def quick_status(self, _):
+        self.collector.request(callback=self.show_quick_status)
+    
+    def show_quick_status(self, snapshot):
+        critical, with_errors = pool_problems(snapshot)
+        
+        if critical:
+            dialog = Gtk.MessageDialog(
+                transient_for=None,
+                flags=0,
+                message_type=Gtk.MessageType.ERROR,
+                buttons=Gtk.ButtonsType.OK,
+                text="Problema Grave Detectado!"
+            )
+            dialog.format_secondary_text(
+                f"Pools em estado crítico: {', '.join(critical)}. Abra o monitor para detalhes."
+            )
+        elif with_errors:
+            dialog = Gtk.MessageDialog(
+                transient_for=None,
+                flags=0,
+                message_type=Gtk.MessageType.WARNING,
+                buttons=Gtk.ButtonsType.OK,
+                text="Problemas Detectados"
+            )
+            dialog.format_secondary_text(
+                f"Foram encontrados erros nos pools: {', '.join(with_errors)}. Verifique o monitor."
+            )
+        elif not snapshot.pools:
+            dialog = Gtk.MessageDialog(
+                transient_for=None,
+                flags=0,
+                message_type=Gtk.MessageType.WARNING,
+                buttons=Gtk.ButtonsType.OK,
+                text="Status Indisponível"
+            )
+            dialog.format_secondary_text(snapshot.output or "Nenhum pool encontrado.")
+        else:
+            dialog = Gtk.MessageDialog(
+                transient_for=None,
+                flags=0,
+                message_type=Gtk.MessageType.INFO,
+                buttons=Gtk.ButtonsType.OK,
+                text="Pools Saudáveis"
+            )
+            dialog.format_secondary_text(
+                f"{pools_label(snapshot.pools)}: todos os pools estão funcionando normalmente."
+            )
+        
+        dialog.connect("response", lambda dialog, response: dialog.destroy())
+        dialog.show()
+    
+    def poll_status(self, done):
+        self.collector.request(callback=lambda snapshot: done(bool(snapshot.pools)))
+    
+    def on_profile_cycle(self, snapshot):
+        if self.profiler.cycle():
+            self.quit(None)
+    
+    # The icon reflects the worst pool
+    @timed("render:tray")
+    def update_tray_status(self, snapshot):
+        critical, with_errors = pool_problems(snapshot)
+        label = pools_label(snapshot.pools)
+        self.scheduler.set_busy(self.alerts.urgent() or any(map(scan_in_progress, snapshot.pools.values())))
+        
+        if critical:
+            self.indicator.set_icon_full("dialog-error", "Pool ZFS em estado crítico")
+            self.indicator.set_title(f"ZFS: {label} [CRÍTICO]")
+        elif with_errors or not snapshot.pools:
+            self.indicator.set_icon_full("dialog-warning", "Problemas nos pools ZFS")
+            self.indicator.set_title(f"ZFS: {label} [ALERTA]")
+        else:
+            self.indicator.set_icon_full("drive-harddisk", "Pools ZFS saudáveis")
+            self.indicator.set_title(f"ZFS: {label} [OK]")
+    
+    # Alerts notify when they open (not again within the rule's cool-down)
+    # and replace their notification when they resolve; the notifier
+    # coalesces bursts and rate-limits them
+    def on_alerts(self, events):
+        for kind, alert in events:
+            key = f"alert:{alert.rule.name}:{alert.pool}:{alert.vdev}"
+            if kind == "open" and alert.notify and alert.severity != "RECOMENDAÇÃO":
+                urgency = URGENCY_CRITICAL if alert.severity == "CRÍTICO" else URGENCY_NORMAL
+                self.notifier.notify(key, alert.title, alert.description, urgency)
+            elif kind == "resolve" and key in self.notifier.pending:
+                # Resolved before it reached the desktop: it never shows
+                self.notifier.withdraw(key)
+            elif kind == "resolve" and (self.notifier.shown(key) or key in self.dialogs):
+                self.notifier.notify(key, f"Resolvido: {alert.title}", "A condição não é mais detectada.", URGENCY_LOW)
+    
+    MESSAGE_TYPES = {
+        URGENCY_LOW: Gtk.MessageType.INFO,
+        URGENCY_NORMAL: Gtk.MessageType.WARNING,
+        URGENCY_CRITICAL: Gtk.MessageType.ERROR,
+    }
+    
+    # Fallback without a notification server: one non-modal dialog per key,
+    # updated in place, so the main loop keeps running and dialogs never stack
+    def show_alert_notification(self, key, title, message, urgency):
+        dialog = self.dialogs.get(key)
+        if dialog is None:
+            dialog = self.dialogs[key] = Gtk.MessageDialog(
+                transient_for=None,
+                flags=0,
+                message_type=self.MESSAGE_TYPES[urgency],
+                buttons=Gtk.ButtonsType.OK,
+                text=title
+            )
+            dialog.connect("response", lambda dialog, response: self.dialogs.pop(key, None) and dialog.destroy())
+        else:
+            dialog.set_property("text", title)
+            dialog.set_property("message-type", self.MESSAGE_TYPES[urgency])
+        dialog.format_secondary_text(message)
+        dialog.show()
+    
+    def dismiss_alert_notification(self, key):
+        dialog = self.dialogs.pop(key, None)
+        if dialog is not None:
+            dialog.destroy()
+    
+    def quit(self, _):
+        self.scheduler.stop()
+        self.window.destroy()
+        self.notifier.close()
+        if self.collector.remote:
+            self.collector.close()
+        if self.exporter:
+            self.exporter.close()
+        Gtk.main_quit()
+
+# Start the tray application, serving OpenMetrics on `metrics` (host:port)
+# when given, profiling with `profiler` (an instrument.Profiler) when given
+# and showing the pools of `agents` rather than the local ones when given;
+# returns the exit status
+def main(metrics=METRICS_ADDRESS, profiler=None, agents=AGENTS):
+    # Check that the monitored pools exist; remote pools show up as their
+    # agents connect
+    if not agents and not check_pools():
+        return 1
+    
+    # Start application
+    TrayApp(metrics, profiler, agents)
+    Gtk.main()
+    return 0
+
+# Whether the configured (or any) local pools are imported, telling the
+# user in a dialog when not
+def check_pools():
+    names, missing = discover_pools()
+    if names and not missing:
+        return True
+    dialog = Gtk.MessageDialog(
+        transient_for=None,
+        flags=0,
+        message_type=Gtk.MessageType.ERROR,
+        buttons=Gtk.ButtonsType.OK,
+        text="Pool ZFS não encontrado"
+    )
+    if missing:
+        dialog.format_secondary_text(
+            f"Pools não encontrados no sistema: {', '.join(missing)}. "
+            "Verifique ZPOOL_MONITOR_POOLS e tente novamente."
+        )
+    else:
+        dialog.format_secondary_text("Nenhum pool ZFS importado foi encontrado no sistema.")
+    dialog.run()
+    dialog.destroy()
+    return False
@@ -0,0 +1,172 @@
+# In-memory metric history: fixed-size rings per tier
+import math
+from itertools import chain
+from array import array
+
+from .config import HISTORY_TIERS, HISTORY_METRICS, ARC_METRICS
+
+# Every ((path, metric), value) pair of an iostat report that was reported
+def report_series(report):
+    for pool in report.values():
+        for record in (pool, *pool.vdevs.values()):
+            for metric in HISTORY_METRICS:
+                value = getattr(record, metric)
+                if value is not None:
+                    yield (record.path, metric), value
+
+# Every (("arc", metric), value) pair of an ArcRecord that was measured
+def arc_series(arc):
+    for metric in ARC_METRICS:
+        value = getattr(arc, metric)
+        if value is not None:
+            yield ('arc', metric), value
+
+# Raw 1 s column: one value per slot, NaN where nothing was sampled
+class RawColumn:
+    __slots__ = ('values',)
+
+    def __init__(self, size):
+        self.values = array('d', [math.nan]) * size
+
+    def reset(self, slot):
+        self.values[slot] = math.nan
+
+    def add(self, slot, value):
+        self.values[slot] = value
+
+    def set(self, slot, low, avg, high):
+        self.values[slot] = avg
+
+    # (min, avg, max) of the slot, None when empty
+    def get(self, slot):
+        value = self.values[slot]
+        return None if value != value else (value, value, value)
+
+# Downsampled column: min/avg/max of every sample that fell into the slot.
+# Stored as float32 since these tiers only feed summaries and charts.
+class AggregateColumn:
+    __slots__ = ('mins', 'avgs', 'maxs', 'counts')
+
+    def __init__(self, size):
+        self.mins = array('f', [0.0]) * size
+        self.avgs = array('f', [0.0]) * size
+        self.maxs = array('f', [0.0]) * size
+        self.counts = array('H', [0]) * size
+
+    def reset(self, slot):
+        self.counts[slot] = 0
+
+    def add(self, slot, value):
+        count = self.counts[slot]
+        if count == 0:
+            self.mins[slot] = self.avgs[slot] = self.maxs[slot] = value
+        else:
+            if value < self.mins[slot]:
+                self.mins[slot] = value
+            if value > self.maxs[slot]:
+                self.maxs[slot] = value
+            self.avgs[slot] += (value - self.avgs[slot]) / (count + 1)
+        self.counts[slot] = min(count + 1, 0xFFFF)
+
+    def set(self, slot, low, avg, high):
+        self.mins[slot] = low
+        self.avgs[slot] = avg
+        self.maxs[slot] = high
+        self.counts[slot] = 1
+
+    def get(self, slot):
+        if self.counts[slot] == 0:
+            return None
+        return (self.mins[slot], self.avgs[slot], self.maxs[slot])
+
+# One resolution of the history: a ring of `size` slots of `step` seconds
+# shared by every series, so advancing time is a single stamp check per slot
+class HistoryTier:
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.stamps = array('q', [-1]) * size  # bucket number held by each slot
+        self.latest = -1
+        self.columns = {}
+        self.column_class = RawColumn if step == 1 else AggregateColumn
+
+    def advance(self, timestamp):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.size
+        if self.stamps[slot] != bucket:
+            self.stamps[slot] = bucket
+            for column in self.columns.values():
+                column.reset(slot)
+        if bucket > self.latest:
+            self.latest = bucket
+        return slot
+
+    def add(self, key, slot, value):
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = self.column_class(self.size)
+        column.add(slot, value)
+
+    # Put back a stored point, unless its slot already holds newer data
+    def restore(self, key, timestamp, low, avg, high):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.size
+        if bucket <= self.latest - self.size or self.stamps[slot] > bucket:
+            return
+        slot = self.advance(timestamp)
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = self.column_class(self.size)
+        column.set(slot, low, avg, high)
+
+    # (timestamp, min, avg, max) of every filled slot, oldest first
+    def points(self, key):
+        column = self.columns.get(key)
+        if column is None:
+            return []
+        points = []
+        for bucket in range(self.latest - self.size + 1, self.latest + 1):
+            slot = bucket % self.size
+            if self.stamps[slot] != bucket:
+                continue
+            value = column.get(slot)
+            if value is not None:
+                points.append((bucket * self.step, *value))
+        return points
+
+    # (min, avg, max) over the whole tier, None without samples
+    def summary(self, key):
+        points = self.points(key)
+        if not points:
+            return None
+        return (
+            min(point[1] for point in points),
+            sum(point[2] for point in points) / len(points),
+            max(point[3] for point in points)
+        )
+
+# Bounded in-memory history of every pool and vdev metric. Each series is a
+# set of preallocated arrays per tier, so memory stays fixed however long the
+# monitor runs; coarser tiers are filled as samples arrive.
+class MetricHistory:
+    def __init__(self, tiers=HISTORY_TIERS):
+        self.tiers = [HistoryTier(step, size) for step, size in tiers]
+
+    # `extra` adds more (key, value) pairs to the sample, e.g. arc_series()
+    def record(self, timestamp, report, extra=()):
+        slots = [tier.advance(timestamp) for tier in self.tiers]
+        for key, value in chain(report_series(report), extra):
+            for tier, slot in zip(self.tiers, slots):
+                tier.add(key, slot, value)
+
+    # Refill the tier of resolution `step` from stored {key: [(ts, min, avg, max)]}
+    def restore(self, step, series):
+        for tier in self.tiers:
+            if tier.step == step:
+                for key, points in series.items():
+                    for timestamp, low, avg, high in points:
+                        tier.restore(key, timestamp, low, avg, high)
+
+    # Every (path, metric) series recorded so far
+    def keys(self):
+        return list(self.tiers[0].columns)
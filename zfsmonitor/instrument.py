@@ -0,0 +1,175 @@
+# Self-instrumentation: counters and latency histograms for commands,
+# parsers and redraws, plus forks per minute, live threads and RSS. Only
+# the main loop records into `stats`; report() is what the diagnostics tab
+# shows and what --stats prints. Profiler backs --profile.
+import os
+import sys
+import time
+import bisect
+import cProfile
+import pstats
+import resource
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# One line per event on stderr, which journald collects under systemd
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+# Upper bounds in seconds of the latency buckets; one more bucket above them
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    # Upper bound of the bucket holding quantile `q`, capped at the max
+    def quantile(self, q):
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return 0.0
+
+# Resident set size in bytes: current from /proc, else the peak
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class Stats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = {}
+        self.histograms = {}
+        self.forks = deque()   # when each fork of the last minute happened
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    # A child process was started for `name` ("zpool status", ...)
+    def fork(self, name):
+        self.count("forks")
+        self.count(f"forks:{name}")
+        now = time.monotonic()
+        self.forks.append(now)
+        while self.forks[0] < now - 60:
+            self.forks.popleft()
+
+    def forks_per_minute(self):
+        now = time.monotonic()
+        while self.forks and self.forks[0] < now - 60:
+            self.forks.popleft()
+        return len(self.forks)
+
+    def report(self):
+        lines = [
+            f"uptime {time.monotonic() - self.started:.0f} s, rss {rss_bytes() / 1048576:.1f} MiB, "
+            f"threads {threading.active_count()}, forks/min {self.forks_per_minute()}",
+            "",
+            f"{'counter':<36} {'value':>10}",
+        ]
+        for name in sorted(self.counters):
+            lines.append(f"{name:<36} {self.counters[name]:>10}")
+        lines += ["", f"{'latency (ms)':<36} {'count':>7} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            values = (histogram.total / histogram.count, histogram.quantile(0.5), histogram.quantile(0.9),
+                      histogram.quantile(0.99), histogram.max)
+            lines.append(f"{name:<36} {histogram.count:>7} " + ' '.join(f"{value * 1e3:>9.3f}" for value in values))
+        return '\n'.join(lines) + '\n'
+
+stats = Stats()
+
+# Record every call of the decorated function in the `name` histogram
+def timed(name):
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+# Profile the main loop for `cycles` status refreshes with cProfile (a
+# .prof file for pstats/snakeviz, plus the top functions on stderr) or
+# tracemalloc (the allocations that grew since start, by line)
+class Profiler:
+    def __init__(self, cycles, mode="cprofile", output=None):
+        self.cycles = cycles
+        self.mode = mode
+        self.output = output or ("zfs-monitor.prof" if mode == "cprofile" else "zfs-monitor-tracemalloc.txt")
+        self.seen = 0
+        self.profile = None
+        self.baseline = None
+        self.finished = False
+
+    def start(self):
+        if self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            tracemalloc.start(25)
+            self.baseline = tracemalloc.take_snapshot()
+
+    # Count one refresh cycle; after the last one write the output and
+    # return True, so the caller can quit
+    def cycle(self, *args):
+        self.seen += 1
+        if self.finished or self.seen < self.cycles:
+            return False
+        self.finish()
+        return True
+
+    def finish(self):
+        self.finished = True
+        if self.mode == "cprofile":
+            self.profile.disable()
+            self.profile.dump_stats(self.output)
+            pstats.Stats(self.profile, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            differences = snapshot.compare_to(self.baseline, "lineno")
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(self.output, "w") as f:
+                f.write(f"traced {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB after {self.seen} cycles\n\n")
+                for difference in differences[:50]:
+                    f.write(f"{difference}\n")
+        print(f"Profile of {self.seen} cycles written to {self.output}", file=sys.stderr)
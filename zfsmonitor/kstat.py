@@ -0,0 +1,380 @@
+# Zero-fork sampling from the OpenZFS kstats under /proc/spl/kstat/zfs.
+# Files stay open and are re-read with pread; rates come from counter deltas
+# between samples. `root` can point at any directory with the same layout.
+import os
+import time
+
+from .config import KSTAT_ROOT, KSTAT_RESCAN
+from .parsing import PoolRecord
+
+KSTAT_DATA_STRING = b'7'
+
+# A kstat file kept open and re-read from offset 0 on every sample
+class KstatFile:
+    __slots__ = ('path', 'fd', 'size')
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        self.size = 4096
+
+    # Whole contents; grows the read size until a read comes back short
+    def read(self):
+        while True:
+            data = os.pread(self.fd, self.size, 0)
+            if len(data) < self.size:
+                return data
+            self.size *= 2
+
+    def close(self):
+        os.close(self.fd)
+
+# Named kstat ("name type data" table after the header) -> {name: value};
+# strings (type 7) are decoded, every other type is an integer
+def parse_named(data):
+    values = {}
+    for line in data.split(b'\n')[2:]:
+        fields = line.split(None, 2)
+        if len(fields) < 3:
+            continue
+        name, kind, value = fields
+        values[name.decode()] = value.strip().decode() if kind == KSTAT_DATA_STRING else int(value)
+    return values
+
+# Reads a few integer fields of a named kstat that is re-read over and over.
+# The first read finds the line each field is on; later reads split the data
+# into lines and go straight to those, parsing nothing else. When a line no
+# longer holds its field (a module upgrade), the index is rebuilt.
+class NamedIndex:
+    __slots__ = ('fields', 'lines')
+
+    def __init__(self, fields):
+        self.fields = {field.encode(): field for field in fields}
+        self.lines = None   # [(line number, field as bytes, field)]
+
+    def parse(self, data):
+        lines = data.split(b'\n')
+        if self.lines is not None:
+            values = {}
+            for number, raw, field in self.lines:
+                parts = lines[number].split() if number < len(lines) else ()
+                if len(parts) < 3 or parts[0] != raw:
+                    break
+                values[field] = int(parts[2])
+            else:
+                return values
+
+        self.lines = []
+        values = {}
+        for number, line in enumerate(lines[2:], start=2):
+            parts = line.split()
+            if len(parts) >= 3 and parts[0] in self.fields:
+                field = self.fields[parts[0]]
+                self.lines.append((number, parts[0], field))
+                values[field] = int(parts[2])
+        return values
+
+# I/O kstat (one line of column names, one of values) -> {name: value}
+def parse_io(data):
+    lines = data.split(b'\n')
+    if len(lines) < 3:
+        return {}
+    return {name.decode(): int(value) for name, value in zip(lines[1].split(), lines[2].split())}
+
+# Per-second rate of a counter, None on the first sample or after a reset
+def counter_rate(current, previous, elapsed):
+    if previous is None or current < previous or elapsed <= 0:
+        return None
+    return (current - previous) / elapsed
+
+# Logical I/O of one dataset, from its objset-* kstat
+class DatasetRecord:
+    __slots__ = ('objset', 'name', 'reads', 'writes', 'nread', 'nwritten',
+                 'read_ops', 'write_ops', 'read_bw', 'write_bw')
+
+    def __init__(self, objset, name):
+        self.objset = objset
+        self.name = name
+        self.reads = self.writes = self.nread = self.nwritten = None
+        self.read_ops = self.write_ops = self.read_bw = self.write_bw = None
+
+# Open kstat files of one pool: state, the legacy io kstat when the module
+# still has it, and one objset-* file per mounted dataset. The pool's
+# iostats kstat is left closed on purpose: it only counts TRIM and (from
+# OpenZFS 2.3) ARC and direct I/O, none of it a pool read/write total, so
+# pools without io sum their datasets' objsets instead.
+class PoolKstats:
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        self.files = {}
+        self.previous = {}   # file name -> counters of the last sample
+        self.bodies = {}     # objset file name -> its table as last read
+        self.datasets = {}   # objset file name -> DatasetRecord
+        self.has_io = False
+        self.scanned = None
+        self.stamp = None
+
+    def open(self, filename):
+        kstat = self.files.get(filename)
+        if kstat is None:
+            try:
+                kstat = self.files[filename] = KstatFile(os.path.join(self.directory, filename))
+            except OSError:
+                return None
+        return kstat
+
+    def read(self, filename):
+        kstat = self.open(filename)
+        if kstat is None:
+            return None
+        try:
+            return kstat.read()
+        except OSError:
+            self.drop(filename)
+            return None
+
+    def drop(self, filename):
+        kstat = self.files.pop(filename, None)
+        if kstat is not None:
+            kstat.close()
+        self.previous.pop(filename, None)
+        self.bodies.pop(filename, None)
+        self.datasets.pop(filename, None)
+
+    # Pick up objsets of datasets mounted since the last scan, forget the others
+    def rescan(self):
+        try:
+            entries = {entry.name for entry in os.scandir(self.directory)}
+        except OSError:
+            entries = set()
+        self.has_io = 'io' in entries
+        names = {name for name in entries if name.startswith('objset-')}
+        for filename in [filename for filename in self.datasets if filename not in names]:
+            self.drop(filename)
+        for filename in names:
+            if filename not in self.datasets:
+                self.datasets[filename] = DatasetRecord(filename[len('objset-'):], None)
+
+    # Counters of `filename` and their rates since the previous sample
+    def rates(self, filename, counters, elapsed):
+        previous = self.previous.get(filename, {})
+        self.previous[filename] = counters
+        return {name: counter_rate(value, previous.get(name), elapsed)
+                for name, value in counters.items() if isinstance(value, int)}
+
+    # Seconds since the previous sample, rescanning the objsets when due
+    def advance(self, now):
+        if self.scanned is None or now - self.scanned >= KSTAT_RESCAN:
+            self.rescan()
+            self.scanned = now
+        elapsed = now - self.stamp if self.stamp is not None else 0
+        self.stamp = now
+        return elapsed
+
+    # Logical I/O per dataset. An objset whose table is byte for byte what
+    # it was (only the header's snaptime moves) is idle and is not parsed
+    # again. Returns the summed rates, None unless every dataset had them.
+    def read_datasets(self, elapsed):
+        totals = dict.fromkeys(('read_ops', 'write_ops', 'read_bw', 'write_bw'), 0.0)
+        complete = True
+        for filename, dataset in list(self.datasets.items()):
+            data = self.read(filename)
+            if data is None:
+                continue
+            body = data[data.find(b'\n', data.find(b'\n') + 1):]
+            if body == self.bodies.get(filename) and filename in self.previous:
+                dataset.read_ops = dataset.write_ops = dataset.read_bw = dataset.write_bw = 0.0
+                continue
+            self.bodies[filename] = body
+            counters = parse_named(data)
+            dataset.name = counters.get('dataset_name', dataset.name)
+            dataset.reads, dataset.writes = counters.get('reads'), counters.get('writes')
+            dataset.nread, dataset.nwritten = counters.get('nread'), counters.get('nwritten')
+            rates = self.rates(filename, counters, elapsed)
+            dataset.read_ops, dataset.write_ops = rates.get('reads'), rates.get('writes')
+            dataset.read_bw, dataset.write_bw = rates.get('nread'), rates.get('nwritten')
+            for metric in totals:
+                value = getattr(dataset, metric)
+                if value is None:
+                    complete = False
+                else:
+                    totals[metric] += value
+        return totals if complete else None
+
+    def sample(self, now):
+        elapsed = self.advance(now)
+
+        pool = PoolRecord(self.name)
+        state = self.read('state')
+        if state is None:
+            return None
+        pool.state = state.strip().decode() or None
+
+        # Physical I/O from the io kstat (removed in OpenZFS 2.x)
+        io = self.read('io') if self.has_io else None
+        if io is not None:
+            counters = parse_io(io)
+            rates = self.rates('io', counters, elapsed)
+            pool.read_ops, pool.write_ops = rates.get('reads'), rates.get('writes')
+            pool.read_bw, pool.write_bw = rates.get('nread'), rates.get('nwritten')
+
+        # The pool gets the datasets' sum when io is missing
+        totals = self.read_datasets(elapsed)
+        if io is None and totals is not None and elapsed > 0:
+            for metric, value in totals.items():
+                setattr(pool, metric, value)
+        return pool
+
+    def close(self):
+        for filename in list(self.files):
+            self.drop(filename)
+
+# Counters read from arcstats, zil and dbufstats
+ARC_FIELDS = {
+    'arcstats': ('hits', 'misses', 'demand_data_hits', 'demand_data_misses', 'demand_metadata_hits',
+                 'demand_metadata_misses', 'prefetch_data_hits', 'prefetch_data_misses', 'size', 'c',
+                 'c_max', 'mru_size', 'mfu_size', 'evict_l2_cached', 'evict_l2_eligible',
+                 'evict_l2_ineligible', 'l2_hits', 'l2_misses', 'l2_size', 'l2_read_bytes', 'l2_write_bytes'),
+    'zil': ('zil_commit_count', 'zil_itx_metaslab_normal_bytes', 'zil_itx_metaslab_slog_bytes'),
+    'dbufstats': ('cache_size_bytes', 'hash_hits', 'hash_misses'),
+}
+
+# ARC, L2ARC, ZIL and dbuf cache over one interval. Sizes are bytes, ratios
+# 0..1 of the interval's accesses (None without any), rates per second.
+class ArcRecord:
+    __slots__ = ('arc_size', 'arc_target', 'arc_max', 'arc_mru_size', 'arc_mfu_size',
+                 'arc_hit_ratio', 'arc_demand_hit_ratio', 'arc_prefetch_hit_ratio', 'arc_evict_bw',
+                 'l2_size', 'l2_hit_ratio', 'l2_read_bw', 'l2_write_bw',
+                 'zil_commit_rate', 'zil_slog_bw', 'zil_normal_bw', 'dbuf_size', 'dbuf_hit_ratio')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+
+# Hits over hits + misses between two samples of the counters
+def interval_ratio(current, previous, hits, misses):
+    deltas = []
+    for name in (*hits, *misses):
+        if current.get(name) is None or previous.get(name) is None:
+            return None
+        deltas.append(current[name] - previous[name])
+    total = sum(deltas)
+    if total <= 0:
+        return None
+    return sum(deltas[:len(hits)]) / total
+
+# Zero-fork ARC sampler over the global kstats under `root`; sample()
+# returns an ArcRecord, None when arcstats cannot be read
+class ArcReader:
+    def __init__(self, root=KSTAT_ROOT):
+        self.root = root
+        self.files = {}
+        self.indexes = {name: NamedIndex(fields) for name, fields in ARC_FIELDS.items()}
+        self.previous = {}
+        self.stamp = None
+
+    def read(self, name):
+        kstat = self.files.get(name)
+        try:
+            if kstat is None:
+                kstat = self.files[name] = KstatFile(os.path.join(self.root, name))
+            return self.indexes[name].parse(kstat.read())
+        except (OSError, ValueError):
+            if name in self.files:
+                self.files.pop(name).close()
+            return {}
+
+    def sample(self, now=None):
+        now = time.monotonic() if now is None else now
+        counters = {}
+        for name in ARC_FIELDS:
+            counters.update(self.read(name))
+        if 'size' not in counters:
+            return None
+        previous, self.previous = self.previous, counters
+        elapsed = now - self.stamp if self.stamp is not None else 0
+        self.stamp = now
+
+        def rate(*names):
+            values = [counter_rate(counters.get(name), previous.get(name), elapsed)
+                      if counters.get(name) is not None else None for name in names]
+            return None if None in values else sum(values)
+
+        arc = ArcRecord()
+        arc.arc_size, arc.arc_target, arc.arc_max = counters['size'], counters.get('c'), counters.get('c_max')
+        arc.arc_mru_size, arc.arc_mfu_size = counters.get('mru_size'), counters.get('mfu_size')
+        arc.arc_hit_ratio = interval_ratio(counters, previous, ('hits',), ('misses',))
+        arc.arc_demand_hit_ratio = interval_ratio(
+            counters, previous, ('demand_data_hits', 'demand_metadata_hits'),
+            ('demand_data_misses', 'demand_metadata_misses')
+        )
+        arc.arc_prefetch_hit_ratio = interval_ratio(counters, previous, ('prefetch_data_hits',), ('prefetch_data_misses',))
+        arc.arc_evict_bw = rate('evict_l2_cached', 'evict_l2_eligible', 'evict_l2_ineligible')
+        arc.l2_size = counters.get('l2_size') or None
+        arc.l2_hit_ratio = interval_ratio(counters, previous, ('l2_hits',), ('l2_misses',))
+        arc.l2_read_bw, arc.l2_write_bw = rate('l2_read_bytes'), rate('l2_write_bytes')
+        arc.zil_commit_rate = rate('zil_commit_count')
+        arc.zil_slog_bw, arc.zil_normal_bw = rate('zil_itx_metaslab_slog_bytes'), rate('zil_itx_metaslab_normal_bytes')
+        arc.dbuf_size = counters.get('cache_size_bytes')
+        arc.dbuf_hit_ratio = interval_ratio(counters, previous, ('hash_hits',), ('hash_misses',))
+        return arc
+
+    def close(self):
+        for kstat in self.files.values():
+            kstat.close()
+        self.files = {}
+
+# Samples every pool under `root` (or only `pools` when given). sample()
+# returns an iostat-style report {pool name: PoolRecord} with state and
+# ops/bandwidth rates; capacity and per-vdev stats are not in the kstats.
+class KstatReader:
+    def __init__(self, pools=(), root=KSTAT_ROOT):
+        self.pools = list(pools)
+        self.root = root
+        self.readers = {}
+
+    def pool_names(self):
+        if self.pools:
+            return self.pools
+        try:
+            return sorted(entry.name for entry in os.scandir(self.root)
+                          if entry.is_dir() and os.path.exists(os.path.join(entry.path, 'state')))
+        except OSError:
+            return []
+
+    def sample(self, now=None):
+        now = time.monotonic() if now is None else now
+        report = {}
+        names = self.pool_names()
+        for name in [name for name in self.readers if name not in names]:
+            self.readers.pop(name).close()
+        for name in names:
+            reader = self.readers.get(name)
+            if reader is None:
+                reader = self.readers[name] = PoolKstats(os.path.join(self.root, name), name)
+            pool = reader.sample(now)
+            if pool is not None:
+                report[name] = pool
+        return report
+
+    # Only the objsets of every pool: {pool name: {objset file name:
+    # DatasetRecord}}, for a dataset view that does not need the rest
+    def sample_datasets(self, now=None):
+        now = time.monotonic() if now is None else now
+        names = self.pool_names()
+        for name in [name for name in self.readers if name not in names]:
+            self.readers.pop(name).close()
+        datasets = {}
+        for name in names:
+            reader = self.readers.get(name)
+            if reader is None:
+                reader = self.readers[name] = PoolKstats(os.path.join(self.root, name), name)
+            reader.read_datasets(reader.advance(now))
+            datasets[name] = reader.datasets
+        return datasets
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
@@ -0,0 +1,206 @@
+# Latency histograms from `zpool iostat -p -v -w`: one histogram per pool and
+# vdev per interval, summed over a sliding window of intervals. Each
+# histogram's bucket counts are packed into one integer, 64 bits per count,
+# so the window's running total per vdev takes the new interval and drops
+# the oldest with one integer addition and subtraction over every bucket at
+# once. Counts never come near 2**64, so the lanes never carry into each
+# other, and an interval is only ever subtracted from the total it was added
+# to, so they never borrow either. Quantiles are read from the unpacked
+# totals.
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import accumulate
+
+from .config import LATENCY_WINDOW
+from .parsing import header_columns
+from .instrument import timed
+
+# Columns whose quantiles are added to the iostat records, and the quantiles
+QUANTILE_COLUMNS = ('total_wait_read', 'total_wait_write', 'disk_wait_read', 'disk_wait_write')
+QUANTILES = (('p50', 0.5), ('p99', 0.99), ('p999', 0.999))
+
+# Counts of one pool or vdev, one row of `columns` ("total_wait_read",
+# "scrub_wait", ...) per bucket; `bounds` holds each bucket's upper bound in ns
+class LatencyHistogram:
+    __slots__ = ('columns', 'bounds', 'counts')
+
+    def __init__(self, columns, bounds, counts):
+        self.columns = columns
+        self.bounds = bounds
+        self.counts = counts
+
+    # The counts as one integer, and back
+    def pack(self):
+        return int.from_bytes(self.counts.tobytes(), sys.byteorder)
+
+    @classmethod
+    def unpack(cls, columns, bounds, packed):
+        counts = array('Q')
+        counts.frombytes(packed.to_bytes(len(columns) * len(bounds) * counts.itemsize, sys.byteorder))
+        return cls(columns, bounds, counts)
+
+    # Running totals of one column over the buckets
+    def cumulative(self, column):
+        return list(accumulate(self.counts[self.columns.index(column)::len(self.columns)]))
+
+    # Latency in ns below which a fraction `q` of the I/Os completed,
+    # interpolated inside its bucket; None without I/Os
+    def quantile(self, column, q, cumulative=None):
+        if cumulative is None:
+            cumulative = self.cumulative(column)
+        if not cumulative or not cumulative[-1]:
+            return None
+        rank = q * cumulative[-1]
+        bucket = bisect_left(cumulative, rank)
+        lower = self.bounds[bucket - 1] if bucket else 0
+        seen = cumulative[bucket - 1] if bucket else 0
+        return lower + (self.bounds[bucket] - lower) * (rank - seen) / (cumulative[bucket] - seen)
+
+    # {"total_wait_read_p99": ns, ...} for QUANTILE_COLUMNS
+    def quantiles(self):
+        values = {}
+        for column in QUANTILE_COLUMNS:
+            if column not in self.columns:
+                continue
+            cumulative = self.cumulative(column)
+            for suffix, q in QUANTILES:
+                value = self.quantile(column, q, cumulative)
+                if value is not None:
+                    values[f"{column}_{suffix}"] = value
+        return values
+
+# Incremental `zpool iostat -p -v -w` parser, used like iostat_report_parser.
+# Every pool and vdev prints its own block: a header naming it, the label
+# line, then one row per bucket labelled with its upper bound. Headers carry
+# the bare name with no indentation, so the tree comes from `layout()`, the
+# {pool name: PoolRecord} of the latest status snapshot, read as each report
+# starts: a block that names a pool starts it, and every other block is the
+# next vdev of that name in the pool's output order, which iostat shares
+# with status. Reports are {pool: {vdev path: LatencyHistogram}}, the pool
+# itself under its own name, and are complete when their first pool shows
+# up again.
+def histogram_report_parser(layout):
+    pools = {}
+    report = {}
+    completed = None
+    pool = None
+    records = ()     # the current pool's vdevs in output order
+    position = 0     # first of them not matched to a block yet
+    histogram = None
+    groups = labels = columns = ()
+
+    while True:
+        line = yield completed
+        completed = None
+        parts = line.split()
+        if not parts or line.startswith('-'):
+            continue
+
+        if histogram is not None and len(parts) > 1 and parts[0].isdigit() and parts[1] != 'total_wait':
+            fields = parts[1:len(columns) + 1]
+            # Most buckets of a real histogram are empty
+            if fields.count('0') == len(fields):
+                histogram.counts.extend(bytes(len(fields)))
+            else:
+                try:
+                    histogram.counts.extend(map(int, fields))
+                except ValueError:
+                    histogram.counts.extend(int(field) if field.isdigit() else 0 for field in fields)
+            histogram.bounds.append(int(parts[0]))
+        elif len(parts) > 1 and parts[1] == 'total_wait':
+            name = parts[0]
+            groups = parts[1:]
+            if not report:
+                pools = layout() or {}
+            if name in pools or name in report or pool is None:
+                if name in report:
+                    completed, report = report, {}
+                    pools = layout() or {}
+                pool = name
+                report[pool] = {}
+                records = list(pools[name].vdevs.values()) if name in pools else []
+                position = 0
+                path = name
+            else:
+                path = f"{pool}/{name}"   # not in the snapshot yet: kept, but matches nothing
+                for index in range(position, len(records)):
+                    if records[index].name == name:
+                        path = records[index].path
+                        position = index + 1
+                        break
+            histogram = report[pool][path] = LatencyHistogram(columns, [], array('Q'))
+        elif parts[0] == 'latency':
+            # Every block repeats the header; the columns are shared
+            if parts[1:] != labels:
+                labels = parts[1:]
+                columns = tuple(header_columns(groups, labels))
+            if histogram is not None:
+                histogram.columns = columns
+
+# Histograms of the last `size` intervals per pool or vdev path and the
+# quantiles of their sum. Only totals that an interval changed (one that
+# saw I/O was added, or dropped out of the window) have their quantiles
+# recomputed; an idle vdev costs one comparison per interval. A total that
+# starts over gets a new generation, and intervals of an older one are
+# never taken from it.
+class LatencyWindow:
+    def __init__(self, size=LATENCY_WINDOW):
+        self.size = size
+        self.intervals = deque()   # {path: (generation, packed counts)} per interval
+        self.totals = {}           # path -> [shape, packed sum, bounds, intervals holding it, generation]
+        self.quantiles = {}        # path -> {"total_wait_read_p99": ns, ...}
+        self.generation = 0
+
+    @timed("latency:window")
+    def add(self, report):
+        interval = {}
+        changed = set()
+        for histograms in report.values():
+            for path, histogram in histograms.items():
+                shape = (histogram.columns, len(histogram.bounds))
+                packed = histogram.pack()
+                total = self.totals.get(path)
+                # A new vdev, or zpool changed its columns: start over
+                if total is None or total[0] != shape:
+                    self.generation += 1
+                    total = self.totals[path] = [shape, packed, histogram.bounds, 1, self.generation]
+                    changed.add(path)
+                else:
+                    total[3] += 1
+                    if packed:
+                        total[1] += packed
+                        changed.add(path)
+                interval[path] = (total[4], packed)
+        self.intervals.append(interval)
+
+        if len(self.intervals) > self.size:
+            for path, (generation, packed) in self.intervals.popleft().items():
+                total = self.totals.get(path)
+                if total is None or total[4] != generation:
+                    continue
+                total[3] -= 1
+                if not total[3]:
+                    del self.totals[path]
+                    self.quantiles.pop(path, None)
+                    changed.discard(path)
+                elif packed:
+                    total[1] -= packed
+                    changed.add(path)
+
+        for path in changed:
+            shape, packed, bounds, _, _ = self.totals[path]
+            self.quantiles[path] = LatencyHistogram.unpack(shape[0], bounds, packed).quantiles()
+
+    # Add the windowed quantiles to the records of an iostat report
+    def annotate(self, report):
+        if not self.quantiles:
+            return
+        for pool in report.values():
+            for record in (pool, *pool.vdevs.values()):
+                quantiles = self.quantiles.get(record.path)
+                if quantiles:
+                    if record.latency is None:
+                        record.latency = {}
+                    record.latency.update(quantiles)
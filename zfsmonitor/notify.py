@@ -0,0 +1,174 @@
+# Desktop notifications through org.freedesktop.Notifications, sent
+# asynchronously on the main loop. Notifications are keyed: a new one for a
+# key replaces the one already shown (replaces_id). A burst of several is
+# coalesced into one summary, which the next notification of any of their
+# keys replaces, and a token bucket caps how many reach the desktop. Without
+# a notification server every call goes to `fallback`.
+# The bus is the session bus from DBUS_SESSION_BUS_ADDRESS, so a private
+# `dbus-daemon --session` with a stand-in server can take its place.
+import time
+
+from gi.repository import GLib, Gio
+
+from .config import NOTIFY_COALESCE, NOTIFY_RATE, NOTIFY_BURST
+
+BUS_NAME = "org.freedesktop.Notifications"
+OBJECT_PATH = "/org/freedesktop/Notifications"
+APP_NAME = "ZFS Monitor"
+
+URGENCY_LOW = 0
+URGENCY_NORMAL = 1
+URGENCY_CRITICAL = 2
+ICONS = {URGENCY_LOW: "dialog-information", URGENCY_NORMAL: "dialog-warning", URGENCY_CRITICAL: "dialog-error"}
+
+SUMMARY_KEY = "summary"
+
+# Token bucket: `rate` tokens per second, up to `burst` saved
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self):
+        self.refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    # Seconds until the next token
+    def wait(self):
+        self.refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+# notify() queues; the queue is sent NOTIFY_COALESCE seconds after the first
+# call, as one notification or a summary of all of them, and held until the
+# session bus has been looked up. `fallback(key, title, body, urgency)`
+# shows what the bus cannot and `dismiss(key)` takes it down again; neither
+# may block.
+class Notifier:
+    def __init__(self, fallback=None, dismiss=None, coalesce=NOTIFY_COALESCE, rate=NOTIFY_RATE,
+                 burst=NOTIFY_BURST):
+        self.fallback = fallback
+        self.dismiss = dismiss
+        self.coalesce = coalesce
+        self.bucket = TokenBucket(rate, burst)
+        self.pending = {}    # key -> (title, body, urgency), in arrival order
+        self.ids = {}        # key -> id of the notification shown for it alone
+        self.summary = set() # keys covered by the summary shown under SUMMARY_KEY
+        self.flush_id = None
+        self.connection = None
+        self.available = True
+        Gio.bus_get(Gio.BusType.SESSION, None, self._connected)
+
+    def _connected(self, source, result):
+        try:
+            self.connection = Gio.bus_get_finish(result)
+        except GLib.Error:
+            self.available = False
+        # Whatever was queued while the bus was being looked up
+        if self.pending and self.flush_id is None:
+            self.flush_id = GLib.idle_add(self.flush)
+
+    # Queue a notification; a newer one for the same key replaces it
+    def notify(self, key, title, body, urgency=URGENCY_NORMAL):
+        self.pending.pop(key, None)
+        self.pending[key] = (title, body, urgency)
+        if self.flush_id is None:
+            self.flush_id = GLib.timeout_add(int(self.coalesce * 1000), self.flush)
+
+    # Whether something is on screen for `key`, alone or in the summary
+    def shown(self, key):
+        return key in self.ids or key in self.summary
+
+    # Drop a queued notification and take down the shown one for `key`; the
+    # summary goes once none of its keys is left
+    def withdraw(self, key):
+        self.pending.pop(key, None)
+        if key in self.summary:
+            self.summary.discard(key)
+            if not self.summary:
+                self._close(SUMMARY_KEY)
+        self._close(key)
+
+    def _close(self, key):
+        notification_id = self.ids.pop(key, None)
+        if notification_id and self.connection is not None:
+            self.connection.call(
+                BUS_NAME, OBJECT_PATH, BUS_NAME, "CloseNotification",
+                GLib.Variant("(u)", (notification_id,)), None,
+                Gio.DBusCallFlags.NONE, -1, None, None
+            )
+        if self.dismiss:
+            self.dismiss(key)
+
+    def flush(self):
+        self.flush_id = None
+        if not self.pending or (self.available and self.connection is None):
+            return GLib.SOURCE_REMOVE
+        if not self.bucket.take():
+            # Out of tokens: keep queueing, everything goes out as one later
+            self.flush_id = GLib.timeout_add(int(self.bucket.wait() * 1000) + 1, self.flush)
+            return GLib.SOURCE_REMOVE
+
+        pending, self.pending = self.pending, {}
+        if len(pending) == 1:
+            (key, (title, body, urgency)), = pending.items()
+            if key in self.summary and key not in self.ids:
+                # It takes the summary's place on screen, and the summary
+                # stops covering the others
+                summary_id = self.ids.pop(SUMMARY_KEY, None)
+                if summary_id:
+                    self.ids[key] = summary_id
+                elif self.dismiss:
+                    self.dismiss(SUMMARY_KEY)
+                self.summary = set()
+            self.send(key, title, body, urgency)
+        else:
+            urgency = max(urgency for _, _, urgency in pending.values())
+            body = '\n'.join(entry[0] for entry in pending.values())
+            title = f"{len(pending)} avisos do ZFS Monitor"
+            self.summary = set(pending)
+            self.send(SUMMARY_KEY, title, body, urgency)
+        return GLib.SOURCE_REMOVE
+
+    def send(self, key, title, body, urgency):
+        if not self.available or self.connection is None:
+            if self.fallback:
+                self.fallback(key, title, body, urgency)
+            return
+
+        hints = {"urgency": GLib.Variant("y", urgency)}
+        # Critical notifications stay until dismissed; the rest use the server's default
+        timeout = 0 if urgency == URGENCY_CRITICAL else -1
+        parameters = GLib.Variant("(susssasa{sv}i)", (
+            APP_NAME, self.ids.get(key, 0), ICONS[urgency], title, body, [], hints, timeout
+        ))
+
+        def sent(connection, result):
+            try:
+                self.ids[key] = connection.call_finish(result).unpack()[0]
+            except GLib.Error:
+                # No notification server on this bus: fall back from now on
+                self.available = False
+                if self.fallback:
+                    self.fallback(key, title, body, urgency)
+
+        self.connection.call(
+            BUS_NAME, OBJECT_PATH, BUS_NAME, "Notify", parameters,
+            GLib.VariantType("(u)"), Gio.DBusCallFlags.NONE, -1, None, sent
+        )
+
+    def close(self):
+        if self.flush_id:
+            GLib.source_remove(self.flush_id)
+            self.flush_id = None
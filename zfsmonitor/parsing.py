@@ -0,0 +1,431 @@
+# Records and parsers for `zpool status -p` and `zpool iostat -p -v -l -q`
+import re
+
+# Allocation class headers listed under a pool in `zpool status` and
+# `zpool iostat -v`, and the class of the vdevs below each one
+VDEV_CLASSES = {'logs': 'log', 'cache': 'cache', 'spares': 'spare', 'special': 'special', 'dedup': 'dedup'}
+
+# Names of vdevs that group other devices (everything else is a leaf disk)
+INTERIOR_VDEV = re.compile(r'^(mirror|raidz|draid|replacing|spare|indirect)\S*-\d+$')
+
+# Pool and vdev states from healthy to worst (spares are AVAIL or INUSE);
+# unknown states rank as OFFLINE
+STATE_SEVERITY = {'ONLINE': 0, 'AVAIL': 0, 'INUSE': 0, 'OFFLINE': 1, 'DEGRADED': 2, 'REMOVED': 2,
+                  'UNAVAIL': 3, 'FAULTED': 3, 'SUSPENDED': 3}
+
+# Worst state among PoolRecords (None without pools)
+def worst_state(pools):
+    states = [pool.state for pool in pools if pool.state]
+    if not states:
+        return None
+    return max(states, key=lambda state: STATE_SEVERITY.get(state, 1))
+
+# "tank" for one pool, "3 pools" for several
+def pools_label(names):
+    names = list(names)
+    return names[0] if len(names) == 1 else f"{len(names)} pools"
+
+# Exact-unit stats of one node of the vdev tree, keyed by its full path
+# inside the pool (e.g. "zhome/logs/mirror-1/nvme0n1"). `vdev_class` is
+# data, log, cache, special, spare or dedup; `annotation` is whatever zpool
+# printed after the counters ("(resilvering)", "was /dev/sdb1", "AVAIL" for
+# spares). `latency` holds the `-l` wait times in nanoseconds by column
+# ("total_wait_read", "scrub_wait", ...) plus the quantiles the latency
+# histograms add ("total_wait_read_p99"); `queues` the `-q` depths
+# ("syncq_read_pend", "asyncq_write_activ", ...). Fields not reported are None.
+class VdevRecord:
+    __slots__ = ('path', 'name', 'state', 'alloc', 'free', 'read_ops', 'write_ops',
+                 'read_bw', 'write_bw', 'read_errors', 'write_errors', 'cksum_errors',
+                 'latency', 'queues', 'vdev_class', 'annotation', 'children')
+
+    def __init__(self, path, name, vdev_class='data'):
+        self.path = path
+        self.name = name
+        self.state = None
+        self.alloc = self.free = None
+        self.read_ops = self.write_ops = None
+        self.read_bw = self.write_bw = None
+        self.read_errors = self.write_errors = self.cksum_errors = None
+        self.latency = self.queues = None
+        self.vdev_class = vdev_class
+        self.annotation = None
+        self.children = []
+
+    @property
+    def resilvering(self):
+        return self.annotation is not None and 'resilvering' in self.annotation
+
+    # READ + WRITE + CKSUM, None when the counters were not reported
+    @property
+    def error_count(self):
+        counters = (self.read_errors, self.write_errors, self.cksum_errors)
+        return None if None in counters else sum(counters)
+
+    # Average total wait of the interval and the windowed quantiles, in ns
+    @property
+    def read_wait(self):
+        return self.latency_value('total_wait_read')
+
+    @property
+    def write_wait(self):
+        return self.latency_value('total_wait_write')
+
+    @property
+    def read_p50(self):
+        return self.latency_value('total_wait_read_p50')
+
+    @property
+    def write_p50(self):
+        return self.latency_value('total_wait_write_p50')
+
+    @property
+    def read_p99(self):
+        return self.latency_value('total_wait_read_p99')
+
+    @property
+    def write_p99(self):
+        return self.latency_value('total_wait_write_p99')
+
+    @property
+    def read_p999(self):
+        return self.latency_value('total_wait_read_p999')
+
+    @property
+    def write_p999(self):
+        return self.latency_value('total_wait_write_p999')
+
+    def latency_value(self, column):
+        return None if self.latency is None else self.latency.get(column)
+
+    # I/Os queued in ZFS and issued to the device, over every queue
+    @property
+    def queue_pending(self):
+        return self.queue_total('_pend')
+
+    @property
+    def queue_active(self):
+        return self.queue_total('_activ')
+
+    def queue_total(self, suffix):
+        if not self.queues:
+            return None
+        values = [value for column, value in self.queues.items() if column.endswith(suffix)]
+        return None if None in values else sum(values)
+
+# A physical device at the bottom of the vdev tree
+class LeafRecord(VdevRecord):
+    __slots__ = ()
+
+# The pool itself: root of the vdev tree (`children` holds the top-level
+# vdevs of every class), the text sections of `zpool status` and every vdev
+# below it by path, in output order
+class PoolRecord(VdevRecord):
+    __slots__ = ('status', 'action', 'scan', 'errors', 'vdevs')
+
+    def __init__(self, name):
+        super().__init__(name, name)
+        self.status = self.action = self.scan = self.errors = None
+        self.vdevs = {}
+
+# Convert a `-p` field to an int, None for "-"
+def parse_count(field):
+    return int(field) if field.isdigit() else None
+
+# Format an exact count the way zpool does ("1.2T", "35.4M", "512")
+def format_number(value, suffix=''):
+    if value is None:
+        return '-'
+    units = ('', 'K', 'M', 'G', 'T', 'P', 'E')
+    number = float(value)
+    index = 0
+    while number >= 1024 and index < len(units) - 1:
+        number /= 1024
+        index += 1
+    if index == 0:
+        return f"{int(value)}{suffix}"
+    text = f"{number:.0f}" if number >= 100 else f"{number:.3g}"
+    return f"{text}{units[index]}{suffix}"
+
+# Format nanoseconds the way zpool does ("850us", "12ms", "1.20s")
+def format_latency(value):
+    if value is None:
+        return '-'
+    for unit, scale in (('s', 1e9), ('ms', 1e6), ('us', 1e3)):
+        if value >= scale:
+            number = value / scale
+            text = f"{number:.0f}" if number >= 100 else f"{number:.3g}"
+            return f"{text}{unit}"
+    return f"{int(value)}ns"
+
+SIZE = re.compile(r'^([\d.]+)([KMGTPE]?)i?B?$')
+
+# A size as zpool prints it: exact with -p ("4398046511104"), otherwise
+# scaled ("4.00T", "512M", "1.5GB"); None when unreadable
+def parse_size(field):
+    if field.isdigit():
+        return int(field)
+    match = SIZE.match(field)
+    if not match:
+        return None
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** 'BKMGTPE'.index(unit or 'B'))
+
+# Progress of a running scrub or resilver, from the `scan:` section. Sizes
+# are bytes, rates the averages since the start that zpool reports, `eta`
+# zpool's own estimate in seconds (None when it has none).
+class ScanProgress:
+    __slots__ = ('function', 'started', 'scanned', 'scan_rate', 'issued', 'issue_rate',
+                 'total', 'processed', 'percent', 'eta')
+
+    def __init__(self, function, started):
+        self.function = function
+        self.started = started
+        self.scanned = self.scan_rate = self.issued = self.issue_rate = None
+        self.total = self.processed = self.percent = self.eta = None
+
+SCAN_RUNNING = re.compile(r'^(scrub|resilver) in progress since (.+)$')
+SCAN_AMOUNTS = re.compile(r'(\S+) scanned(?: at (\S+)/s)?, (\S+) issued(?: at (\S+)/s)?, (\S+) total')
+SCAN_DONE = re.compile(r'(\S+) (?:repaired|resilvered), ([\d.]+)% done(?:, (?:(\d+) days )?(\d+):(\d+):(\d+) to go)?')
+
+# ScanProgress of a pool's `scan:` text, None unless a scan is running
+def parse_scan(scan):
+    if not scan:
+        return None
+    header, _, rest = scan.partition('\n')
+    match = SCAN_RUNNING.match(header.strip())
+    if not match:
+        return None
+    progress = ScanProgress(*match.groups())
+
+    match = SCAN_AMOUNTS.search(rest)
+    if match:
+        scanned, scan_rate, issued, issue_rate, total = match.groups()
+        progress.scanned, progress.issued, progress.total = parse_size(scanned), parse_size(issued), parse_size(total)
+        progress.scan_rate = parse_size(scan_rate) if scan_rate else None
+        progress.issue_rate = parse_size(issue_rate) if issue_rate else None
+    match = SCAN_DONE.search(rest)
+    if match:
+        processed, percent, days, hours, minutes, seconds = match.groups()
+        progress.processed = parse_size(processed)
+        progress.percent = float(percent)
+        if hours is not None:
+            progress.eta = int(days or 0) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    return progress
+
+# Builds the vdev tree of an indented device listing in one pass: each
+# line's depth gives its parent, class headers ("logs", "spares", ...) set
+# the class of everything below them until the next header
+class VdevPathBuilder:
+    __slots__ = ('pool', 'prefix', 'vdev_class', 'stack')
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.prefix = pool.name
+        self.vdev_class = 'data'
+        self.stack = [pool]
+
+    # Returns the record for `name` at `depth` (0 = pool column), or None for
+    # class headers such as "logs"
+    def add(self, name, depth):
+        pool = self.pool
+        if depth == 0:
+            self.stack = [pool]
+            if name == pool.name:
+                self.prefix, self.vdev_class = pool.name, 'data'
+                return pool
+            self.prefix = f"{pool.name}/{name}"
+            self.vdev_class = VDEV_CLASSES.get(name, name)
+            return None
+        depth = min(depth, len(self.stack))
+        del self.stack[depth:]
+        parent = self.stack[-1]
+        path = f"{self.prefix if parent is pool else parent.path}/{name}"
+        record_class = VdevRecord if INTERIOR_VDEV.match(name) else LeafRecord
+        record = pool.vdevs[path] = record_class(path, name, self.vdev_class)
+        parent.children.append(record)
+        self.stack.append(record)
+        return record
+
+# Fields of `zpool status` that start a new section, and the PoolRecord
+# attribute each one fills (None: not kept)
+STATUS_FIELDS = {
+    'pool': None, 'state': 'state', 'status': 'status', 'action': 'action',
+    'see': None, 'scan': 'scan', 'config': None, 'errors': 'errors',
+}
+
+# Parse `zpool status -p` output covering any number of pools into
+# {pool name: PoolRecord}, in output order. Single pass: section fields
+# collect their tab-indented continuation lines, and the config table is fed
+# to the pool's vdev tree line by line.
+def parse_zpool_status(output):
+    pools = {}
+    pool = None
+    field = None     # attribute that continuation lines extend
+    builder = None   # set while reading the config table
+
+    for line in output.split('\n'):
+        key, colon, value = line.strip().partition(':')
+        starts_field = colon and key in STATUS_FIELDS and not line.startswith('\t')
+
+        if builder is not None and not starts_field:
+            parse_config_line(builder, line)
+            continue
+        builder = None
+
+        if starts_field:
+            value = value.strip()
+            field = STATUS_FIELDS[key]
+            if key == 'pool':
+                pool = pools[value] = PoolRecord(value)
+            elif pool is None:
+                field = None
+            elif key == 'config':
+                builder = VdevPathBuilder(pool)
+            elif field:
+                setattr(pool, field, value)
+        elif field and pool is not None and line.startswith('\t') and line.strip():
+            # Continuation of a multi-line section
+            current = getattr(pool, field)
+            setattr(pool, field, f"{current}\n{line.strip()}" if current else line.strip())
+        elif not line.strip():
+            field = None
+
+    return pools
+
+# One line of the NAME/STATE/READ/WRITE/CKSUM table into the vdev tree
+def parse_config_line(builder, line):
+    if line.startswith('\t'):
+        line = line[1:]
+    parts = line.split()
+    if not parts or parts[0] == 'NAME':
+        return
+    depth = (len(line) - len(line.lstrip(' '))) // 2
+    record = builder.add(parts[0], depth)
+    if record is None or len(parts) < 2:
+        return
+    record.state = parts[1]
+    rest = parts[2:]
+    if len(rest) >= 3 and all(field.isdigit() for field in rest[:3]):
+        record.read_errors = int(rest[0])
+        record.write_errors = int(rest[1])
+        record.cksum_errors = int(rest[2])
+        rest = rest[3:]
+    if rest:
+        record.annotation = ' '.join(rest)
+
+# Hashable summary of a pool's vdev tree, for change detection
+def vdev_tree_key(pool):
+    return tuple(
+        (record.path, record.state, record.read_errors, record.write_errors, record.cksum_errors, record.annotation)
+        for record in pool.vdevs.values()
+    ) + ((pool.state, pool.read_errors, pool.write_errors, pool.cksum_errors),)
+
+# Sections of a PoolRecord that the Status tab renders separately: text
+# fields, then the vdev tree
+STATUS_SECTIONS = ('state', 'status', 'action', 'scan', 'errors', 'config')
+
+# Fingerprint of one section of a pool
+def section_key(pool, section):
+    return hash(vdev_tree_key(pool) if section == 'config' else getattr(pool, section))
+
+# Column names of a two-line iostat header: the group line ("capacity",
+# "total_wait", "syncq_read", ...) and the label line below it. Labels come
+# in pairs under one group (alloc/free, read/write, pend/activ), "wait" sits
+# alone under its group ("scrub wait") and, in the histogram header, the
+# single columns name themselves ("scrub", "trim"). Every column becomes
+# "<group>_<label>" or "<name>_wait".
+PAIRED_LABELS = {'alloc': 'free', 'read': 'write', 'pend': 'activ'}
+
+def header_columns(groups, labels):
+    groups = iter(groups)
+    columns = []
+    index = 0
+    while index < len(labels):
+        label = labels[index]
+        if label in PAIRED_LABELS:
+            group = next(groups, label)
+            columns += [f"{group}_{label}", f"{group}_{PAIRED_LABELS[label]}"]
+            index += 2
+        elif label == 'wait':
+            columns.append(f"{next(groups, 'unknown')}_wait")
+            index += 1
+        else:
+            columns.append(f"{label}_wait")
+            index += 1
+    return columns
+
+# Incremental `zpool iostat -p -v [-l] [-q]` parser. Prime it with next(), then send()
+# one output line at a time: it yields None while a report is being read and
+# the complete report (pool name -> PoolRecord) once the interval is over.
+# Every pool block ends with a separator line, so an interval is complete at
+# the separator that follows the last pool seen in the previous interval, at
+# a blank line, or at the latest when a pool shows up a second time. The
+# header lays out the `-l` and `-q` columns after the six basic ones.
+def iostat_report_parser():
+    report = {}
+    expected = None
+    builder = None
+    completed = None
+    groups = None
+    latency_columns = queue_columns = ()
+
+    while True:
+        line = yield completed
+        completed = None
+        line = line.rstrip('\n')
+
+        if not line.strip() or line.startswith('-'):
+            builder = None
+            if report and (not line.strip() or (expected and expected <= report.keys())):
+                completed, report = report, {}
+                expected = set(completed)
+            continue
+
+        parts = line.split()
+        if parts[:2] == ['capacity', 'operations']:
+            groups = parts
+            continue
+        if parts[1:3] == ['alloc', 'free']:
+            columns = list(enumerate(header_columns(groups or (), parts[1:]), start=1))[6:]
+            latency_columns = [(index, column) for index, column in columns if 'wait' in column]
+            queue_columns = [(index, column) for index, column in columns if 'wait' not in column]
+            continue
+        if len(parts) < 7:
+            continue
+
+        name = parts[0]
+        depth = (len(line) - len(line.lstrip(' '))) // 2
+        if depth == 0 and (builder is None or name not in VDEV_CLASSES):
+            # A pool line we already have starts the next interval
+            if name in report:
+                completed, report = report, {}
+                expected = set(completed)
+            pool = report[name] = PoolRecord(name)
+            builder = VdevPathBuilder(pool)
+        elif builder is None:
+            continue
+
+        record = builder.add(name, depth)
+        if record is not None:
+            record.alloc = parse_count(parts[1])
+            record.free = parse_count(parts[2])
+            record.read_ops = parse_count(parts[3])
+            record.write_ops = parse_count(parts[4])
+            record.read_bw = parse_count(parts[5])
+            record.write_bw = parse_count(parts[6])
+            if latency_columns:
+                record.latency = {column: parse_count(parts[index])
+                                  for index, column in latency_columns if index < len(parts)}
+            if queue_columns:
+                record.queues = {column: parse_count(parts[index])
+                                 for index, column in queue_columns if index < len(parts)}
+
+# Parse the first report of a complete `zpool iostat -p -v [-l] [-q]` output
+def parse_iostat(output):
+    parser = iostat_report_parser()
+    next(parser)
+    for line in output.split('\n') + ['']:
+        report = parser.send(line)
+        if report:
+            return report
+    return {}
@@ -0,0 +1,220 @@
+# Wire format between an agent (--agent) and the monitors connected to it
+# (--connect). Pure Python, shared by both ends and by the benchmarks.
+#
+# A status snapshot is flattened into one record per pool and vdev, keyed by
+# its path ("tank", "tank/raidz2-0/sda"), and the agent sends each client the
+# full set once, then only the records that changed. Messages are compact
+# JSON lines; the agent's side of the stream goes through one zlib stream
+# per connection, flushed after every message, so repeated paths and field
+# values cost a few bytes each. A healthy pool that does not change sends
+# nothing at all.
+#
+#   {"type":"hello","version":1,"name":"nas1"}             agent, first
+#   {"type":"full","seq":7,"set":{...},"order":[...],"error":null}
+#   {"type":"delta","seq":8,"set":{...},"del":[...]}       "order" and "error"
+#                                                          only when they changed
+#   {"type":"refresh"}                                     client: run zpool now
+import json
+import zlib
+
+from .parsing import PoolRecord, VdevRecord, LeafRecord, INTERIOR_VDEV
+
+PROTOCOL_VERSION = 1
+
+# Record attributes carried for pools and for vdevs, in wire order
+POOL_FIELDS = ('state', 'read_errors', 'write_errors', 'cksum_errors', 'status', 'action', 'scan', 'errors')
+VDEV_FIELDS = ('state', 'read_errors', 'write_errors', 'cksum_errors', 'vdev_class', 'annotation')
+
+# Longest line either end accepts before dropping the connection
+MAX_LINE = 64 * 1024 * 1024
+
+class ProtocolError(Exception):
+    pass
+
+# {path: [field values]} of a parsed snapshot, pools before their vdevs, in
+# output order
+def flatten(pools):
+    records = {}
+    for pool in pools.values():
+        records[pool.name] = [getattr(pool, field) for field in POOL_FIELDS]
+        for path, record in pool.vdevs.items():
+            records[path] = [getattr(record, field) for field in VDEV_FIELDS]
+    return records
+
+# Agent side: the last published state and the message that brings a
+# client from it to the next snapshot. Every connected client has seen every
+# message, so one delta serves them all and new clients start from full().
+class SnapshotState:
+    def __init__(self):
+        self.records = {}
+        self.order = []
+        self.error = None   # zpool's output when it reported no pools
+        self.seq = 0
+
+    # Delta message from the current state to `pools`, None when nothing
+    # changed
+    def update(self, pools, error=None):
+        records = flatten(pools)
+        previous = self.records
+        message = {}
+        changed = {key: value for key, value in records.items() if previous.get(key) != value}
+        if changed:
+            message['set'] = changed
+        removed = [key for key in previous if key not in records]
+        if removed:
+            message['del'] = removed
+        order = list(records)
+        if order != self.order:
+            message['order'] = order
+        if error != self.error:
+            message['error'] = error
+        self.records, self.order, self.error = records, order, error
+        if not message:
+            return None
+        self.seq += 1
+        return {'type': 'delta', 'seq': self.seq, **message}
+
+    def full(self):
+        return {'type': 'full', 'seq': self.seq, 'set': self.records, 'order': self.order, 'error': self.error}
+
+# One pool's PoolRecord tree from its flattened records. `keys` are the
+# pool's own key followed by its vdevs in output order; names and paths get
+# `prefix` ("nas1:") so pools of different hosts never collide.
+def build_pool(prefix, keys, records):
+    name = keys[0]
+    pool = PoolRecord(prefix + name)
+    for field, value in zip(POOL_FIELDS, records[name]):
+        setattr(pool, field, value)
+    for key in keys[1:]:
+        parent_path, _, vdev_name = key.rpartition('/')
+        # Vdevs right below a class header ("tank/logs/mirror-1") hang from the pool
+        parent = pool.vdevs.get(prefix + parent_path, pool)
+        path = prefix + key
+        record = (VdevRecord if INTERIOR_VDEV.match(vdev_name) else LeafRecord)(path, vdev_name)
+        for field, value in zip(VDEV_FIELDS, records[key]):
+            setattr(record, field, value)
+        pool.vdevs[path] = record
+        parent.children.append(record)
+    return pool
+
+# Client side: one agent's records as last received and the PoolRecords
+# built from them. Only the pools a delta touched are rebuilt.
+class RemoteState:
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.records = {}
+        self.order = []
+        self.error = None
+        self.seq = None
+        self.pools = {}     # prefixed name -> PoolRecord, in the agent's order
+
+    # Apply one "full" or "delta" message. Raises ProtocolError on a gap in
+    # the sequence, after which the connection has to start over.
+    def apply(self, message):
+        kind = message.get('type')
+        if kind == 'full':
+            self.records = dict(message['set'])
+            self.order = list(message['order'])
+            self.error = message.get('error')
+            self.seq = message['seq']
+            self.rebuild(None)
+            return
+        if kind != 'delta':
+            raise ProtocolError(f"unexpected message {kind!r}")
+        if self.seq is None or message['seq'] != self.seq + 1:
+            raise ProtocolError(f"delta {message['seq']} does not follow {self.seq}")
+        self.seq = message['seq']
+        changed = message.get('set', {})
+        removed = message.get('del', ())
+        self.records.update(changed)
+        for key in removed:
+            self.records.pop(key, None)
+        if 'error' in message:
+            self.error = message['error']
+        if 'order' in message:
+            self.order = list(message['order'])
+            self.rebuild(None)
+        elif changed or removed:
+            self.rebuild({key.split('/', 1)[0] for key in changed})
+
+    # Rebuild the pools named in `names`, every pool when None
+    def rebuild(self, names):
+        groups = {}
+        for key in self.order:
+            pool = key.split('/', 1)[0]
+            if names is None or pool in names:
+                groups.setdefault(pool, []).append(key)
+        pools = {} if names is None else self.pools
+        for name, keys in groups.items():
+            if keys[0] == name and all(key in self.records for key in keys):
+                pools[self.prefix + name] = build_pool(self.prefix, keys, self.records)
+        if names is not None:
+            # Keep the agent's pool order
+            pools = {self.prefix + name: pools[self.prefix + name] for name in self.pool_names()
+                     if self.prefix + name in pools}
+        self.pools = pools
+
+    # Mark every pool UNAVAIL with `reason` as its status, keeping the last
+    # known vdevs, until the next full snapshot replaces them
+    def unreachable(self, reason):
+        state, status = POOL_FIELDS.index('state'), POOL_FIELDS.index('status')
+        for name in self.pool_names():
+            record = self.records[name] = list(self.records[name])
+            record[state] = 'UNAVAIL'
+            record[status] = reason
+        self.rebuild(None)
+
+    def pool_names(self):
+        return [key for key in self.order if '/' not in key]
+
+def encode(message):
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+# Compressed side of a connection: every message is flushed on its own, so
+# the peer can decode it as soon as it arrives
+class Compressor:
+    def __init__(self, level=6):
+        self.zlib = zlib.compressobj(level)
+
+    def frame(self, data):
+        return self.zlib.compress(data) + self.zlib.flush(zlib.Z_SYNC_FLUSH)
+
+# Splits a byte stream (decompressed first when `compressed`) into decoded
+# messages, every one a JSON object
+class MessageReader:
+    def __init__(self, compressed=False):
+        self.zlib = zlib.decompressobj() if compressed else None
+        self.buffer = b''
+
+    def feed(self, data):
+        if self.zlib is not None:
+            try:
+                data = self.zlib.decompress(data)
+            except zlib.error as e:
+                raise ProtocolError(f"corrupt stream: {e}") from None
+        lines = (self.buffer + data).split(b'\n')
+        self.buffer = lines.pop()
+        if len(self.buffer) > MAX_LINE:
+            raise ProtocolError("message too long")
+        try:
+            messages = [json.loads(line) for line in lines if line]
+        except ValueError as e:
+            raise ProtocolError(f"malformed message: {e}") from None
+        for message in messages:
+            if not isinstance(message, dict):
+                raise ProtocolError(f"message is not an object: {message!r:.40}")
+        return messages
+
+# (kind, target) of an agent address: ("unix", path) for "unix:/run/x.sock"
+# or any path, ("tcp", "host:port") otherwise
+def parse_address(address, default_port=None):
+    if address.startswith('unix:'):
+        return 'unix', address[5:]
+    if address.startswith(('/', '.')):
+        return 'unix', address
+    host, colon, port = address.rpartition(':')
+    if not colon or not port.isdigit():
+        if default_port is None:
+            raise ValueError(f"no port in agent address {address!r}")
+        host, port = address, default_port
+    return 'tcp', f"{host or '127.0.0.1'}:{port}"
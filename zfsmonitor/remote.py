@@ -0,0 +1,237 @@
+# Monitoring remote hosts (--connect): a persistent connection to each agent
+# and a collector that merges their pool trees into one StatusSnapshot, so
+# the tray, the Status and Alerts tabs and the alert engine see many hosts
+# exactly as they see the local pools. Pools are named "host:pool". All
+# connections are asynchronous on the main loop, so a hundred hosts cost a
+# hundred idle sockets and no threads.
+import time
+
+from gi.repository import GLib, Gio
+
+from .config import AGENT_PORT, AGENT_RETRY, AGENT_COALESCE, BACKOFF_MAX
+from .collector import StatusSnapshot
+from .protocol import PROTOCOL_VERSION, RemoteState, MessageReader, ProtocolError, encode, parse_address
+from .instrument import stats
+
+# One agent. While it is unreachable, its last known pools stay in the view
+# marked UNAVAIL, and it is retried after AGENT_RETRY seconds, twice as long
+# after each failure in a row.
+class AgentLink:
+    def __init__(self, address, collector):
+        self.address = address
+        self.collector = collector
+        self.kind, self.target = parse_address(address, AGENT_PORT)
+        self.label = None
+        self.state = None       # RemoteState, kept across reconnects
+        self.error = "Conectando..."   # why the link shows no live data, None when it does
+        self.connected = False
+        self.connection = None
+        self.cancellable = None
+        self.reader = None
+        self.failures = 0
+        self.retry_id = None
+        self.version = 0        # bumped on every change, for the merged fingerprint
+
+    def connect(self):
+        self.cancellable = Gio.Cancellable()
+        try:
+            if self.kind == 'unix':
+                connectable = Gio.UnixSocketAddress.new(self.target)
+            else:
+                connectable = Gio.NetworkAddress.parse(self.target, AGENT_PORT)
+        except GLib.Error as e:
+            self.fail(e.message)
+            return
+        Gio.SocketClient.new().connect_async(connectable, self.cancellable, self._connected, self.cancellable)
+
+    # Callbacks check their connection's cancellable: anything still in
+    # flight from a connection that was dropped is ignored
+    def _connected(self, client, async_result, cancellable):
+        try:
+            connection = client.connect_finish(async_result)
+        except GLib.Error as e:
+            if not cancellable.is_cancelled():
+                self.fail(e.message)
+            return
+        if cancellable.is_cancelled():
+            return
+        self.connection = connection
+        connection.get_socket().set_keepalive(True)
+        self.reader = MessageReader(compressed=True)
+        self.connected = True
+        connection.get_input_stream().read_bytes_async(
+            65536, GLib.PRIORITY_DEFAULT, cancellable, self._read, cancellable
+        )
+
+    def _read(self, stream, async_result, cancellable):
+        try:
+            data = stream.read_bytes_finish(async_result).get_data()
+        except GLib.Error as e:
+            if not cancellable.is_cancelled():
+                self.fail(e.message)
+            return
+        if cancellable.is_cancelled():
+            return
+        if not data:
+            self.fail("conexão encerrada pelo agente")
+            return
+        stats.count("remote:bytes received", len(data))
+        try:
+            for message in self.reader.feed(data):
+                self.handle(message)
+        except (ProtocolError, KeyError, TypeError, ValueError, AttributeError) as e:
+            # Whatever a malformed message breaks, the link starts over
+            self.fail(f"protocolo: {e}")
+            return
+        stream.read_bytes_async(65536, GLib.PRIORITY_DEFAULT, cancellable, self._read, cancellable)
+
+    def handle(self, message):
+        kind = message.get('type')
+        if kind == 'hello':
+            if message.get('version') != PROTOCOL_VERSION:
+                raise ProtocolError(f"versão {message.get('version')} do agente não é suportada")
+            label = self.collector.claim_label(self, message['name'])
+            if self.state is None or label != self.label:
+                self.label = label
+                self.state = RemoteState(f"{label}:")
+            return
+        if kind == 'refreshed':
+            # Nothing new, but whoever asked is waiting for a snapshot
+            self.collector.link_changed(self)
+            return
+        if self.state is None:
+            raise ProtocolError(f"{kind!r} before hello")
+        self.state.apply(message)
+        stats.count("remote:messages")
+        self.failures = 0
+        self.error = self.state.error
+        self.changed()
+
+    # Ask the agent to run `zpool status` now; False when not connected
+    def refresh(self):
+        if not self.connected:
+            return False
+        self.connection.get_output_stream().write_all_async(
+            encode({'type': 'refresh'}), GLib.PRIORITY_DEFAULT, self.cancellable, self._sent
+        )
+        return True
+
+    def _sent(self, stream, async_result):
+        try:
+            stream.write_all_finish(async_result)
+        except GLib.Error:
+            pass   # the read side notices a dead connection
+
+    def changed(self):
+        self.version += 1
+        self.collector.link_changed(self)
+
+    def fail(self, reason):
+        self.disconnect()
+        self.error = f"agente inacessível: {reason}"
+        if self.state is not None:
+            self.state.unreachable(f"Agente {self.address} inacessível: {reason}")
+        delay = min(AGENT_RETRY * 2 ** self.failures, BACKOFF_MAX)
+        self.failures += 1
+        self.retry_id = GLib.timeout_add_seconds(delay, self._retry)
+        self.changed()
+
+    def _retry(self):
+        self.retry_id = None
+        self.connect()
+        return False
+
+    def disconnect(self):
+        self.connected = False
+        if self.retry_id:
+            GLib.source_remove(self.retry_id)
+            self.retry_id = None
+        if self.cancellable is not None:
+            self.cancellable.cancel()
+        if self.connection is not None:
+            try:
+                self.connection.get_socket().close()
+            except GLib.Error:
+                pass
+            self.connection = None
+
+# Drop-in for StatusCollector over agents: same subscribe/request/snapshot
+# interface. Updates from any number of links within AGENT_COALESCE seconds
+# become one merged snapshot; only the hosts that changed rebuilt their pools.
+class RemoteCollector:
+    remote = True
+
+    def __init__(self, addresses):
+        self.pools = ()
+        self.snapshot = None
+        self.subscribers = []
+        self.waiters = []
+        self.merge_id = None
+        self.links = [AgentLink(address, self) for address in addresses]
+        for link in self.links:
+            link.connect()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        if self.snapshot is not None:
+            GLib.idle_add(self._deliver, callback, self.snapshot)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    # Serve the merged snapshot; `force` has every connected agent run
+    # `zpool status` now. Returns True when a new snapshot is on its way.
+    def request(self, callback=None, force=False):
+        forced = force and sum(link.refresh() for link in self.links) > 0
+        if self.snapshot is None or forced:
+            if callback:
+                self.waiters.append(callback)
+            return True
+        if callback:
+            GLib.idle_add(self._deliver, callback, self.snapshot)
+        return False
+
+    def _deliver(self, callback, snapshot):
+        callback(snapshot)
+        return False
+
+    # The agent's own name, unless another link already uses it
+    def claim_label(self, link, name):
+        taken = {other.label for other in self.links if other is not link}
+        return name if name not in taken else f"{name}@{link.address}"
+
+    def link_changed(self, link):
+        if self.merge_id is None:
+            self.merge_id = GLib.timeout_add(int(AGENT_COALESCE * 1000), self.merge)
+
+    # Every host's pools in configured order; `output` lists the hosts
+    # without live data, and the fingerprint changes with any link
+    def merge(self):
+        self.merge_id = None
+        pools = {}
+        errors = []
+        for link in self.links:
+            if link.state is not None:
+                pools.update(link.state.pools)
+            if link.error:
+                errors.append(f"{link.label or link.address}: {link.error}")
+        with stats.timer("merge:remote snapshots"):
+            snapshot = StatusSnapshot(time.monotonic(), '\n'.join(errors), pools)
+        snapshot.fingerprint = hash(tuple(link.version for link in self.links))
+        self.snapshot = snapshot
+        waiters, self.waiters = self.waiters, []
+
+        for callback in list(self.subscribers):
+            callback(snapshot)
+        for callback in waiters:
+            if callback not in self.subscribers:
+                callback(snapshot)
+        return False
+
+    def close(self):
+        if self.merge_id:
+            GLib.source_remove(self.merge_id)
+            self.merge_id = None
+        for link in self.links:
+            link.disconnect()
@@ -0,0 +1,118 @@
+# Scrub/resilver progress over time. Every status snapshot adds a sample
+# per running scan; the scan and issue rates are exponentially smoothed
+# over SCAN_SMOOTHING seconds, the ETA follows from the issue rate and a
+# scan whose issued bytes stop growing for SCAN_STALL seconds is stalled.
+import math
+import time
+from collections import deque
+
+from .config import SCAN_SAMPLES, SCAN_SMOOTHING, SCAN_STALL
+from .parsing import parse_scan
+
+# "2d 3h", "1h 08min", "12min", "< 1min"
+def format_eta(seconds):
+    if seconds is None:
+        return '-'
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "< 1min"
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes:02d}min"
+    return f"{minutes}min"
+
+# One pool's current scan: the latest ScanProgress, (time, scan rate, issue
+# rate) samples between snapshots and the smoothed rates
+class ScanTracker:
+    __slots__ = ('pool', 'progress', 'samples', 'scan_rate', 'issue_rate', 'stamp', 'advanced', 'stalled')
+
+    def __init__(self, pool, progress, now):
+        self.pool = pool
+        self.progress = progress
+        self.samples = deque(maxlen=SCAN_SAMPLES)
+        # zpool's averages since the start seed the smoothed rates
+        self.scan_rate = progress.scan_rate
+        self.issue_rate = progress.issue_rate
+        self.stamp = now
+        self.advanced = now   # last time the issued bytes grew
+        self.stalled = False
+
+    # A snapshot of the same scan; returns False when it is a new scan
+    def update(self, progress, now):
+        previous = self.progress
+        if progress.started != previous.started or progress.function != previous.function:
+            return False
+        elapsed = now - self.stamp
+        if elapsed <= 0:
+            return True
+
+        weight = 1 - math.exp(-elapsed / SCAN_SMOOTHING)
+        rates = []
+        for field, smoothed in (('scanned', 'scan_rate'), ('issued', 'issue_rate')):
+            current, before = getattr(progress, field), getattr(previous, field)
+            if current is None or before is None or current < before:
+                rates.append(None)
+                continue
+            rate = (current - before) / elapsed
+            rates.append(rate)
+            average = getattr(self, smoothed)
+            setattr(self, smoothed, rate if average is None else average + weight * (rate - average))
+        self.samples.append((now, *rates))
+
+        if progress.issued is not None and previous.issued is not None and progress.issued > previous.issued:
+            self.advanced = now
+        self.stalled = now - self.advanced >= SCAN_STALL
+        self.progress = progress
+        self.stamp = now
+        return True
+
+    # Seconds left at the smoothed issue rate, else zpool's estimate
+    @property
+    def eta(self):
+        progress = self.progress
+        if self.issue_rate and progress.total is not None and progress.issued is not None:
+            return max(0, progress.total - progress.issued) / self.issue_rate
+        return progress.eta
+
+# Tracks the scans of every pool from the status snapshots. Subscribers
+# receive a list of (kind, tracker) per snapshot with a running scan or a
+# change: "started", "progress", "stalled", "resumed" or "finished".
+class ScanMonitor:
+    def __init__(self):
+        self.trackers = {}   # pool name -> ScanTracker of its running scan
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def on_snapshot(self, snapshot, now=None):
+        if not snapshot.pools:
+            return
+        now = time.monotonic() if now is None else now
+        events = []
+        for name, pool in snapshot.pools.items():
+            progress = parse_scan(pool.scan)
+            tracker = self.trackers.get(name)
+            if progress is None:
+                if tracker is not None:
+                    events.append(("finished", self.trackers.pop(name)))
+                continue
+            if tracker is not None:
+                stalled = tracker.stalled
+                if tracker.update(progress, now):
+                    if tracker.stalled != stalled:
+                        events.append(("stalled" if tracker.stalled else "resumed", tracker))
+                    events.append(("progress", tracker))
+                    continue
+                events.append(("finished", tracker))
+            tracker = self.trackers[name] = ScanTracker(name, progress, now)
+            events.append(("started", tracker))
+        for name in [name for name in self.trackers if name not in snapshot.pools]:
+            events.append(("finished", self.trackers.pop(name)))
+
+        if events:
+            for callback in list(self.subscribers):
+                callback(events)
@@ -0,0 +1,145 @@
+# Periodic work on one shared wakeup. Every task's next run is rounded up to
+# a grid of `tick` seconds, so tasks that are due together run in the same
+# wakeup and the process sleeps in between. A task's interval depends on
+# what is going on: shorter while busy (scrub, resilver, open alerts),
+# longer while none of its views is on screen, stretched after slow runs
+# and doubled after each failure in a row.
+import math
+import time
+
+from gi.repository import GLib
+
+from .config import SCHEDULER_TICK, BACKOFF_MAX, SLOW_FACTOR
+from .instrument import log
+
+class Task:
+    __slots__ = ('name', 'callback', 'interval', 'busy_interval', 'hidden_interval', 'views',
+                 'due', 'last', 'running', 'failures', 'stretch')
+
+    def __init__(self, name, callback, interval, busy_interval, hidden_interval, views):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.busy_interval = busy_interval
+        self.hidden_interval = hidden_interval
+        self.views = views
+        self.due = 0.0
+        self.last = None
+        self.running = False
+        self.failures = 0
+        self.stretch = 0.0   # lower bound from the duration of the last run
+
+# Tasks are `callback(done)`: they start their work and call done(ok) when
+# it finishes, so a task never runs twice at once and its duration is known.
+# A callback that raises is logged and counts as done(False).
+# Views ("status", "performance", ...) are marked visible by the GUI;
+# subscribers are called with the scheduler whenever visibility or the busy
+# flag changes, for work that is not a periodic task (the iostat stream).
+class Scheduler:
+    def __init__(self, tick=SCHEDULER_TICK):
+        self.tick = tick
+        self.tasks = {}
+        self.visible = set()
+        self.busy = False
+        self.subscribers = []
+        self.timeout_id = None
+
+    # Register a task; it first runs at the next wakeup
+    def add(self, name, callback, interval, busy_interval=None, hidden_interval=None, views=()):
+        task = self.tasks[name] = Task(name, callback, interval, busy_interval, hidden_interval, views)
+        task.due = time.monotonic()
+        self.reschedule()
+        return task
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    # Whether any of `views` is on screen; no views means always
+    def is_visible(self, views):
+        return not views or any(view in self.visible for view in views)
+
+    def set_visible(self, view, visible):
+        if visible == (view in self.visible):
+            return
+        if visible:
+            self.visible.add(view)
+        else:
+            self.visible.discard(view)
+        self.changed()
+
+    def set_busy(self, busy):
+        if busy != self.busy:
+            self.busy = busy
+            self.changed()
+
+    # Current interval of a task
+    def interval(self, task):
+        if self.busy and task.busy_interval:
+            interval = task.busy_interval
+        elif task.hidden_interval and not self.is_visible(task.views):
+            interval = task.hidden_interval
+        else:
+            interval = task.interval
+        interval = max(interval, task.stretch)
+        if task.failures:
+            interval = min(interval * 2 ** task.failures, BACKOFF_MAX)
+        return interval
+
+    # Next grid point at or after `when`
+    def align(self, when):
+        return math.ceil(when / self.tick) * self.tick
+
+    # Intervals changed: move every idle task's next run, which may bring it
+    # forward to the next wakeup (a view just came on screen)
+    def changed(self):
+        for task in self.tasks.values():
+            if task.last is not None and not task.running:
+                task.due = self.align(task.last + self.interval(task))
+        for callback in list(self.subscribers):
+            callback(self)
+        self.reschedule()
+
+    def reschedule(self):
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+        due = [task.due for task in self.tasks.values() if not task.running]
+        if due:
+            delay = max(0.0, min(due) - time.monotonic())
+            self.timeout_id = GLib.timeout_add_seconds(math.ceil(delay), self.wakeup)
+
+    def wakeup(self):
+        self.timeout_id = None
+        now = time.monotonic()
+        # Whatever falls due within half a tick runs now, with the rest
+        for task in list(self.tasks.values()):
+            if not task.running and task.due <= now + self.tick / 2:
+                self.run(task, now)
+        self.reschedule()
+        return GLib.SOURCE_REMOVE
+
+    def run(self, task, now):
+        task.running = True
+        task.last = now
+
+        def done(ok=True):
+            if self.tasks.get(task.name) is not task or not task.running:
+                return
+            task.running = False
+            task.failures = 0 if ok else task.failures + 1
+            task.stretch = (time.monotonic() - now) * SLOW_FACTOR
+            task.due = self.align(now + self.interval(task))
+            self.reschedule()
+
+        # A task that raises counts as failed; the wakeup goes on with the rest
+        try:
+            task.callback(done)
+        except Exception as e:
+            log(f"task {task.name} failed: {e!r}")
+            done(False)
+
+    def stop(self):
+        self.tasks = {}
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
@@ -0,0 +1,275 @@
+# On-disk metric history in SQLite, written from its own thread
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from itertools import chain
+
+from gi.repository import GLib
+
+from .config import STORE_PATH, STORE_FLUSH, STORE_RETENTION
+from .history import report_series
+from .instrument import log
+
+# Persistent history in SQLite (WAL). Each row holds one timestamp of one step
+# for every series at once, packed as an array under a numbered layout (the
+# ordered list of series keys), so a week of per-vdev data is a few hundred
+# rows. Raw samples are buffered and written in one transaction every
+# STORE_FLUSH seconds, then rolled up into 1 min and 15 min rows and expired
+# per STORE_RETENTION. All database work happens on the store's own thread.
+# When the database cannot be opened the store is disabled: samples are
+# dropped and queries and exports are answered at once, empty or failed.
+class HistoryStore:
+    STEPS = (1, 60, 900)
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.pending = []
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.layouts = {}       # keys tuple -> layout id
+        self.layout_keys = {}   # layout id -> keys tuple
+        self.disabled = None    # why the database could not be opened
+        self.last = None        # raw row written last, [ts, keys, values, samples]
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # Buffer one iostat report, plus `extra` (key, value) pairs, for the next
+    # batched write. Raw rows are one per second: a report within the same
+    # second as the one before is averaged into it.
+    def append(self, timestamp, report, extra=()):
+        keys = []
+        values = array('d')
+        for key, value in chain(report_series(report), extra):
+            keys.append(key)
+            values.append(value)
+        sample = [int(timestamp), tuple(keys), values, 1]
+        with self.lock:
+            if self.disabled:
+                return
+            if self.pending and self.pending[-1][0] == sample[0]:
+                merge_samples(self.pending[-1], sample)
+            else:
+                self.pending.append(sample)
+
+    # Load {key: [(ts, min, avg, max)]} at `step` resolution for [start, end)
+    # and hand it to `callback` on the main loop
+    def query(self, start, end, step, callback):
+        self._submit(self._query, (start, end, step, callback), lambda error: callback({}))
+
+    # start_export() once the pending samples are on disk
+    def export(self, export, progress, done):
+        self._submit(self._export, (export, progress, done), lambda error: done(0, error))
+
+    # Queue `method(*args)` for the store's thread, or call `failed(error)`
+    # on the main loop when the store is disabled
+    def _submit(self, method, args, failed):
+        with self.lock:
+            if not self.disabled:
+                self.jobs.put((method, args, failed))
+                return
+        GLib.idle_add(failed, self.disabled)
+
+    def close(self):
+        self.jobs.put(None)
+        self.thread.join(timeout=10)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS layouts (id INTEGER PRIMARY KEY, keys TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS samples (
+                step INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                layout INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (step, ts)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        for layout_id, keys in self.db.execute("SELECT id, keys FROM layouts"):
+            keys = tuple(tuple(key) for key in json.loads(keys))
+            self.layouts[keys] = layout_id
+            self.layout_keys[layout_id] = keys
+
+    def _run(self):
+        try:
+            self._open()
+        except (OSError, sqlite3.Error) as e:
+            log(f"History store disabled: {e}")
+            with self.lock:
+                self.disabled = f"History store disabled: {e}"
+                self.pending = []
+            # Answer whatever was queued before the store gave up
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    return
+                if job:
+                    GLib.idle_add(job[2], self.disabled)
+
+        while True:
+            try:
+                job = self.jobs.get(timeout=STORE_FLUSH)
+            except queue.Empty:
+                job = ()
+            try:
+                if job is None:
+                    self._flush()
+                    break
+                if job:
+                    method, args, _ = job
+                    method(*args)
+                else:
+                    self._flush()
+                    self._compact()
+            except sqlite3.Error as e:
+                log(f"History store error: {e}")
+                # The caller is still waiting for an answer
+                if job:
+                    GLib.idle_add(job[2], str(e))
+        self.db.close()
+
+    def _layout(self, keys):
+        layout_id = self.layouts.get(keys)
+        if layout_id is None:
+            cursor = self.db.execute("INSERT INTO layouts (keys) VALUES (?)", (json.dumps(keys),))
+            layout_id = self.layouts[keys] = cursor.lastrowid
+            self.layout_keys[layout_id] = keys
+        return layout_id
+
+    def _flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        # The second written last may go on in this batch: its row is
+        # replaced by the average of both
+        if self.last is not None and pending[0][0] == self.last[0]:
+            merge_samples(self.last, pending[0])
+            pending[0] = self.last
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO samples (step, ts, layout, data) VALUES (1, ?, ?, ?)",
+                [(timestamp, self._layout(keys), values.tobytes()) for timestamp, keys, values, _ in pending]
+            )
+        self.last = pending[-1]
+
+    # Decode a row into {key: (min, avg, max)}; raw rows hold one value per key
+    def _decode(self, step, layout_id, data):
+        keys = self.layout_keys[layout_id]
+        values = array('d' if step == 1 else 'f')
+        values.frombytes(data)
+        if step == 1:
+            return {key: (value, value, value) for key, value in zip(keys, values)}
+        return {key: tuple(values[i * 3:i * 3 + 3]) for i, key in enumerate(keys)}
+
+    # Merge [start, end) of `step` rows into `buckets`, {bucket ts: {key:
+    # [min, weighted sum, max, weight]}} of `resolution` seconds; each row
+    # weighs the seconds it covers, so steps read into the same bucket
+    # average fairly
+    def _read(self, step, start, end, resolution, buckets):
+        rows = self.db.execute(
+            "SELECT ts, layout, data FROM samples WHERE step = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (step, start, end)
+        )
+        for timestamp, layout_id, data in rows:
+            bucket = buckets.setdefault(timestamp - timestamp % resolution, {})
+            for key, (low, avg, high) in self._decode(step, layout_id, data).items():
+                merged = bucket.get(key)
+                if merged is None:
+                    bucket[key] = [low, avg * step, high, step]
+                else:
+                    merged[0] = min(merged[0], low)
+                    merged[1] += avg * step
+                    merged[2] = max(merged[2], high)
+                    merged[3] += step
+        return buckets
+
+    def _watermark(self, step):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (f"rollup_{step}",)).fetchone()
+        return row[0] if row else 0
+
+    def _query(self, start, end, resolution, callback):
+        self._flush()
+        buckets = {}
+        # Coarsest stored step first, finer steps for the tail not rolled up yet
+        cursor = int(start)
+        for step in sorted((step for step in self.STEPS if step <= resolution), reverse=True):
+            upto = int(end) if step == 1 else min(int(end), self._watermark(step))
+            if cursor < upto:
+                self._read(step, cursor, upto, resolution, buckets)
+                cursor = upto
+        series = {}
+        for timestamp in sorted(buckets):
+            for key, (low, total, high, weight) in buckets[timestamp].items():
+                series.setdefault(key, []).append((timestamp, low, total / weight, high))
+        GLib.idle_add(callback, series)
+
+    def _export(self, export, progress, done):
+        self._flush()
+        start_export(export, progress, done)
+
+    # Roll complete buckets up into the next step, then expire old rows
+    def _compact(self):
+        now = int(time.time())
+        with self.db:
+            for source, step in zip(self.STEPS, self.STEPS[1:]):
+                start = self._watermark(step) or now - STORE_RETENTION[source]
+                end = now - now % step
+                if start >= end:
+                    continue
+                buckets = self._read(source, start, end, step, {})
+                for timestamp, bucket in buckets.items():
+                    keys = tuple(bucket)
+                    values = array('f')
+                    for low, total, high, weight in bucket.values():
+                        values.extend((low, total / weight, high))
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO samples (step, ts, layout, data) VALUES (?, ?, ?, ?)",
+                        (step, timestamp, self._layout(keys), values.tobytes())
+                    )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (f"rollup_{step}", end)
+                )
+            for step, retention in STORE_RETENTION.items():
+                self.db.execute("DELETE FROM samples WHERE step = ? AND ts < ?", (step, now - retention))
+
+# Average raw row `other` into `into`, both [ts, keys, values, samples],
+# weighted by how many samples each already holds; a key only one of them
+# has keeps its value
+def merge_samples(into, other):
+    _, keys, values, count = into
+    _, other_keys, other_values, other_count = other
+    total = count + other_count
+    if keys == other_keys:
+        for i, value in enumerate(other_values):
+            values[i] = (values[i] * count + value * other_count) / total
+    else:
+        merged = dict(zip(keys, values))
+        for key, value in zip(other_keys, other_values):
+            previous = merged.get(key)
+            merged[key] = value if previous is None else (previous * count + value * other_count) / total
+        into[1] = tuple(merged)
+        into[2] = array('d', merged.values())
+    into[3] = total
+
+# Run an export.Export on a thread of its own; progress(done, total) and
+# done(rows, error) are called on the main loop, error being None on success
+def start_export(export, progress, done):
+    def run():
+        try:
+            rows = export.run(lambda *args: GLib.idle_add(progress, *args))
+        except Exception as e:
+            GLib.idle_add(done, export.rows, e)
+        else:
+            GLib.idle_add(done, rows, None)
+
+    threading.Thread(target=run, daemon=True).start()